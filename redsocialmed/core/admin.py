@@ -1,7 +1,7 @@
 # admin.py
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
-from .models import Usuario, Perfil, Publication, Comentario
+from .models import Usuario, Perfil, Publication, Comentario, OutgoingEmail, BackgroundJob, RethusVerification
 
 # Configuración personalizada para el modelo Usuario
 class CustomUserAdmin(UserAdmin):
@@ -21,3 +21,23 @@ admin.site.register(Usuario, CustomUserAdmin)
 admin.site.register(Perfil)
 admin.site.register(Publication)
 admin.site.register(Comentario)
+
+
+@admin.register(OutgoingEmail)
+class OutgoingEmailAdmin(admin.ModelAdmin):
+    list_display = ('to_email', 'subject', 'status', 'attempts', 'next_attempt_at', 'sent_at')
+    list_filter = ('status',)
+    search_fields = ('to_email', 'subject')
+
+
+@admin.register(BackgroundJob)
+class BackgroundJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'kind', 'status', 'attempts', 'max_attempts', 'run_after', 'locked_until', 'finished_at')
+    list_filter = ('status', 'kind')
+
+
+@admin.register(RethusVerification)
+class RethusVerificationAdmin(admin.ModelAdmin):
+    list_display = ('doc_type', 'doc_num', 'found', 'checked_at', 'expires_at')
+    list_filter = ('found', 'doc_type')
+    search_fields = ('doc_num',)
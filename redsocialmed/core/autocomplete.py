@@ -0,0 +1,187 @@
+"""Autocompletado de profesionales (nombre y especialidad) mientras se escribe.
+
+- Postgres: operador de trigramas `%>` sobre DoctorSearchIndex.autocompletar,
+  con índice GIN gin_trgm_ops (migración 0019).
+- Otros motores: trie de prefijos en memoria del proceso, construido de
+  forma perezosa y actualizado fila a fila cuando cambia el índice de
+  búsqueda (ver core.signals).
+
+Las respuestas se cachean por consulta normalizada; la versión del caché
+se incrementa con cada cambio de perfil para invalidarlas.
+"""
+import hashlib
+import threading
+import time
+
+from django.contrib.postgres.lookups import TrigramWordSimilar
+from django.contrib.postgres.search import TrigramWordSimilarity
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import F, Value
+
+from .models import DoctorSearchIndex
+from .search import fold_accents
+
+MIN_QUERY_LENGTH = 2
+DEFAULT_LIMIT = 8
+MAX_LIMIT = 20
+RESPONSE_TTL = 60
+# Aunque no haya cambios locales, el trie se reconstruye cada cierto tiempo
+# para recoger ediciones hechas en otros workers.
+TRIE_MAX_AGE = 60 * 10
+# Tope de candidatos por término al recorrer el trie
+MAX_CANDIDATES = 5000
+
+_VERSION_KEY = 'autocomplete:version'
+_IDS = ''  # clave de los ids en cada nodo (los hijos son caracteres)
+
+
+def _doc_for(index):
+    usuario = index.usuario
+    return {
+        'id': usuario.id,
+        'nombre': index.nombre,
+        'titulo': usuario.titulo_profesional or 'Dr.',
+        'especialidad': usuario.especialidad or '',
+        'foto': usuario.foto_perfil.url if usuario.foto_perfil else None,
+    }
+
+
+class PrefixTrie:
+    def __init__(self):
+        self.root = {}
+        self.docs = {}
+        self.words = {}
+
+    def add(self, doc, text):
+        self.remove(doc['id'])
+        words = set(fold_accents(text).split())
+        for word in words:
+            node = self.root
+            for ch in word:
+                node = node.setdefault(ch, {})
+            node.setdefault(_IDS, set()).add(doc['id'])
+        self.docs[doc['id']] = doc
+        self.words[doc['id']] = words
+
+    def remove(self, user_id):
+        for word in self.words.pop(user_id, ()):
+            node = self._find(word)
+            if node is not None:
+                node.get(_IDS, set()).discard(user_id)
+        self.docs.pop(user_id, None)
+
+    def _find(self, prefix):
+        node = self.root
+        for ch in prefix:
+            node = node.get(ch)
+            if node is None:
+                return None
+        return node
+
+    def _collect(self, node):
+        found = set()
+        stack = [node]
+        while stack and len(found) < MAX_CANDIDATES:
+            current = stack.pop()
+            for key, child in current.items():
+                if key == _IDS:
+                    found |= child
+                else:
+                    stack.append(child)
+        return found
+
+    def search(self, query, limit):
+        terms = fold_accents(query).split()
+        matches = None
+        for term in terms:
+            node = self._find(term)
+            ids = self._collect(node) if node is not None else set()
+            matches = ids if matches is None else matches & ids
+            if not matches:
+                return []
+
+        # Primero quienes tienen más términos como palabra completa
+        def score(user_id):
+            exact = sum(1 for t in terms if t in self.words[user_id])
+            return (-exact, self.docs[user_id]['nombre'])
+
+        return [self.docs[user_id] for user_id in sorted(matches, key=score)[:limit]]
+
+
+class _TrieHolder:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.trie = None
+        self.built_at = 0
+
+    def get(self):
+        with self.lock:
+            if self.trie is None or time.monotonic() - self.built_at > TRIE_MAX_AGE:
+                trie = PrefixTrie()
+                for index in DoctorSearchIndex.objects.select_related('usuario').iterator():
+                    trie.add(_doc_for(index), index.autocompletar)
+                self.trie = trie
+                self.built_at = time.monotonic()
+            return self.trie
+
+    def update(self, index):
+        with self.lock:
+            if self.trie is not None:
+                self.trie.add(_doc_for(index), index.autocompletar)
+
+    def remove(self, user_id):
+        with self.lock:
+            if self.trie is not None:
+                self.trie.remove(user_id)
+
+
+_trie = _TrieHolder()
+
+
+def _postgres_autocomplete(query, limit):
+    folded = fold_accents(query)
+    rows = (
+        DoctorSearchIndex.objects.select_related('usuario')
+        .filter(TrigramWordSimilar(F('autocompletar'), Value(folded)))
+        .annotate(similitud=TrigramWordSimilarity(Value(folded), 'autocompletar'))
+        .order_by('-similitud', 'nombre')[:limit]
+    )
+    return [_doc_for(index) for index in rows]
+
+
+def autocomplete(query, limit=DEFAULT_LIMIT):
+    """Hasta `limit` profesionales cuyo nombre o especialidad empiezan por `query`."""
+    query = ' '.join(fold_accents(query).split())
+    if len(query) < MIN_QUERY_LENGTH:
+        return []
+
+    version = cache.get_or_set(_VERSION_KEY, 1, None)
+    digest = hashlib.md5(query.encode()).hexdigest()
+    key = f'autocomplete:{version}:{limit}:{digest}'
+    results = cache.get(key)
+    if results is None:
+        if connection.vendor == 'postgresql':
+            results = _postgres_autocomplete(query, limit)
+        else:
+            results = _trie.get().search(query, limit)
+        cache.set(key, results, RESPONSE_TTL)
+    return results
+
+
+def index_changed(index):
+    """Aplica un cambio de DoctorSearchIndex al trie local e invalida respuestas."""
+    _trie.update(index)
+    _bump_version()
+
+
+def index_removed(user_id):
+    _trie.remove(user_id)
+    _bump_version()
+
+
+def _bump_version():
+    try:
+        cache.incr(_VERSION_KEY)
+    except ValueError:
+        cache.set(_VERSION_KEY, 1, None)
@@ -0,0 +1,53 @@
+"""Estado del último análisis ROJITO de un usuario, con ETag y long-poll.
+
+El ETag sale de (id, status, updated_at): se calcula con una consulta que
+solo lee esas columnas por el índice (user, -created_at), sin traer el
+texto del resultado. Si coincide con If-None-Match la vista responde 304.
+
+wait_for_change mantiene abierta la petición hasta que el ETag cambie o se
+agote la espera. El worker que ejecuta el análisis corre en otro proceso,
+así que el cambio se detecta releyendo esa consulta barata cada
+POLL_INTERVAL segundos; la espera no ocupa un hilo bajo ASGI.
+"""
+import asyncio
+import math
+import time
+
+from asgiref.sync import sync_to_async
+
+from .models import BloodAnalysis
+
+# Tope de espera de una petición long-poll (por debajo del timeout del proxy)
+MAX_WAIT = 25
+POLL_INTERVAL = 1
+
+
+def latest_version(user_id):
+    """(id, status, updated_at) del análisis más reciente, o None."""
+    return BloodAnalysis.objects.filter(user_id=user_id).order_by('-created_at').values_list(
+        'id', 'status', 'updated_at'
+    ).first()
+
+
+def make_etag(version):
+    if version is None:
+        return '"none"'
+    analysis_id, status, updated_at = version
+    return f'"{analysis_id}-{status}-{int(updated_at.timestamp() * 1000)}"'
+
+
+async def wait_for_change(user_id, etags, timeout):
+    """
+    Espera hasta `timeout` segundos a que el ETag actual deje de estar en
+    `etags`. Devuelve el ETag con el que termina (cambiado o no).
+    """
+    if not math.isfinite(timeout):
+        timeout = 0
+    deadline = time.monotonic() + min(timeout, MAX_WAIT)
+    get_version = sync_to_async(latest_version)
+    while True:
+        etag = make_etag(await get_version(user_id))
+        remaining = deadline - time.monotonic()
+        if etag not in etags or remaining <= 0:
+            return etag
+        await asyncio.sleep(min(POLL_INTERVAL, remaining))
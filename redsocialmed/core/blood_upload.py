@@ -0,0 +1,133 @@
+"""Envío de PDFs de exámenes de sangre al servicio de análisis.
+
+El archivo subido (en memoria si es pequeño, en un archivo temporal si no)
+se reenvía por bloques: el cuerpo multipart se arma al vuelo a partir de
+file.chunks(), así la memoria por subida no crece con el tamaño del PDF.
+La conexión al servicio sale de un requests.Session compartido.
+"""
+import re
+import uuid
+
+import requests
+from requests.adapters import HTTPAdapter
+
+UPLOAD_URL = 'https://chatbot-doctor-app.onrender.com/documents/upload'
+# (conexión, lectura) en segundos
+UPLOAD_TIMEOUT = (5, 120)
+CHUNK_SIZE = 64 * 1024
+
+# El diccionario trailer (o el del xref stream) suele ir al final del archivo
+# y los PDFs linealizados repiten uno al inicio; si la tabla xref es grande
+# queda antes de la cola, así que también se lee donde apunta `startxref`.
+TAIL_BYTES = 64 * 1024
+HEAD_BYTES = 16 * 1024
+XREF_BYTES = 16 * 1024
+# Tope de subsecciones de la tabla xref que se saltan buscando el trailer
+MAX_XREF_SUBSECTIONS = 10000
+_ENCRYPT_RE = re.compile(rb'/Encrypt\s*(?:\d+\s+\d+\s+R|<<)')
+_STARTXREF_RE = re.compile(rb'startxref\s+(\d+)')
+_SUBSECTION_RE = re.compile(rb'\s*(\d+)\s+(\d+)[ \t]*(?:\r\n|\r|\n)')
+_TRAILER_RE = re.compile(rb'\s*trailer')
+
+_session = requests.Session()
+_session.mount('https://', HTTPAdapter(pool_connections=4, pool_maxsize=20))
+_session.mount('http://', HTTPAdapter(pool_connections=4, pool_maxsize=20))
+
+
+def _xref_dictionary(file, offset):
+    """
+    Bytes desde el diccionario de la sección xref en `offset`: el del trailer
+    si es una tabla (se saltan sus entradas de 20 bytes) o el del xref stream.
+    """
+    file.seek(offset)
+    chunk = file.read(XREF_BYTES)
+    if not chunk.startswith(b'xref'):
+        return chunk
+    pos = offset + len(b'xref')
+    for _ in range(MAX_XREF_SUBSECTIONS):
+        file.seek(pos)
+        chunk = file.read(XREF_BYTES)
+        if _TRAILER_RE.match(chunk):
+            return chunk
+        match = _SUBSECTION_RE.match(chunk)
+        if match is None:
+            return b''
+        pos += match.end() + int(match.group(2)) * 20
+    return b''
+
+
+def is_encrypted_pdf(file):
+    """True si el trailer del PDF referencia un diccionario /Encrypt."""
+    size = file.size
+    try:
+        file.seek(0)
+        head = file.read(HEAD_BYTES)
+        if _ENCRYPT_RE.search(head):
+            return True
+        file.seek(max(0, size - TAIL_BYTES))
+        tail = file.read(TAIL_BYTES)
+        if _ENCRYPT_RE.search(tail):
+            return True
+        offsets = _STARTXREF_RE.findall(tail)
+        if not offsets or int(offsets[-1]) >= size:
+            return False
+        return bool(_ENCRYPT_RE.search(_xref_dictionary(file, int(offsets[-1]))))
+    finally:
+        file.seek(0)
+
+
+class MultipartFileStream:
+    """
+    Cuerpo multipart/form-data con un único campo de archivo, leído por
+    bloques. Expone __len__ para que requests envíe Content-Length en vez
+    de Transfer-Encoding: chunked.
+    """
+
+    def __init__(self, field, file, content_type):
+        self.boundary = uuid.uuid4().hex
+        filename = file.name.replace('"', '')
+        self._preamble = (
+            f'--{self.boundary}\r\n'
+            f'Content-Disposition: form-data; name="{field}"; filename="{filename}"\r\n'
+            f'Content-Type: {content_type}\r\n\r\n'
+        ).encode()
+        self._epilogue = f'\r\n--{self.boundary}--\r\n'.encode()
+        self._length = len(self._preamble) + file.size + len(self._epilogue)
+        file.seek(0)
+        self._parts = self._iter_parts(file)
+        self._buffer = b''
+
+    @property
+    def content_type(self):
+        return f'multipart/form-data; boundary={self.boundary}'
+
+    def __len__(self):
+        return self._length
+
+    def _iter_parts(self, file):
+        yield self._preamble
+        yield from file.chunks(CHUNK_SIZE)
+        yield self._epilogue
+
+    def read(self, size=-1):
+        while size < 0 or len(self._buffer) < size:
+            part = next(self._parts, None)
+            if part is None:
+                break
+            self._buffer += part
+        if size < 0:
+            data, self._buffer = self._buffer, b''
+        else:
+            data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+
+def upload_document(file):
+    """Reenvía `file` (UploadedFile) al servicio de análisis y devuelve la respuesta."""
+    body = MultipartFileStream('file', file, file.content_type or 'application/pdf')
+    return _session.post(
+        UPLOAD_URL,
+        data=body,
+        headers={'Content-Type': body.content_type},
+        timeout=UPLOAD_TIMEOUT,
+    )
@@ -1,8 +1,10 @@
-from .models import Publication
+from django.utils.functional import SimpleLazyObject
+
+from .notifications import get_recent_notifications
 
 def recent_notifications(request):
     if request.user.is_authenticated:
-        seguidos = request.user.siguiendo.all()
-        recent_posts = Publication.objects.filter(autor__in=seguidos).order_by('-creado')[:2]
-        return {'recent_notifications': recent_posts}
+        # Perezoso: solo consulta (o lee caché) si la plantilla lo usa
+        user = request.user
+        return {'recent_notifications': SimpleLazyObject(lambda: get_recent_notifications(user))}
     return {}
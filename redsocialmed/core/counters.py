@@ -0,0 +1,65 @@
+"""Contadores denormalizados de Publication (likes, dislikes, comentarios).
+
+Todas las escrituras son UPDATE ... SET campo = campo + n, de modo que
+reacciones concurrentes no se pisan entre sí.
+"""
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from .models import Comentario, Publication
+
+COUNTER_FIELDS = ('likes_total', 'dislikes_total', 'comentarios_total')
+
+
+def adjust_counter(pub_ids, field, delta):
+    """Suma `delta` al contador `field` de las publicaciones indicadas."""
+    if field not in COUNTER_FIELDS:
+        raise ValueError(f'Contador desconocido: {field}')
+    if isinstance(pub_ids, int):
+        pub_ids = [pub_ids]
+    qs = Publication.objects.filter(pk__in=pub_ids)
+    if delta < 0:
+        # Nunca por debajo de cero aunque el contador se haya desfasado
+        qs = qs.filter(**{f'{field}__gte': -delta})
+    return qs.update(**{field: F(field) + delta})
+
+
+def _count_subquery(model, fk_name):
+    counts = (
+        model.objects.filter(**{fk_name: OuterRef('pk')})
+        .order_by()
+        .values(fk_name)
+        .annotate(c=Count('*'))
+        .values('c')
+    )
+    return Coalesce(Subquery(counts, output_field=IntegerField()), Value(0))
+
+
+def _real_count_expressions():
+    return {
+        'likes_total': _count_subquery(Publication.likes.through, 'publication'),
+        'dislikes_total': _count_subquery(Publication.dislikes.through, 'publication'),
+        'comentarios_total': _count_subquery(Comentario, 'publicacion'),
+    }
+
+
+def reconcile_counters(queryset=None, batch_size=500):
+    """Corrige los contadores desfasados. Devuelve cuántas publicaciones cambió."""
+    if queryset is None:
+        queryset = Publication.objects.all()
+    expressions = _real_count_expressions()
+    drifted = queryset.annotate(
+        real_likes=expressions['likes_total'],
+        real_dislikes=expressions['dislikes_total'],
+        real_comentarios=expressions['comentarios_total'],
+    ).exclude(
+        likes_total=F('real_likes'),
+        dislikes_total=F('real_dislikes'),
+        comentarios_total=F('real_comentarios'),
+    ).order_by().values_list('pk', flat=True)
+
+    ids = list(drifted)
+    for start in range(0, len(ids), batch_size):
+        # El recálculo se hace en el mismo UPDATE para no pisar escrituras concurrentes
+        Publication.objects.filter(pk__in=ids[start:start + batch_size]).update(**expressions)
+    return len(ids)
@@ -0,0 +1,269 @@
+"""Subida directa de multimedia de publicaciones al bucket (Spaces/S3).
+
+En vez de pasar el archivo (hasta 287 MB) por gunicorn y que django-storages
+lo vuelva a subir, el navegador lo sube por partes directamente al bucket:
+
+1. start(): el servidor valida tipo y tamaño declarados, abre una subida
+   multipart y devuelve una URL firmada por parte más un token firmado
+   (django.core.signing) con la clave del objeto, el upload_id y el autor.
+2. El navegador hace PUT de cada parte y guarda el ETag de la respuesta.
+3. complete(): el servidor cierra la subida, comprueba el objeto ya subido
+   (tamaño real y tipo leyendo sus primeros bytes) y crea la Publication
+   apuntando a la clave, con su fan-out a los timelines en la misma
+   transacción; si no pasa la comprobación, borra el objeto.
+
+Solo funciona con STORAGES["default"] en S3Boto3Storage y con los tipos que
+sniff() sabe reconocer (MediaKind.mime_types); en otro caso el formulario
+sigue enviando el archivo a crear_publicacion. El bucket necesita
+una regla CORS que permita PUT desde el dominio del sitio y exponga la
+cabecera ETag, y conviene una regla de ciclo de vida que aborte las subidas
+multipart incompletas.
+"""
+import math
+import os
+import uuid
+from dataclasses import dataclass
+from io import BytesIO
+
+from botocore.exceptions import ClientError
+from django.conf import settings
+from django.core import signing
+from django.core.files.storage import default_storage
+from django.db import transaction
+from PIL import Image, UnidentifiedImageError
+
+from .models import Publication, Usuario
+from .timeline import fan_out_publication
+
+SIGNING_SALT = 'core.direct_upload'
+KEY_PREFIX = 'publicaciones/'
+# S3 exige partes de al menos 5 MB (salvo la última) y como máximo 10 000
+MIN_PART_SIZE = 5 * 1024 * 1024
+MAX_PARTS = 10000
+# Bytes leídos del objeto para reconocer su formato
+SNIFF_BYTES = 64 * 1024
+
+
+@dataclass(frozen=True)
+class MediaKind:
+    field: str
+    mime_prefix: str
+    max_size: int
+    label: str
+    # Tipos que sniff() reconoce; el resto va por el formulario clásico
+    mime_types: frozenset
+
+
+# Mismos límites que crear_publicacion
+KINDS = {
+    'imagen': MediaKind('imagen', 'image/', 30 * 1024 * 1024, 'La imagen excede el tamaño máximo de 30MB.', frozenset({
+        'image/jpeg', 'image/png', 'image/gif', 'image/webp', 'image/bmp', 'image/tiff',
+        'image/avif', 'image/heic', 'image/heif',
+    })),
+    'video': MediaKind('video', 'video/', 287 * 1024 * 1024, 'El video excede el tamaño máximo de 287MB.', frozenset({
+        'video/mp4', 'video/x-m4v', 'video/quicktime', 'video/3gpp', 'video/3gpp2',
+        'video/webm', 'video/x-matroska', 'video/x-msvideo', 'video/avi', 'video/msvideo',
+        'video/ogg', 'video/mpeg', 'video/mp2t', 'video/x-ms-wmv', 'video/x-ms-asf', 'video/x-flv',
+    })),
+}
+
+# Marcas ISO-BMFF ("ftyp") que son imágenes (HEIF/AVIF), no video
+_IMAGE_BRANDS = {b'avif', b'avis', b'heic', b'heix', b'hevc', b'mif1', b'msf1'}
+# Átomos con que empiezan los .mov antiguos, sin "ftyp"
+_QUICKTIME_ATOMS = {b'moov', b'mdat', b'wide', b'free', b'skip', b'pnot'}
+_ASF_GUID = b'\x30\x26\xb2\x75\x8e\x66\xcf\x11'
+
+
+class UploadError(Exception):
+    """Subida rechazada; el mensaje se muestra al usuario."""
+
+
+def enabled():
+    return hasattr(default_storage, 'bucket')
+
+
+def _client():
+    return default_storage.bucket.meta.client
+
+
+def _bucket():
+    return default_storage.bucket_name
+
+
+def _mime(content_type):
+    return content_type.split(';')[0].strip().lower()
+
+
+def kind_for(content_type):
+    for kind, spec in KINDS.items():
+        if _mime(content_type).startswith(spec.mime_prefix):
+            return kind
+    return None
+
+
+def sniffable(content_type):
+    """True si el tipo declarado se puede comprobar al completar la subida."""
+    kind = kind_for(content_type)
+    return kind is None or _mime(content_type) in KINDS[kind].mime_types
+
+
+def part_size_for(size):
+    part_size = max(settings.DIRECT_UPLOAD_PART_SIZE, MIN_PART_SIZE)
+    return max(part_size, math.ceil(size / MAX_PARTS))
+
+
+def start(user_id, filename, content_type, size):
+    """
+    Abre la subida multipart. Devuelve {'token', 'part_size', 'urls'} con
+    una URL firmada (PUT) por parte, en orden.
+    """
+    kind = kind_for(content_type)
+    if kind is None:
+        raise UploadError('Solo se permiten imágenes o videos.')
+    if size <= 0:
+        raise UploadError('El archivo está vacío.')
+    if size > KINDS[kind].max_size:
+        raise UploadError(KINDS[kind].label)
+    if not sniffable(content_type):
+        raise UploadError('Este formato no admite subida directa.')
+
+    ext = os.path.splitext(filename)[1].lower()[:10]
+    name = f'{KEY_PREFIX}{uuid.uuid4().hex}{ext}'
+    key = default_storage._normalize_name(name)
+
+    params = settings.AWS_S3_OBJECT_PARAMETERS
+    upload = _client().create_multipart_upload(
+        Bucket=_bucket(), Key=key, ContentType=content_type,
+        ACL=params.get('ACL', settings.AWS_DEFAULT_ACL),
+        CacheControl=params.get('CacheControl', ''),
+    )
+    upload_id = upload['UploadId']
+
+    part_size = part_size_for(size)
+    urls = [
+        _client().generate_presigned_url(
+            'upload_part',
+            Params={'Bucket': _bucket(), 'Key': key, 'UploadId': upload_id, 'PartNumber': number},
+            ExpiresIn=settings.DIRECT_UPLOAD_EXPIRY,
+        )
+        for number in range(1, math.ceil(size / part_size) + 1)
+    ]
+    token = signing.dumps(
+        {'user': user_id, 'name': name, 'key': key, 'upload_id': upload_id,
+         'kind': kind, 'size': size},
+        salt=SIGNING_SALT,
+    )
+    return {'token': token, 'part_size': part_size, 'urls': urls}
+
+
+def _load(token, user_id):
+    try:
+        data = signing.loads(token, salt=SIGNING_SALT, max_age=settings.DIRECT_UPLOAD_EXPIRY)
+    except signing.BadSignature:
+        raise UploadError('La subida expiró, inténtalo de nuevo.')
+    if data['user'] != user_id:
+        raise UploadError('La subida expiró, inténtalo de nuevo.')
+    return data
+
+
+def _is_mpeg_ts(head, packet):
+    # Byte de sincronía 0x47 al inicio de tres paquetes seguidos (M2TS: 4 bytes antes)
+    offset = packet - 188
+    return len(head) >= offset + 2 * packet + 1 and all(
+        head[offset + i * packet] == 0x47 for i in range(3)
+    )
+
+
+def sniff(head):
+    """'imagen', 'video' o None según los primeros bytes del archivo."""
+    if head[4:8] == b'ftyp':
+        return 'imagen' if head[8:12] in _IMAGE_BRANDS else 'video'
+    if head[4:8] in _QUICKTIME_ATOMS:
+        return 'video'
+    if head.startswith(b'\x1a\x45\xdf\xa3'):  # Matroska / WebM
+        return 'video'
+    if head[:4] == b'RIFF' and head[8:12] == b'AVI ':
+        return 'video'
+    if head[:4] == b'OggS' or head[:3] == b'FLV' or head.startswith(_ASF_GUID):
+        return 'video'
+    if head[:4] in (b'\x00\x00\x01\xba', b'\x00\x00\x01\xb3'):  # MPEG-PS / MPEG-1/2
+        return 'video'
+    if _is_mpeg_ts(head, 188) or _is_mpeg_ts(head, 192):
+        return 'video'
+    try:
+        # Solo lee la cabecera: basta con el inicio del archivo
+        with Image.open(BytesIO(head)):
+            return 'imagen'
+    except (UnidentifiedImageError, OSError):
+        return None
+
+
+def _check(data):
+    """Comprueba el objeto subido contra lo declarado en start()."""
+    client = _client()
+    spec = KINDS[data['kind']]
+    try:
+        size = client.head_object(Bucket=_bucket(), Key=data['key'])['ContentLength']
+        if size > spec.max_size:
+            raise UploadError(spec.label)
+        if size != data['size']:
+            raise UploadError('El archivo no se subió completo, inténtalo de nuevo.')
+        start_bytes = client.get_object(
+            Bucket=_bucket(), Key=data['key'], Range=f'bytes=0-{SNIFF_BYTES - 1}'
+        )['Body'].read()
+    except ClientError:
+        raise UploadError('El archivo no se subió completo, inténtalo de nuevo.')
+    if sniff(start_bytes) != data['kind']:
+        raise UploadError('El archivo no es una imagen o video válido.')
+
+
+def complete(token, user_id, parts, contenido):
+    """
+    Cierra la subida y crea la publicación. `parts` es [{'n': 1, 'etag': '"…"'}].
+    Devuelve (publicación, creada); si el cliente repite la llamada devuelve
+    la publicación ya creada.
+    """
+    data = _load(token, user_id)
+    field = KINDS[data['kind']].field
+
+    existing = Publication.objects.filter(autor_id=user_id, **{field: data['name']}).first()
+    if existing is not None:
+        return existing, False
+
+    try:
+        parts = sorted(({'PartNumber': int(p['n']), 'ETag': str(p['etag'])} for p in parts),
+                       key=lambda p: p['PartNumber'])
+    except (KeyError, TypeError, ValueError):
+        raise UploadError('Lista de partes inválida.')
+
+    client = _client()
+    try:
+        client.complete_multipart_upload(
+            Bucket=_bucket(), Key=data['key'], UploadId=data['upload_id'],
+            MultipartUpload={'Parts': parts},
+        )
+    except ClientError:
+        # Un reintento simultáneo pudo cerrar la subida primero
+        if not default_storage.exists(data['name']):
+            raise UploadError('El archivo no se subió completo, inténtalo de nuevo.')
+    try:
+        _check(data)
+    except UploadError:
+        client.delete_object(Bucket=_bucket(), Key=data['key'])
+        raise
+
+    with transaction.atomic():
+        # Serializa los reintentos del mismo autor: solo uno crea la publicación
+        Usuario.objects.select_for_update().filter(pk=user_id).first()
+        existing = Publication.objects.filter(autor_id=user_id, **{field: data['name']}).first()
+        if existing is not None:
+            return existing, False
+        publicacion = Publication(autor_id=user_id, contenido=contenido, **{field: data['name']})
+        publicacion.save()
+        fan_out_publication(publicacion)
+    return publicacion, True
+
+
+def abort(token, user_id):
+    data = _load(token, user_id)
+    _client().abort_multipart_upload(Bucket=_bucket(), Key=data['key'], UploadId=data['upload_id'])
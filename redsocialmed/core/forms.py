@@ -1,5 +1,8 @@
 from django import forms
+from django.contrib.auth.forms import PasswordResetForm
+from django.template.loader import render_to_string
 from .models import Perfil, Usuario
+from .outbox import queue_email
 from django.contrib.auth.models import User
 
 class PerfilForm(forms.ModelForm):
@@ -72,3 +75,14 @@ class UserUpdateForm(forms.ModelForm):
                      self.add_error('new_password', 'La contraseña debe tener al menos 8 caracteres, una mayúscula y un número.')
         
         return cleaned_data
+
+
+class OutboxPasswordResetForm(PasswordResetForm):
+    """PasswordResetForm que encola el correo en vez de enviarlo por SMTP en la petición."""
+
+    def send_mail(self, subject_template_name, email_template_name, context,
+                  from_email, to_email, html_email_template_name=None):
+        subject = ''.join(render_to_string(subject_template_name, context).splitlines())
+        body = render_to_string(email_template_name, context)
+        html_body = render_to_string(html_email_template_name, context) if html_email_template_name else ''
+        queue_email(subject, to_email, body=body, html_body=html_body, from_email=from_email)
@@ -0,0 +1,149 @@
+"""Derivados de imágenes subidas: varios anchos en AVIF y WebP.
+
+Los originales (publicaciones de hasta 30 MB, fotos de perfil a resolución
+completa) se siguen guardando tal cual. Al guardarse el modelo se encola un
+trabajo (core.tasks.IMAGE_DERIVATIVES) que genera los derivados con Pillow
+fuera de la petición y los sube al mismo almacenamiento (STORAGES["default"]:
+disco local o Spaces) junto al original, en `<carpeta>/derivados/`.
+
+Qué se generó queda en el JSONField `<campo>_variantes` del modelo:
+
+    {"src": "publicaciones/foto.jpg",
+     "avif": {"240": "publicaciones/derivados/foto_240.avif", ...},
+     "webp": {"240": "publicaciones/derivados/foto_240.webp", ...}}
+
+`src` permite descartar derivados de una imagen anterior. La etiqueta
+{% picture %} (core.templatetags.responsive_images) arma el <picture> con srcset y usa
+el original mientras los derivados no existan.
+"""
+import os
+from dataclasses import dataclass
+from io import BytesIO
+
+from django.apps import apps
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps, features
+
+
+@dataclass(frozen=True)
+class ImageSpec:
+    widths: tuple
+    # Recorte cuadrado centrado (avatares, que se muestran en círculos)
+    square: bool = False
+
+
+SPECS = {
+    ('core.publication', 'imagen'): ImageSpec(widths=(240, 640, 1280)),
+    ('core.usuario', 'foto_perfil'): ImageSpec(widths=(64, 128, 256), square=True),
+}
+
+# Del más eficiente al más compatible; el navegador elige el primero que soporte
+FORMATS = {
+    'avif': {'mime': 'image/avif', 'params': {'quality': 55, 'speed': 6}},
+    'webp': {'mime': 'image/webp', 'params': {'quality': 80, 'method': 4}},
+}
+ENABLED_FORMATS = tuple(fmt for fmt in FORMATS if features.check(fmt))
+
+
+def variants_field(field_name):
+    return f'{field_name}_variantes'
+
+
+def spec_for(instance, field_name):
+    return SPECS.get((instance._meta.label_lower, field_name))
+
+
+def needs_derivatives(instance, field_name):
+    """True si el archivo actual no tiene derivados generados (o son de otro archivo)."""
+    file = getattr(instance, field_name)
+    variants = getattr(instance, variants_field(field_name)) or {}
+    return bool(file) and variants.get('src') != file.name
+
+
+def _derivative_name(name, width, fmt):
+    folder, filename = os.path.split(name)
+    stem = os.path.splitext(filename)[0]
+    return f'{folder}/derivados/{stem}_{width}.{fmt}'
+
+
+def _prepare(image):
+    image = ImageOps.exif_transpose(image)
+    if image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info):
+        return image.convert('RGBA')
+    return image.convert('RGB')
+
+
+def _resize(image, width, square):
+    if square:
+        return ImageOps.fit(image, (width, width), Image.LANCZOS)
+    height = max(1, round(image.height * width / image.width))
+    return image.resize((width, height), Image.LANCZOS)
+
+
+def render(source, spec):
+    """
+    Genera los derivados de `source` (archivo abierto) según `spec`.
+    Devuelve {(ancho, formato): bytes}. Nunca amplía: los anchos mayores que
+    el original se reemplazan por el ancho original.
+    """
+    with Image.open(source) as image:
+        # JPEG: decodifica directamente a escala reducida si sobra resolución
+        image.draft('RGB', (max(spec.widths) * 2, max(spec.widths) * 2))
+        image = _prepare(image)
+
+    base = min(image.size) if spec.square else image.width
+    widths = sorted({min(width, base) for width in spec.widths})
+    out = {}
+    for width in widths:
+        resized = _resize(image, width, spec.square)
+        for fmt in ENABLED_FORMATS:
+            buffer = BytesIO()
+            resized.save(buffer, format=fmt.upper(), **FORMATS[fmt]['params'])
+            out[(width, fmt)] = buffer.getvalue()
+    return out
+
+
+def generate(model_label, pk, field_name):
+    """
+    Genera y sube los derivados de la imagen actual de la instancia y los
+    registra en `<campo>_variantes`. Si la imagen cambió mientras tanto, no
+    registra nada (el guardado nuevo ya encoló su propio trabajo).
+    """
+    model = apps.get_model(model_label)
+    vfield = variants_field(field_name)
+    instance = model.objects.filter(pk=pk).only(field_name, vfield).first()
+    if instance is None or not needs_derivatives(instance, field_name):
+        return None
+
+    name = getattr(instance, field_name).name
+    with default_storage.open(name, 'rb') as source:
+        rendered = render(source, spec_for(instance, field_name))
+
+    variants = {'src': name}
+    for (width, fmt), data in rendered.items():
+        saved = default_storage.save(_derivative_name(name, width, fmt), ContentFile(data))
+        variants.setdefault(fmt, {})[str(width)] = saved
+
+    model.objects.filter(pk=pk, **{field_name: name}).update(**{vfield: variants})
+    return variants
+
+
+def srcsets(file):
+    """
+    {mime: "url 240w, url 640w"} de los derivados vigentes de `file`
+    (un FieldFile de un campo con SPECS), en orden de preferencia.
+    """
+    instance, field_name = file.instance, file.field.name
+    variants = getattr(instance, variants_field(field_name), None) or {}
+    if variants.get('src') != file.name:
+        return {}
+    result = {}
+    for fmt in FORMATS:
+        sizes = variants.get(fmt)
+        if sizes:
+            result[FORMATS[fmt]['mime']] = ', '.join(
+                f'{default_storage.url(name)} {width}w'
+                for width, name in sorted(sizes.items(), key=lambda item: int(item[0]))
+            )
+    return result
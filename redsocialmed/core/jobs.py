@@ -0,0 +1,176 @@
+"""Cola de trabajos en segundo plano respaldada en la base de datos.
+
+Las vistas encolan con enqueue(kind, payload); el comando run_jobs reclama
+trabajos con un lease, los ejecuta en un pool de hilos de tamaño fijo y
+reintenta los fallidos con backoff exponencial. Si un worker muere, su
+lease vence y el reaper devuelve el trabajo a la cola (o lo da por fallido
+cuando ya agotó sus intentos), así nada queda colgado en "processing".
+
+Los trabajos terminados se borran con prune_finished: los DONE pasados
+settings.JOB_DONE_RETENTION_DAYS y los FAILED (útiles para diagnosticar)
+pasados JOB_FAILED_RETENTION_DAYS.
+
+Los handlers se registran con @register en core.tasks.
+"""
+import logging
+import uuid
+from dataclasses import dataclass
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Min
+from django.utils import timezone
+
+from .models import BackgroundJob
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LEASE = timedelta(minutes=10)
+RETRY_BASE = timedelta(seconds=30)
+RETRY_MAX = timedelta(minutes=30)
+# Filas por DELETE al purgar trabajos terminados
+PRUNE_CHUNK_SIZE = 1000
+
+
+@dataclass
+class JobType:
+    handler: object
+    # Llamado cuando el trabajo se da por fallido definitivamente
+    on_failure: object = None
+    lease: timedelta = DEFAULT_LEASE
+    max_attempts: int = 3
+
+
+_registry = {}
+
+
+def register(kind, on_failure=None, lease=DEFAULT_LEASE, max_attempts=3):
+    """Registra `func(payload)` como handler de los trabajos `kind`."""
+    def decorator(func):
+        _registry[kind] = JobType(func, on_failure, lease, max_attempts)
+        return func
+    return decorator
+
+
+def enqueue(kind, payload, run_after=None):
+    job_type = _registry.get(kind)
+    return BackgroundJob.objects.create(
+        kind=kind,
+        payload=payload,
+        max_attempts=job_type.max_attempts if job_type else 3,
+        run_after=run_after or timezone.now(),
+    )
+
+
+def retry_delay(attempts):
+    return min(RETRY_BASE * 2 ** (attempts - 1), RETRY_MAX)
+
+
+def new_worker_id():
+    return uuid.uuid4().hex
+
+
+def claim(worker_id, limit, kinds=None):
+    """Reserva hasta `limit` trabajos listos para `worker_id` y los devuelve."""
+    if limit <= 0:
+        return []
+    now = timezone.now()
+    kinds = list(kinds or _registry)
+    with transaction.atomic():
+        ids = list(
+            BackgroundJob.objects.select_for_update(skip_locked=True)
+            .filter(status='PENDING', run_after__lte=now, kind__in=kinds)
+            .order_by('run_after', 'id').values_list('id', flat=True)[:limit]
+        )
+        for kind in kinds:
+            lease = _registry[kind].lease if kind in _registry else DEFAULT_LEASE
+            # status='PENDING' de nuevo: si otro worker ganó la fila, no se pisa su lease.
+            # El intento se cuenta al reclamar: un worker que muere también lo gasta.
+            BackgroundJob.objects.filter(id__in=ids, kind=kind, status='PENDING').update(
+                status='RUNNING', lease_owner=worker_id, locked_until=now + lease,
+                attempts=F('attempts') + 1,
+            )
+    return list(BackgroundJob.objects.filter(id__in=ids, status='RUNNING', lease_owner=worker_id))
+
+
+def _fail(job, error):
+    """Reintenta el trabajo más tarde o lo marca como fallido si no quedan intentos."""
+    now = timezone.now()
+    owned = BackgroundJob.objects.filter(pk=job.pk, status='RUNNING', lease_owner=job.lease_owner)
+    if job.attempts < job.max_attempts:
+        owned.update(status='PENDING', run_after=now + retry_delay(job.attempts),
+                     lease_owner='', locked_until=None, last_error=error)
+        return
+
+    if owned.update(status='FAILED', finished_at=now, locked_until=None, last_error=error):
+        job_type = _registry.get(job.kind)
+        if job_type and job_type.on_failure:
+            try:
+                job_type.on_failure(job.payload, error)
+            except Exception:
+                logger.exception('Error en on_failure de %s', job)
+
+
+def run(job):
+    """Ejecuta un trabajo ya reclamado y registra el resultado."""
+    job_type = _registry.get(job.kind)
+    if job_type is None:
+        _fail(job, f'Tipo de trabajo desconocido: {job.kind}')
+        return False
+    try:
+        job_type.handler(job.payload)
+    except Exception as e:
+        logger.warning('Trabajo %s falló (intento %s/%s): %s', job, job.attempts, job.max_attempts, e)
+        _fail(job, str(e)[:2000])
+        return False
+    BackgroundJob.objects.filter(pk=job.pk, lease_owner=job.lease_owner).update(
+        status='DONE', finished_at=timezone.now(), locked_until=None, last_error='',
+    )
+    return True
+
+
+def reap_stale():
+    """Devuelve a la cola (o da por fallidos) los trabajos cuyo lease venció."""
+    stale = list(BackgroundJob.objects.filter(status='RUNNING', locked_until__lt=timezone.now()))
+    for job in stale:
+        _fail(job, 'Lease vencido: el worker no terminó a tiempo')
+    return len(stale)
+
+
+def _delete_in_chunks(qs, chunk_size):
+    total = 0
+    while True:
+        ids = list(qs.values_list('id', flat=True)[:chunk_size])
+        if not ids:
+            return total
+        total += BackgroundJob.objects.filter(id__in=ids).delete()[0]
+        if len(ids) < chunk_size:
+            return total
+
+
+def prune_finished(chunk_size=PRUNE_CHUNK_SIZE):
+    """Borra los trabajos DONE y FAILED con más antigüedad que su retención. Devuelve cuántos."""
+    now = timezone.now()
+    total = 0
+    for status, days in (('DONE', settings.JOB_DONE_RETENTION_DAYS),
+                         ('FAILED', settings.JOB_FAILED_RETENTION_DAYS)):
+        old = BackgroundJob.objects.filter(status=status, finished_at__lt=now - timedelta(days=days))
+        total += _delete_in_chunks(old, chunk_size)
+    return total
+
+
+def queue_stats():
+    """Profundidad de la cola por tipo: pendientes, en ejecución, fallidos y antigüedad."""
+    now = timezone.now()
+    stats = {}
+    rows = (
+        BackgroundJob.objects.filter(status__in=['PENDING', 'RUNNING', 'FAILED'])
+        .values('kind', 'status').annotate(total=Count('id'), oldest=Min('created_at'))
+    )
+    for row in rows:
+        entry = stats.setdefault(row['kind'], {'pending': 0, 'running': 0, 'failed': 0, 'oldest_pending_seconds': None})
+        entry[row['status'].lower()] = row['total']
+        if row['status'] == 'PENDING':
+            entry['oldest_pending_seconds'] = int((now - row['oldest']).total_seconds())
+    return stats
@@ -0,0 +1,31 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand
+
+from core import images
+from core.jobs import enqueue
+from core.tasks import IMAGE_DERIVATIVES
+
+
+class Command(BaseCommand):
+    help = "Encola la generación de derivados AVIF/WebP para las imágenes que aún no los tienen."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sync', action='store_true',
+                            help='Genera los derivados en este proceso en vez de encolarlos.')
+
+    def handle(self, *args, **options):
+        total = 0
+        for model_label, field_name in images.SPECS:
+            model = apps.get_model(model_label)
+            rows = model.objects.exclude(**{field_name: ''}).exclude(**{f'{field_name}__isnull': True})
+            for instance in rows.only('pk', field_name, images.variants_field(field_name)).iterator():
+                if not images.needs_derivatives(instance, field_name):
+                    continue
+                if options['sync']:
+                    images.generate(model_label, instance.pk, field_name)
+                else:
+                    enqueue(IMAGE_DERIVATIVES, {'model': model_label, 'pk': instance.pk, 'field': field_name})
+                total += 1
+
+        action = 'Generados' if options['sync'] else 'Encolados'
+        self.stdout.write(self.style.SUCCESS(f'{action} derivados de {total} imágenes.'))
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from core.models import Usuario
+from core.timeline import rebuild_timeline
+
+
+class Command(BaseCommand):
+    help = "Reconstruye el feed materializado (TimelineEntry) a partir de publicaciones y seguidos."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', dest='user_ids',
+                            help='ID de usuario a reconstruir (puede repetirse). Por defecto, todos.')
+
+    def handle(self, *args, **options):
+        usuarios = Usuario.objects.order_by('id')
+        if options['user_ids']:
+            usuarios = usuarios.filter(id__in=options['user_ids'])
+
+        total = 0
+        for usuario in usuarios.iterator():
+            rebuild_timeline(usuario)
+            total += 1
+
+        self.stdout.write(self.style.SUCCESS(f'Timeline reconstruido para {total} usuarios.'))
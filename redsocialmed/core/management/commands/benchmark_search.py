@@ -0,0 +1,153 @@
+import random
+import statistics
+import time
+from collections import defaultdict, deque
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import connection, reset_queries, transaction
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+
+from core.models import DoctorSearchIndex, Publication, Usuario
+from core.search import MAX_INDEXED_POSTS, fold_accents
+from core.views import busqueda_view
+
+BENCH_PREFIX = 'bench-'
+
+NOMBRES = ['Ana', 'Luis', 'María', 'José', 'Carmen', 'Jorge', 'Lucía', 'Andrés', 'Sofía', 'Camilo']
+APELLIDOS = ['Pérez', 'Gómez', 'Rodríguez', 'López', 'Martínez', 'García', 'Hernández', 'Ruiz', 'Díaz', 'Torres']
+ESPECIALIDADES = ['Cardiología', 'Pediatría', 'Dermatología', 'Neurología', 'Medicina General',
+                  'Ginecología', 'Oftalmología', 'Psiquiatría', 'Ortopedia', 'Endocrinología']
+VOCABULARIO = ['paciente', 'tratamiento', 'dolor', 'pecho', 'corazón', 'presión', 'arterial', 'niños',
+               'vacunas', 'piel', 'migraña', 'diabetes', 'control', 'consulta', 'síntomas', 'prevención',
+               'ejercicio', 'nutrición', 'sueño', 'estrés', 'infección', 'fiebre', 'alergia', 'análisis']
+
+QUERIES = {
+    '1 palabra': 'cardiología',
+    '5 palabras': 'pediatra dolor pecho fiebre niños',
+}
+
+
+class Command(BaseCommand):
+    help = ("Mide consultas y latencia de busqueda_view para búsquedas de 1 y 5 palabras. "
+            "Con --seed crea primero un dataset sintético (por defecto 100k usuarios y 1M publicaciones).")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', action='store_true', help='Crea el dataset sintético antes de medir.')
+        parser.add_argument('--cleanup', action='store_true', help='Borra el dataset sintético y termina.')
+        parser.add_argument('--users', type=int, default=100_000)
+        parser.add_argument('--posts', type=int, default=1_000_000)
+        parser.add_argument('--repeat', type=int, default=5, help='Repeticiones por consulta.')
+
+    def handle(self, *args, **options):
+        if options['cleanup']:
+            deleted, _ = Usuario.objects.filter(username__startswith=BENCH_PREFIX).delete()
+            self.stdout.write(self.style.SUCCESS(f'Eliminados {deleted} objetos del benchmark.'))
+            return
+
+        if options['seed']:
+            self.seed(options['users'], options['posts'])
+
+        viewer = Usuario.objects.filter(username__startswith=BENCH_PREFIX).first()
+        if viewer is None:
+            self.stderr.write('No hay datos de benchmark; ejecute con --seed.')
+            return
+
+        self.stdout.write(f'{"consulta":<12} {"página":<8} {"consultas SQL":>14} {"mediana ms":>11} {"máx ms":>8}')
+        for label, query in QUERIES.items():
+            for page_label, xhr in (('inicial', False), ('scroll', True)):
+                queries, timings = self.measure(viewer, query, xhr, options['repeat'])
+                self.stdout.write(
+                    f'{label:<12} {page_label:<8} {queries:>14} '
+                    f'{statistics.median(timings):>11.1f} {max(timings):>8.1f}'
+                )
+
+    def measure(self, viewer, query, xhr, repeat):
+        factory = RequestFactory()
+        cursor = None
+        if xhr:
+            # El scroll parte del cursor que entrega la primera página
+            request = factory.get('/busqueda/', {'q': query})
+            request.user = viewer
+            response = busqueda_view(request)
+            marker = 'data-cursor="'
+            content = response.content.decode()
+            if marker in content:
+                cursor = content.split(marker, 1)[1].split('"', 1)[0]
+
+        params = {'q': query}
+        headers = {}
+        if cursor:
+            params['cursor'] = cursor
+        if xhr:
+            headers['HTTP_X_REQUESTED_WITH'] = 'XMLHttpRequest'
+
+        timings = []
+        queries = 0
+        for _ in range(repeat):
+            request = factory.get('/busqueda/', params, **headers)
+            request.user = viewer
+            reset_queries()
+            with CaptureQueriesContext(connection) as ctx:
+                start = time.perf_counter()
+                busqueda_view(request)
+                timings.append((time.perf_counter() - start) * 1000)
+            queries = len(ctx.captured_queries)
+        return queries, timings
+
+    def seed(self, n_users, n_posts):
+        rng = random.Random(42)
+        password = make_password(None)
+        batch = 5000
+
+        self.stdout.write(f'Creando {n_users} usuarios...')
+        with transaction.atomic():
+            for start in range(0, n_users, batch):
+                Usuario.objects.bulk_create([
+                    Usuario(
+                        username=f'{BENCH_PREFIX}{i}',
+                        email=f'{BENCH_PREFIX}{i}@example.com',
+                        password=password,
+                        first_name=rng.choice(NOMBRES),
+                        last_name=rng.choice(APELLIDOS),
+                        # 1 de cada 5 es profesional
+                        es_profesional=(i % 5 == 0),
+                        es_paciente=(i % 5 != 0),
+                        especialidad=rng.choice(ESPECIALIDADES) if i % 5 == 0 else None,
+                        bio=' '.join(rng.choices(VOCABULARIO, k=12)) if i % 5 == 0 else None,
+                    )
+                    for i in range(start, min(start + batch, n_users))
+                ])
+
+        doctores = list(Usuario.objects.filter(username__startswith=BENCH_PREFIX, es_profesional=True).values_list('id', flat=True))
+        recientes = defaultdict(lambda: deque(maxlen=MAX_INDEXED_POSTS))
+
+        self.stdout.write(f'Creando {n_posts} publicaciones...')
+        with transaction.atomic():
+            for start in range(0, n_posts, batch):
+                pubs = []
+                for _ in range(min(batch, n_posts - start)):
+                    autor_id = rng.choice(doctores)
+                    contenido = ' '.join(rng.choices(VOCABULARIO, k=rng.randint(8, 30)))
+                    recientes[autor_id].append(contenido)
+                    pubs.append(Publication(autor_id=autor_id, contenido=contenido))
+                Publication.objects.bulk_create(pubs)
+
+        self.stdout.write('Indexando profesionales...')
+        with transaction.atomic():
+            docs = []
+            for usuario in Usuario.objects.filter(id__in=doctores).only('id', 'first_name', 'last_name', 'especialidad', 'bio').iterator():
+                nombre = f'{usuario.first_name} {usuario.last_name}'
+                docs.append(DoctorSearchIndex(
+                    usuario_id=usuario.id,
+                    nombre=nombre,
+                    autocompletar=fold_accents(f'{nombre} {usuario.especialidad or ""}'),
+                    especialidad=usuario.especialidad or '',
+                    bio=usuario.bio or '',
+                    publicaciones='\n'.join(reversed(recientes[usuario.id])),
+                ))
+                if len(docs) >= batch:
+                    DoctorSearchIndex.objects.bulk_create(docs)
+                    docs = []
+            DoctorSearchIndex.objects.bulk_create(docs)
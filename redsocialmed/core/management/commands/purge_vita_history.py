@@ -0,0 +1,31 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core import vita_history
+
+
+class Command(BaseCommand):
+    help = (
+        "Aplica la retención del historial de VITA: borra los mensajes ocultos por "
+        "'borrar historial', los más antiguos que VITA_HISTORY_MAX_AGE_DAYS y los que "
+        "exceden VITA_HISTORY_MAX_COUNT por usuario. Pensado para ejecutarse a diario."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--max-age-days', type=int, default=settings.VITA_HISTORY_MAX_AGE_DAYS,
+                            help='0 desactiva el límite de antigüedad.')
+        parser.add_argument('--max-count', type=int, default=settings.VITA_HISTORY_MAX_COUNT,
+                            help='0 desactiva el límite de mensajes por usuario.')
+        parser.add_argument('--chunk-size', type=int, default=vita_history.PURGE_CHUNK_SIZE)
+        parser.add_argument('--pause', type=float, default=0.1,
+                            help='Segundos de espera entre lotes para no saturar la base de datos.')
+
+    def handle(self, *args, **options):
+        chunk = {'chunk_size': options['chunk_size'], 'pause': options['pause']}
+        cleared = vita_history.purge_cleared(**chunk)
+        expired = vita_history.purge_expired(options['max_age_days'], **chunk)
+        excess = vita_history.purge_excess(options['max_count'], **chunk)
+        self.stdout.write(self.style.SUCCESS(
+            f'Mensajes borrados: {cleared} por borrado del usuario, {expired} por antigüedad, '
+            f'{excess} por exceso.'
+        ))
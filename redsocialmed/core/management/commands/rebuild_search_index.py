@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from core.models import DoctorSearchIndex, Usuario
+from core.search import index_doctor
+
+
+class Command(BaseCommand):
+    help = "Reconstruye el índice de búsqueda de profesionales (DoctorSearchIndex)."
+
+    def handle(self, *args, **options):
+        # Quita documentos de usuarios que ya no son profesionales
+        DoctorSearchIndex.objects.exclude(usuario__es_profesional=True).delete()
+
+        total = 0
+        for user_id in Usuario.objects.filter(es_profesional=True).values_list('id', flat=True).iterator():
+            index_doctor(user_id)
+            total += 1
+
+        self.stdout.write(self.style.SUCCESS(f'Índice reconstruido para {total} profesionales.'))
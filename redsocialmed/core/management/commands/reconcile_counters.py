@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from core.counters import reconcile_counters
+from core.models import Publication
+
+
+class Command(BaseCommand):
+    help = "Recalcula likes_total, dislikes_total y comentarios_total de las publicaciones desfasadas."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pub', type=int, action='append', dest='pub_ids',
+                            help='ID de publicación a revisar (puede repetirse). Por defecto, todas.')
+
+    def handle(self, *args, **options):
+        queryset = Publication.objects.all()
+        if options['pub_ids']:
+            queryset = queryset.filter(id__in=options['pub_ids'])
+
+        fixed = reconcile_counters(queryset)
+        self.stdout.write(self.style.SUCCESS(f'Contadores corregidos en {fixed} publicaciones.'))
@@ -0,0 +1,74 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.core.management.base import BaseCommand
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """
+    Imita GET /<doc_type>/<doc_num> de Verifik (ReTHUS):
+    - números que empiezan por 0: 404 (no encontrado)
+    - números que empiezan por 999: 500 (error del upstream)
+    - el resto: 200 con un profesional de prueba
+    """
+    delay = 0
+    lock = threading.Lock()
+    requests_served = 0
+
+    def do_GET(self):
+        with StubHandler.lock:
+            StubHandler.requests_served += 1
+        if self.delay:
+            time.sleep(self.delay)
+
+        parts = [p for p in self.path.split('?')[0].split('/') if p]
+        if len(parts) < 2:
+            return self._reply(400, {'code': 'BadRequest', 'message': 'Missing documentType/documentNumber'})
+        doc_type, doc_num = parts[-2], parts[-1]
+        if doc_num.startswith('999'):
+            return self._reply(500, {'code': 'InternalError', 'message': 'Stub failure'})
+        if doc_num.startswith('0'):
+            return self._reply(404, {'code': 'NotFound', 'message': 'Record not found.'})
+        self._reply(200, {'data': {
+            'documentType': doc_type,
+            'documentNumber': doc_num,
+            'fullName': 'PROFESIONAL DE PRUEBA',
+            'academicTitles': [{'title': 'MEDICINA', 'status': 'ACTIVO'}],
+        }})
+
+    def _reply(self, status, body):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Servidor local que imita la API ReTHUS de Verifik para desarrollo y pruebas sin conexión. "
+        "Usar con RETHUS_API_URL=http://127.0.0.1:<puerto> y cualquier VERIFIK_API_TOKEN."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument('--delay', type=float, default=0,
+                            help='Segundos de espera por respuesta (para probar timeouts y agrupación).')
+
+    def handle(self, *args, **options):
+        StubHandler.delay = options['delay']
+        server = ThreadingHTTPServer(('127.0.0.1', options['port']), StubHandler)
+        self.stdout.write(f'ReTHUS stub en http://127.0.0.1:{server.server_port}')
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            self.stdout.write(f'Consultas atendidas: {StubHandler.requests_served}')
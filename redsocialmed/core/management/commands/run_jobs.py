@@ -0,0 +1,84 @@
+import json
+import signal
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connections
+
+from core import jobs
+
+
+def _run_in_thread(job):
+    try:
+        jobs.run(job)
+    finally:
+        # Cada hilo tiene su propia conexión; se cierra para no acumularlas
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = ("Ejecuta los trabajos en segundo plano (BackgroundJob) con un pool de hilos. "
+            "Con --stats solo muestra la profundidad de la cola.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=settings.JOB_WORKER_CONCURRENCY)
+        parser.add_argument('--kind', action='append', dest='kinds',
+                            help='Tipo de trabajo a procesar (puede repetirse). Por defecto, todos.')
+        parser.add_argument('--interval', type=float, default=2.0,
+                            help='Segundos entre revisiones cuando la cola está vacía.')
+        parser.add_argument('--reap-interval', type=float, default=60.0,
+                            help='Segundos entre pasadas del reaper de leases vencidos.')
+        parser.add_argument('--prune-interval', type=float, default=3600.0,
+                            help='Segundos entre purgas de trabajos terminados (ver core.jobs.prune_finished).')
+        parser.add_argument('--once', action='store_true',
+                            help='Procesa lo que haya listo y termina.')
+        parser.add_argument('--stats', action='store_true')
+
+    def handle(self, *args, **options):
+        if options['stats']:
+            self.stdout.write(json.dumps(jobs.queue_stats(), indent=2))
+            return
+
+        self.stopping = False
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+        concurrency = max(1, options['concurrency'])
+        worker_id = jobs.new_worker_id()
+        self.stdout.write(f'Worker {worker_id} con {concurrency} hilos.')
+
+        running = set()
+        last_reap = 0
+        last_prune = 0
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            while not self.stopping:
+                close_old_connections()
+                if time.monotonic() - last_reap > options['reap_interval']:
+                    reaped = jobs.reap_stale()
+                    if reaped:
+                        self.stdout.write(f'Reencolados {reaped} trabajos con lease vencido.')
+                    last_reap = time.monotonic()
+                if time.monotonic() - last_prune > options['prune_interval']:
+                    pruned = jobs.prune_finished()
+                    if pruned:
+                        self.stdout.write(f'Purgados {pruned} trabajos terminados.')
+                    last_prune = time.monotonic()
+
+                for job in jobs.claim(worker_id, concurrency - len(running), options['kinds']):
+                    running.add(pool.submit(_run_in_thread, job))
+
+                if not running:
+                    if options['once']:
+                        break
+                    time.sleep(options['interval'])
+                    continue
+                # Espera a que se libere un hilo (o al intervalo, para ver trabajos nuevos)
+                done, running = wait(running, timeout=options['interval'], return_when=FIRST_COMPLETED)
+                running = set(running)
+            # Al salir, el pool espera a que terminen los trabajos en curso
+
+    def stop(self, *args):
+        self.stdout.write('Deteniendo: se terminan los trabajos en curso.')
+        self.stopping = True
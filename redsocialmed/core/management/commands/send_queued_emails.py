@@ -0,0 +1,39 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.outbox import BATCH_SIZE, prune_sent, send_batch
+
+
+# Cada cuánto (segundos) se purgan los correos ya enviados con --loop
+PRUNE_INTERVAL = 10 * 60
+
+
+class Command(BaseCommand):
+    help = (
+        "Envía los correos encolados en OutgoingEmail por lotes sobre una sola conexión SMTP "
+        "y borra los ya enviados pasadas OUTBOX_SENT_RETENTION_HOURS."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+        parser.add_argument('--loop', action='store_true',
+                            help='Sigue ejecutándose y revisa la cola cada --interval segundos.')
+        parser.add_argument('--interval', type=float, default=5.0)
+
+    def handle(self, *args, **options):
+        next_prune = 0
+        while True:
+            if time.monotonic() >= next_prune:
+                pruned = prune_sent()
+                if pruned:
+                    self.stdout.write(f'Purgados {pruned} correos enviados.')
+                next_prune = time.monotonic() + PRUNE_INTERVAL
+            sent, failed = send_batch(options['batch_size'])
+            if sent or failed:
+                self.stdout.write(f'Enviados {sent}, fallidos {failed}.')
+            if not options['loop']:
+                break
+            # Lote lleno: probablemente quedan más, se sigue sin esperar
+            if sent + failed < options['batch_size']:
+                time.sleep(options['interval'])
@@ -0,0 +1,33 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from core import media_gc
+
+
+class Command(BaseCommand):
+    help = (
+        "Borra del almacenamiento (disco o Spaces) los archivos de media que ningún registro "
+        "referencia, incluidos derivados de imágenes y videos, y aborta subidas multipart "
+        "abandonadas. Pensado para ejecutarse a diario."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--min-age-hours', type=float, default=media_gc.DEFAULT_MIN_AGE.total_seconds() / 3600,
+                            help='Solo borra archivos más antiguos (protege subidas en curso).')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Lista los huérfanos sin borrarlos.')
+
+    def handle(self, *args, **options):
+        min_age = timedelta(hours=options['min_age_hours'])
+        orphans = media_gc.sweep(min_age, dry_run=options['dry_run'])
+        if options['dry_run']:
+            for name in orphans:
+                self.stdout.write(name)
+            self.stdout.write(self.style.SUCCESS(f'{len(orphans)} archivos huérfanos (sin borrar).'))
+            return
+
+        aborted = media_gc.abort_stale_uploads(min_age)
+        self.stdout.write(self.style.SUCCESS(
+            f'Archivos huérfanos borrados: {len(orphans)}. Subidas incompletas abortadas: {aborted}.'
+        ))
@@ -0,0 +1,211 @@
+"""Recolección de archivos de media huérfanos (disco local o Spaces).
+
+Dos mecanismos:
+
+- Borrado en cola: al reemplazar o quitar un archivo (foto de perfil,
+  imagen o video de una publicación) y al borrar la fila, core.signals
+  calcula qué nombres dejaron de usarse, incluidos sus derivados
+  (core.images, core.video), y encola core.tasks.MEDIA_DELETE al confirmar
+  la transacción. La petición no espera ninguna llamada al almacenamiento.
+- Barrido periódico (manage.py sweep_media): lista las claves del
+  almacenamiento bajo las carpetas de los FileField y borra las que ningún
+  registro referencia. Recoge lo que el borrado en cola no ve: derivados de
+  un archivo reemplazado mientras se generaban, subidas directas que nunca
+  se completaron como publicación, archivos de antes de este módulo.
+  Solo toca archivos con más de `min_age` de antigüedad, así no borra
+  subidas en curso cuya fila aún no existe.
+"""
+from datetime import timedelta
+
+from django.apps import apps
+from django.core.files.storage import default_storage
+from django.db import models
+from django.utils import timezone
+
+# Campo fuente -> campos con sus derivados (FileField o JSON de variantes)
+TRACKED = {
+    'core.publication': {
+        'imagen': ('imagen_variantes',),
+        'video': ('video_web', 'video_poster'),
+    },
+    'core.usuario': {
+        'foto_perfil': ('foto_perfil_variantes',),
+    },
+}
+# delete_objects de S3 acepta hasta 1000 claves por llamada
+DELETE_BATCH = 1000
+DEFAULT_MIN_AGE = timedelta(hours=24)
+
+
+def _names(value):
+    """Nombres de archivo en un valor de FileField o en un JSON de variantes."""
+    if not value:
+        return []
+    if isinstance(value, dict):
+        # {"src": ..., "avif": {"240": nombre, ...}, ...}; src es el original
+        return [name for sizes in value.values() if isinstance(sizes, dict) for name in sizes.values() if name]
+    return [getattr(value, 'name', value)]
+
+
+def _tracked(instance):
+    return TRACKED.get(instance._meta.label_lower, {})
+
+
+def _row_names(row, source, derived):
+    names = _names(row[source])
+    for field in derived:
+        names += _names(row[field])
+    return names
+
+
+def replaced_names(sender, instance, update_fields=None):
+    """
+    Archivos que dejarán de usarse al guardar `instance` (para pre_save): el
+    archivo anterior de cada campo fuente que cambia, con sus derivados.
+    """
+    tracked = _tracked(instance)
+    if not tracked or instance.pk is None:
+        return []
+    sources = [s for s in tracked if update_fields is None or s in update_fields]
+    if not sources:
+        return []
+    fields = [f for s in sources for f in (s, *tracked[s])]
+    row = sender._base_manager.filter(pk=instance.pk).values(*fields).first()
+    if row is None:
+        return []
+
+    names = []
+    for source in sources:
+        old = row[source] or ''
+        current = getattr(instance, source)
+        if old and old != (current.name if current else ''):
+            names += _row_names(row, source, tracked[source])
+    return names
+
+
+def instance_names(instance):
+    """Todos los archivos de `instance` (para post_delete)."""
+    names = []
+    for source, derived in _tracked(instance).items():
+        names += _names(getattr(instance, source))
+        for field in derived:
+            names += _names(getattr(instance, field))
+    return names
+
+
+def _file_fields():
+    for model in apps.get_models():
+        for field in model._meta.get_fields():
+            if isinstance(field, models.FileField):
+                yield model, field
+
+
+def still_referenced(names):
+    """Los `names` que algún FileField sigue usando (p. ej. un reemplazo revertido)."""
+    found = set()
+    for model, field in _file_fields():
+        found.update(model._base_manager.filter(**{f'{field.name}__in': names}).values_list(field.name, flat=True))
+    return found
+
+
+def _delete(names):
+    names = sorted(set(names))
+    if hasattr(default_storage, 'bucket'):
+        client = default_storage.bucket.meta.client
+        for i in range(0, len(names), DELETE_BATCH):
+            batch = names[i:i + DELETE_BATCH]
+            client.delete_objects(Bucket=default_storage.bucket_name, Delete={
+                'Objects': [{'Key': default_storage._normalize_name(name)} for name in batch],
+                'Quiet': True,
+            })
+    else:
+        for name in names:
+            default_storage.delete(name)
+    return len(names)
+
+
+def delete(names):
+    """Borra del almacenamiento los `names` que ya nadie referencia."""
+    names = set(names)
+    if not names:
+        return 0
+    return _delete(names - still_referenced(list(names)))
+
+
+def referenced_names():
+    """Todos los nombres que la base de datos referencia, incluidos derivados y defaults."""
+    referenced = set()
+    for model, field in _file_fields():
+        if isinstance(field.default, str) and field.default:
+            referenced.add(field.default)
+        qs = model._base_manager.exclude(**{field.name: ''}).exclude(**{f'{field.name}__isnull': True})
+        referenced.update(qs.values_list(field.name, flat=True).iterator())
+    for label, tracked in TRACKED.items():
+        model = apps.get_model(label)
+        for derived in tracked.values():
+            for field in derived:
+                if isinstance(model._meta.get_field(field), models.JSONField):
+                    for value in model._base_manager.values_list(field, flat=True).iterator():
+                        referenced.update(_names(value))
+    return referenced
+
+
+def storage_prefixes():
+    """Carpetas raíz de los upload_to de los FileField (publicaciones/, perfiles/, ...)."""
+    prefixes = set()
+    for _model, field in _file_fields():
+        if isinstance(field.upload_to, str) and field.upload_to:
+            prefixes.add(field.upload_to.strip('/').split('/')[0] + '/')
+    return sorted(prefixes)
+
+
+def _walk(path):
+    dirs, files = default_storage.listdir(path)
+    for name in files:
+        yield f'{path}/{name}'
+    for directory in dirs:
+        yield from _walk(f'{path}/{directory}')
+
+
+def list_files(prefix):
+    """(nombre, modificado) de cada archivo bajo `prefix`."""
+    if hasattr(default_storage, 'bucket'):
+        location = default_storage.location.strip('/')
+        strip = f'{location}/' if location else ''
+        for obj in default_storage.bucket.objects.filter(Prefix=default_storage._normalize_name(prefix)):
+            yield obj.key[len(strip):], obj.last_modified
+        return
+    if not default_storage.exists(prefix.rstrip('/')):
+        return
+    for name in _walk(prefix.rstrip('/')):
+        yield name, default_storage.get_modified_time(name)
+
+
+def find_orphans(min_age=DEFAULT_MIN_AGE):
+    cutoff = timezone.now() - min_age
+    referenced = referenced_names()
+    for prefix in storage_prefixes():
+        for name, modified in list_files(prefix):
+            if name not in referenced and modified < cutoff:
+                yield name
+
+
+def abort_stale_uploads(min_age=DEFAULT_MIN_AGE):
+    """Aborta subidas multipart (core.direct_upload) abandonadas; solo en S3."""
+    if not hasattr(default_storage, 'bucket'):
+        return 0
+    cutoff = timezone.now() - min_age
+    aborted = 0
+    for upload in default_storage.bucket.multipart_uploads.all():
+        if upload.initiated < cutoff:
+            upload.abort()
+            aborted += 1
+    return aborted
+
+
+def sweep(min_age=DEFAULT_MIN_AGE, dry_run=False):
+    """Borra los huérfanos con más de `min_age`. Devuelve la lista de nombres."""
+    orphans = list(find_orphans(min_age))
+    if orphans and not dry_run:
+        _delete(orphans)
+    return orphans
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.4 on 2026-10-18 10:26
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_timeline(apps, schema_editor):
+    Usuario = apps.get_model('core', 'Usuario')
+    Publication = apps.get_model('core', 'Publication')
+    TimelineEntry = apps.get_model('core', 'TimelineEntry')
+    Follow = Usuario.seguidores.through
+
+    entries = []
+    for pub_id, autor_id, creado in Publication.objects.values_list('id', 'autor_id', 'creado').iterator():
+        entries.append(TimelineEntry(user_id=autor_id, publicacion_id=pub_id, creado=creado))
+        # autor.seguidores.add(seguidor) guarda from_usuario=autor, to_usuario=seguidor
+        for follower_id in Follow.objects.filter(from_usuario_id=autor_id).values_list('to_usuario_id', flat=True):
+            entries.append(TimelineEntry(user_id=follower_id, publicacion_id=pub_id, creado=creado))
+        if len(entries) >= 1000:
+            TimelineEntry.objects.bulk_create(entries, ignore_conflicts=True)
+            entries = []
+    TimelineEntry.objects.bulk_create(entries, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_userwidgetpreference_rojito_window_count_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TimelineEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('creado', models.DateTimeField()),
+                ('publicacion', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeline_entries', to='core.publication')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeline_entries', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', '-creado'], name='core_timeli_user_id_29d2f7_idx')],
+                'unique_together': {('user', 'publicacion')},
+            },
+        ),
+        migrations.RunPython(backfill_timeline, migrations.RunPython.noop),
+    ]
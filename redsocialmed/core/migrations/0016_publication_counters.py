@@ -0,0 +1,49 @@
+# Generated by Django 5.2.4 on 2026-10-18 10:28
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def populate_counters(apps, schema_editor):
+    Publication = apps.get_model('core', 'Publication')
+    Comentario = apps.get_model('core', 'Comentario')
+
+    def count_of(model, fk_name):
+        counts = (
+            model.objects.filter(**{fk_name: OuterRef('pk')})
+            .order_by().values(fk_name).annotate(c=Count('*')).values('c')
+        )
+        return Coalesce(Subquery(counts, output_field=IntegerField()), Value(0))
+
+    Publication.objects.update(
+        likes_total=count_of(Publication.likes.through, 'publication'),
+        dislikes_total=count_of(Publication.dislikes.through, 'publication'),
+        comentarios_total=count_of(Comentario, 'publicacion'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_timelineentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='publication',
+            name='comentarios_total',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='publication',
+            name='dislikes_total',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='publication',
+            name='likes_total',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(populate_counters, migrations.RunPython.noop),
+    ]
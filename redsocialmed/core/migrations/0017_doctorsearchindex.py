@@ -0,0 +1,133 @@
+# Generated by Django 5.2.4 on 2026-10-18 10:31
+
+import django.contrib.postgres.search
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+# Los triggers mantienen el índice a partir de las columnas de texto, de modo
+# que la aplicación solo escribe filas de DoctorSearchIndex.
+POSTGRES_FORWARD = [
+    "CREATE EXTENSION IF NOT EXISTS unaccent",
+    """
+    DO $$ BEGIN
+        IF NOT EXISTS (SELECT 1 FROM pg_ts_config WHERE cfgname = 'spanish_unaccent') THEN
+            CREATE TEXT SEARCH CONFIGURATION spanish_unaccent (COPY = spanish);
+            ALTER TEXT SEARCH CONFIGURATION spanish_unaccent
+                ALTER MAPPING FOR hword, hword_part, word WITH unaccent, spanish_stem;
+        END IF;
+    END $$
+    """,
+    """
+    CREATE FUNCTION core_doctorsearchindex_tsv() RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector :=
+            setweight(to_tsvector('spanish_unaccent', coalesce(NEW.nombre, '')), 'A') ||
+            setweight(to_tsvector('spanish_unaccent', coalesce(NEW.especialidad, '')), 'A') ||
+            setweight(to_tsvector('spanish_unaccent', coalesce(NEW.bio, '')), 'B') ||
+            setweight(to_tsvector('spanish_unaccent', coalesce(NEW.publicaciones, '')), 'C');
+        RETURN NEW;
+    END $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE TRIGGER core_doctorsearchindex_tsv_update
+        BEFORE INSERT OR UPDATE ON core_doctorsearchindex
+        FOR EACH ROW EXECUTE FUNCTION core_doctorsearchindex_tsv()
+    """,
+    "CREATE INDEX core_doctorsearchindex_vector_gin ON core_doctorsearchindex USING gin (search_vector)",
+]
+
+POSTGRES_REVERSE = [
+    "DROP INDEX IF EXISTS core_doctorsearchindex_vector_gin",
+    "DROP TRIGGER IF EXISTS core_doctorsearchindex_tsv_update ON core_doctorsearchindex",
+    "DROP FUNCTION IF EXISTS core_doctorsearchindex_tsv()",
+]
+
+# Tabla FTS5 "external content" sobre core_doctorsearchindex. unicode61 con
+# remove_diacritics hace el plegado de acentos.
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE core_doctor_fts USING fts5(
+        nombre, especialidad, bio, publicaciones,
+        content='core_doctorsearchindex', content_rowid='usuario_id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS core_doctor_fts_ai AFTER INSERT ON core_doctorsearchindex BEGIN
+        INSERT INTO core_doctor_fts(rowid, nombre, especialidad, bio, publicaciones)
+        VALUES (new.usuario_id, new.nombre, new.especialidad, new.bio, new.publicaciones);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS core_doctor_fts_ad AFTER DELETE ON core_doctorsearchindex BEGIN
+        INSERT INTO core_doctor_fts(core_doctor_fts, rowid, nombre, especialidad, bio, publicaciones)
+        VALUES ('delete', old.usuario_id, old.nombre, old.especialidad, old.bio, old.publicaciones);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS core_doctor_fts_au AFTER UPDATE ON core_doctorsearchindex BEGIN
+        INSERT INTO core_doctor_fts(core_doctor_fts, rowid, nombre, especialidad, bio, publicaciones)
+        VALUES ('delete', old.usuario_id, old.nombre, old.especialidad, old.bio, old.publicaciones);
+        INSERT INTO core_doctor_fts(rowid, nombre, especialidad, bio, publicaciones)
+        VALUES (new.usuario_id, new.nombre, new.especialidad, new.bio, new.publicaciones);
+    END
+    """,
+]
+
+SQLITE_REVERSE = [
+    "DROP TRIGGER IF EXISTS core_doctor_fts_au",
+    "DROP TRIGGER IF EXISTS core_doctor_fts_ad",
+    "DROP TRIGGER IF EXISTS core_doctor_fts_ai",
+    "DROP TABLE IF EXISTS core_doctor_fts",
+]
+
+
+def _run(statements_by_vendor):
+    def run(apps, schema_editor):
+        for statement in statements_by_vendor.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(statement)
+    return run
+
+
+def populate_index(apps, schema_editor):
+    Usuario = apps.get_model('core', 'Usuario')
+    Publication = apps.get_model('core', 'Publication')
+    DoctorSearchIndex = apps.get_model('core', 'DoctorSearchIndex')
+
+    for usuario in Usuario.objects.filter(es_profesional=True).iterator():
+        contenidos = Publication.objects.filter(autor=usuario).order_by('-creado').values_list('contenido', flat=True)[:200]
+        DoctorSearchIndex.objects.create(
+            usuario=usuario,
+            nombre=f'{usuario.first_name} {usuario.last_name}'.strip(),
+            especialidad=usuario.especialidad or '',
+            bio=usuario.bio or '',
+            publicaciones='\n'.join(contenidos),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0016_publication_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DoctorSearchIndex',
+            fields=[
+                ('usuario', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search_index', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('nombre', models.TextField(blank=True)),
+                ('especialidad', models.TextField(blank=True)),
+                ('bio', models.TextField(blank=True)),
+                ('publicaciones', models.TextField(blank=True)),
+                ('search_vector', django.contrib.postgres.search.SearchVectorField(editable=False, null=True)),
+            ],
+        ),
+        migrations.RunPython(
+            _run({'postgresql': POSTGRES_FORWARD, 'sqlite': SQLITE_FORWARD}),
+            _run({'postgresql': POSTGRES_REVERSE, 'sqlite': SQLITE_REVERSE}),
+        ),
+        migrations.RunPython(populate_index, migrations.RunPython.noop),
+    ]
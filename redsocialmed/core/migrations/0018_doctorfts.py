@@ -0,0 +1,27 @@
+# Generated by Django 5.2.4 on 2026-10-18 10:35
+
+import core.models
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0017_doctorsearchindex'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DoctorFTS',
+            fields=[
+                ('usuario', models.OneToOneField(db_column='rowid', db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='fts', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('documento', core.models.FTS5Field(db_column='core_doctor_fts')),
+            ],
+            options={
+                'db_table': 'core_doctor_fts',
+                'managed': False,
+            },
+        ),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 5.2.4 on 2026-10-18 10:42
+
+import importlib
+import unicodedata
+
+from django.db import migrations, models
+
+search_index_migration = importlib.import_module('core.migrations.0017_doctorsearchindex')
+
+POSTGRES_FORWARD = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX core_doctorsearchindex_autocompletar_trgm ON core_doctorsearchindex USING gin (autocompletar gin_trgm_ops)",
+]
+
+POSTGRES_REVERSE = [
+    "DROP INDEX IF EXISTS core_doctorsearchindex_autocompletar_trgm",
+]
+
+
+def forward(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        statements = POSTGRES_FORWARD
+    elif vendor == 'sqlite':
+        # AddField en SQLite reconstruye la tabla y con ello borra los
+        # triggers FTS5 de la 0017; se vuelven a crear.
+        statements = search_index_migration.SQLITE_FORWARD[1:]
+    else:
+        statements = []
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def reverse(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        for statement in POSTGRES_REVERSE:
+            schema_editor.execute(statement)
+
+
+def populate_autocompletar(apps, schema_editor):
+    DoctorSearchIndex = apps.get_model('core', 'DoctorSearchIndex')
+
+    def fold(text):
+        return ''.join(c for c in unicodedata.normalize('NFD', text) if unicodedata.category(c) != 'Mn').lower()
+
+    for doc in DoctorSearchIndex.objects.iterator():
+        doc.autocompletar = fold(f'{doc.nombre} {doc.especialidad}')
+        doc.save(update_fields=['autocompletar'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0018_doctorfts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='doctorsearchindex',
+            name='autocompletar',
+            field=models.TextField(blank=True),
+        ),
+        migrations.RunPython(forward, reverse),
+        migrations.RunPython(populate_autocompletar, migrations.RunPython.noop),
+    ]
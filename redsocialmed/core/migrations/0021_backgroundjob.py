@@ -0,0 +1,44 @@
+# Generated by Django 5.2.4 on 2026-10-18 10:45
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def fail_orphan_analyses(apps, schema_editor):
+    # Los análisis lanzados con threading.Thread que murieron con su worker
+    # no tienen trabajo asociado y nunca van a terminar.
+    BloodAnalysis = apps.get_model('core', 'BloodAnalysis')
+    BloodAnalysis.objects.filter(status='processing').update(
+        status='failed', result='El análisis se interrumpió. Intenta nuevamente.'
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0020_outgoingemail'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BackgroundJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(max_length=50)),
+                ('payload', models.JSONField(default=dict)),
+                ('status', models.CharField(choices=[('PENDING', 'Pendiente'), ('RUNNING', 'En ejecución'), ('DONE', 'Terminado'), ('FAILED', 'Fallido')], default='PENDING', max_length=10)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('max_attempts', models.PositiveSmallIntegerField(default=3)),
+                ('run_after', models.DateTimeField(default=django.utils.timezone.now)),
+                ('lease_owner', models.CharField(blank=True, max_length=64)),
+                ('locked_until', models.DateTimeField(blank=True, null=True)),
+                ('last_error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'run_after'], name='core_backgr_status_24aba0_idx'), models.Index(fields=['status', 'locked_until'], name='core_backgr_status_bf872a_idx')],
+            },
+        ),
+        migrations.RunPython(fail_orphan_analyses, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.2.4 on 2026-10-18 10:52
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from datetime import timedelta
+
+from django.db import migrations, models
+
+
+def carry_over_windows(apps, schema_editor):
+    # Los usos de la ventana fija aún vigente pasan a la ventana deslizante
+    UserWidgetPreference = apps.get_model('core', 'UserWidgetPreference')
+    QuotaUsage = apps.get_model('core', 'QuotaUsage')
+    since = django.utils.timezone.now() - timedelta(hours=24)
+    usages = []
+    for pref in UserWidgetPreference.objects.filter(rojito_window_start__gte=since, rojito_window_count__gt=0):
+        usages.extend(
+            QuotaUsage(user_id=pref.user_id, scope='rojito', status='committed', created_at=pref.rojito_window_start)
+            for _ in range(pref.rojito_window_count)
+        )
+    QuotaUsage.objects.bulk_create(usages)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0021_backgroundjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QuotaUsage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scope', models.CharField(max_length=30)),
+                ('status', models.CharField(choices=[('reserved', 'Reservado'), ('committed', 'Consumido')], default='reserved', max_length=10)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='quota_usages', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'scope', 'created_at'], name='core_quotau_user_id_671d43_idx')],
+            },
+        ),
+        migrations.RunPython(carry_over_windows, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='userwidgetpreference',
+            name='rojito_window_count',
+        ),
+        migrations.RemoveField(
+            model_name='userwidgetpreference',
+            name='rojito_window_start',
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.4 on 2026-10-18 10:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0022_quotausage'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='bloodanalysis',
+            index=models.Index(fields=['user', '-created_at'], name='core_blooda_user_id_604955_idx'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.4 on 2026-10-18 10:56
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0023_bloodanalysis_user_created_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vitachatmessage',
+            name='client_seq',
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+        migrations.AlterField(
+            model_name='vitachatmessage',
+            name='timestamp',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddConstraint(
+            model_name='vitachatmessage',
+            constraint=models.UniqueConstraint(condition=models.Q(('client_seq__isnull', False)), fields=('user', 'client_seq'), name='vita_message_client_seq_unique'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-18 10:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0024_vitachatmessage_client_seq'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userwidgetpreference',
+            name='vita_history_cleared_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.4 on 2026-10-18 11:01
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0025_userwidgetpreference_vita_history_cleared_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RethusVerification',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('doc_type', models.CharField(max_length=5)),
+                ('doc_num', models.CharField(max_length=30)),
+                ('found', models.BooleanField()),
+                ('data', models.JSONField(blank=True, null=True)),
+                ('checked_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('expires_at', models.DateTimeField()),
+            ],
+            options={
+                'unique_together': {('doc_type', 'doc_num')},
+            },
+        ),
+    ]
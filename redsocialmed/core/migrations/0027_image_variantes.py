@@ -0,0 +1,23 @@
+# Generated by Django 5.2.4 on 2026-10-18 11:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0026_rethusverification'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='publication',
+            name='imagen_variantes',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name='usuario',
+            name='foto_perfil_variantes',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.4 on 2026-10-18 11:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0027_image_variantes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='publication',
+            name='video_estado',
+            field=models.CharField(blank=True, choices=[('pendiente', 'Pendiente'), ('procesando', 'Procesando'), ('listo', 'Listo'), ('fallido', 'Fallido')], max_length=10),
+        ),
+        migrations.AddField(
+            model_name='publication',
+            name='video_poster',
+            field=models.ImageField(blank=True, null=True, upload_to='publicaciones/derivados/'),
+        ),
+        migrations.AddField(
+            model_name='publication',
+            name='video_web',
+            field=models.FileField(blank=True, null=True, upload_to='publicaciones/derivados/'),
+        ),
+    ]
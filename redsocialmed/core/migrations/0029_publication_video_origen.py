@@ -0,0 +1,26 @@
+# Generated by Django 5.2.4 on 2026-10-18 11:20
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def fill_video_origen(apps, schema_editor):
+    # Los videos ya encolados o procesados se refieren a su video actual
+    Publication = apps.get_model('core', 'Publication')
+    Publication.objects.exclude(video_estado='').update(video_origen=F('video'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0028_video_web'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='publication',
+            name='video_origen',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.RunPython(fill_video_origen, migrations.RunPython.noop),
+    ]
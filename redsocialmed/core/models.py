@@ -1,4 +1,5 @@
 from django.contrib.auth.models import AbstractUser
+from django.contrib.postgres.search import SearchVectorField
 from django.conf import settings
 from django.db import models
 from django.utils import timezone
@@ -20,11 +21,29 @@ class Publication(models.Model):
     autor = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, db_index=True)
     contenido = models.TextField()
     imagen = models.ImageField(upload_to='publicaciones/', blank=True, null=True)
+    # Tamaños AVIF/WebP de `imagen`, generados en segundo plano (core.images)
+    imagen_variantes = models.JSONField(default=dict, blank=True)
     video = models.FileField(upload_to='publicaciones/', blank=True, null=True)
+    # Póster y versión MP4 para web de `video`, generados con ffmpeg en el worker (core.video)
+    video_estado = models.CharField(max_length=10, blank=True, choices=[
+        ('pendiente', 'Pendiente'),
+        ('procesando', 'Procesando'),
+        ('listo', 'Listo'),
+        ('fallido', 'Fallido'),
+    ])
+    # Video al que se refiere video_estado (como `src` en imagen_variantes)
+    video_origen = models.CharField(max_length=255, blank=True)
+    video_web = models.FileField(upload_to='publicaciones/derivados/', blank=True, null=True)
+    video_poster = models.ImageField(upload_to='publicaciones/derivados/', blank=True, null=True)
     likes = models.ManyToManyField(settings.AUTH_USER_MODEL, related_name='likes', blank=True)
     dislikes = models.ManyToManyField(settings.AUTH_USER_MODEL, related_name='dislikes', blank=True)
     creado = models.DateTimeField(auto_now_add=True, db_index=True)
 
+    # Contadores denormalizados, mantenidos con F() por core.signals
+    likes_total = models.PositiveIntegerField(default=0)
+    dislikes_total = models.PositiveIntegerField(default=0)
+    comentarios_total = models.PositiveIntegerField(default=0)
+
     class Meta:
         ordering = ['-creado']
         indexes = [
@@ -35,13 +54,20 @@ class Publication(models.Model):
         return f'{self.autor.username} - {self.creado.strftime("%Y-%m-%d %H:%M")}'
     
     def likes_count(self):
-        return self.likes.count()
+        return self.likes_total
     
     def dislikes_count(self):
-        return self.dislikes.count()
+        return self.dislikes_total
     
     def comentarios_count(self):
-        return self.comentarios.count()
+        return self.comentarios_total
+
+    @property
+    def video_url(self):
+        """URL a reproducir: la versión web si ya está lista, si no el original."""
+        if self.video_estado == 'listo' and self.video_web:
+            return self.video_web.url
+        return self.video.url if self.video else ''
 
 
 class Comentario(models.Model):
@@ -60,6 +86,23 @@ class Comentario(models.Model):
         return f'Comentario de {self.autor.username}'
 
 
+class TimelineEntry(models.Model):
+    """Entrada materializada del feed: una publicación visible en el inicio de un usuario."""
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='timeline_entries')
+    publicacion = models.ForeignKey(Publication, on_delete=models.CASCADE, related_name='timeline_entries')
+    # Copia de Publication.creado para ordenar sin hacer JOIN
+    creado = models.DateTimeField()
+
+    class Meta:
+        unique_together = ('user', 'publicacion')
+        indexes = [
+            models.Index(fields=['user', '-creado']),
+        ]
+
+    def __str__(self):
+        return f"Timeline {self.user_id} - {self.publicacion_id}"
+
+
 class Usuario(AbstractUser):
     es_profesional = models.BooleanField(default=False)
     es_paciente = models.BooleanField(default=False)
@@ -72,6 +115,7 @@ class Usuario(AbstractUser):
     ]
     titulo_profesional = models.CharField(max_length=10, choices=TITULO_CHOICES, blank=True, null=True)
     foto_perfil = models.ImageField(upload_to='perfiles/', null=True, blank=True)
+    foto_perfil_variantes = models.JSONField(default=dict, blank=True)
     bio = models.TextField(blank=True, null=True)
     seguidores = models.ManyToManyField('self', symmetrical=False, related_name='siguiendo', blank=True)
     
@@ -96,6 +140,56 @@ class Usuario(AbstractUser):
         return self.siguiendo.count()
 
 
+class DoctorSearchIndex(models.Model):
+    """
+    Documento de búsqueda de un profesional (ver core.search).
+
+    La indexación real la hace la base de datos con triggers: en Postgres
+    llenan `search_vector` (GIN, config spanish_unaccent); en SQLite
+    alimentan la tabla FTS5 core_doctor_fts.
+    """
+    usuario = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, primary_key=True, related_name='search_index')
+    nombre = models.TextField(blank=True)
+    especialidad = models.TextField(blank=True)
+    bio = models.TextField(blank=True)
+    publicaciones = models.TextField(blank=True)
+    search_vector = SearchVectorField(null=True, editable=False)
+    # Nombre y especialidad sin acentos, para autocompletar (trigramas en Postgres)
+    autocompletar = models.TextField(blank=True)
+
+    def __str__(self):
+        return f"Índice de búsqueda de {self.usuario_id}"
+
+
+class FTS5Field(models.TextField):
+    """Columna oculta de una tabla FTS5; admite el lookup `fts_match`."""
+
+
+@FTS5Field.register_lookup
+class FTS5Match(models.Lookup):
+    lookup_name = 'fts_match'
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f'{lhs} MATCH {rhs}', lhs_params + rhs_params
+
+
+class DoctorFTS(models.Model):
+    """
+    Vista ORM de la tabla FTS5 core_doctor_fts (solo SQLite, creada en la
+    migración 0017). Permite hacer JOIN con Usuario en vez de subconsultas
+    correlacionadas por fila.
+    """
+    usuario = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.DO_NOTHING, primary_key=True,
+                                   db_column='rowid', db_constraint=False, related_name='fts')
+    documento = FTS5Field(db_column='core_doctor_fts')
+
+    class Meta:
+        managed = False
+        db_table = 'core_doctor_fts'
+
+
 class DailyChatQuota(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     date = models.DateField(default=timezone.now)
@@ -113,6 +207,12 @@ class BloodAnalysis(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # Último análisis del usuario (estado, long-poll, historial)
+            models.Index(fields=['user', '-created_at']),
+        ]
+
     def __str__(self):
         return f"Analysis {self.id} for {self.user.username}"
 
@@ -141,13 +241,24 @@ class VitaChatMessage(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='vita_messages')
     role = models.CharField(max_length=10, choices=[('user', 'User'), ('bot', 'Bot')])
     content = models.TextField()
-    timestamp = models.DateTimeField(auto_now_add=True)
-    
+    # default en vez de auto_now_add: un lote guarda sus mensajes con marcas
+    # de tiempo crecientes para conservar el orden (core.vita_history)
+    timestamp = models.DateTimeField(default=timezone.now)
+    # Id de secuencia generado por el cliente; hace idempotentes los reintentos
+    client_seq = models.CharField(max_length=64, null=True, blank=True)
+
     class Meta:
         ordering = ['timestamp']
         indexes = [
             models.Index(fields=['user', 'timestamp']),
         ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'client_seq'],
+                condition=models.Q(client_seq__isnull=False),
+                name='vita_message_client_seq_unique',
+            ),
+        ]
 
     def __str__(self):
         return f"{self.user.username} - {self.role} - {self.timestamp}"
@@ -167,11 +278,114 @@ class UserWidgetPreference(models.Model):
     # ROJITO Counter
     rojito_lifetime_count = models.IntegerField(default=0)
     
-    # ROJITO Daily Limit (Window based)
-    rojito_window_start = models.DateTimeField(null=True, blank=True)
-    rojito_window_count = models.IntegerField(default=0)
-    
+    # El límite diario de ROJITO vive en QuotaUsage (core.quotas)
+
+    # "Borrar historial" de VITA: los mensajes hasta esta fecha se ocultan al
+    # instante y se eliminan después en segundo plano (core.vita_history)
+    vita_history_cleared_at = models.DateTimeField(null=True, blank=True)
+
     updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f"Preferences for {self.user.username}"
+
+
+class OutgoingEmail(models.Model):
+    """Correo pendiente de envío; lo despacha el comando send_queued_emails (ver core.outbox)."""
+    STATUS_CHOICES = [
+        ('PENDING', 'Pendiente'),
+        ('SENDING', 'Enviando'),
+        ('SENT', 'Enviado'),
+        ('FAILED', 'Fallido'),
+    ]
+
+    to_email = models.EmailField()
+    from_email = models.CharField(max_length=255, blank=True)
+    subject = models.CharField(max_length=255)
+    body = models.TextField(blank=True)
+    html_body = models.TextField(blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='PENDING')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    # Mientras está en SENDING, otro worker no lo toma hasta que vence el lease
+    locked_until = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} -> {self.to_email} ({self.status})"
+
+
+class BackgroundJob(models.Model):
+    """Trabajo en segundo plano; lo ejecuta el comando run_jobs (ver core.jobs)."""
+    STATUS_CHOICES = [
+        ('PENDING', 'Pendiente'),
+        ('RUNNING', 'En ejecución'),
+        ('DONE', 'Terminado'),
+        ('FAILED', 'Fallido'),
+    ]
+
+    kind = models.CharField(max_length=50)
+    payload = models.JSONField(default=dict)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='PENDING')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=3)
+    run_after = models.DateTimeField(default=timezone.now)
+    # Worker que tiene el trabajo y hasta cuándo; si vence, el reaper lo reencola
+    lease_owner = models.CharField(max_length=64, blank=True)
+    locked_until = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'run_after']),
+            models.Index(fields=['status', 'locked_until']),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} #{self.id} ({self.status})"
+
+
+class QuotaUsage(models.Model):
+    """Un uso de un cupo con ventana deslizante (ver core.quotas.SlidingWindowQuota)."""
+    STATUS_CHOICES = [
+        ('reserved', 'Reservado'),
+        ('committed', 'Consumido'),
+    ]
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='quota_usages')
+    scope = models.CharField(max_length=30)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='reserved')
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'scope', 'created_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.scope} {self.user_id} ({self.status})"
+
+
+class RethusVerification(models.Model):
+    """Resultado de una consulta a ReTHUS (Verifik) guardado como caché persistente (ver core.rethus)."""
+    doc_type = models.CharField(max_length=5)
+    doc_num = models.CharField(max_length=30)
+    found = models.BooleanField()
+    data = models.JSONField(null=True, blank=True)
+    checked_at = models.DateTimeField(default=timezone.now)
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        unique_together = ('doc_type', 'doc_num')
+
+    def __str__(self):
+        return f"{self.doc_type} {self.doc_num} ({'encontrado' if self.found else 'no encontrado'})"
@@ -0,0 +1,34 @@
+"""Notificaciones del sidebar: últimas publicaciones de los médicos seguidos.
+
+Se leen del timeline materializado (core.timeline) y se cachean por
+usuario. Se invalidan al publicar un autor seguido, al seguir/dejar de
+seguir y al eliminar una publicación.
+"""
+from django.core.cache import cache
+
+from .models import Publication
+
+NOTIFICATIONS_LIMIT = 2
+NOTIFICATIONS_TTL = 60 * 5
+
+
+def _cache_key(user_id):
+    return f'recent_notifications:{user_id}'
+
+
+def get_recent_notifications(user):
+    key = _cache_key(user.id)
+    notifications = cache.get(key)
+    if notifications is None:
+        notifications = list(
+            Publication.objects.filter(timeline_entries__user=user)
+            .exclude(autor=user)
+            .select_related('autor')
+            .order_by('-timeline_entries__creado')[:NOTIFICATIONS_LIMIT]
+        )
+        cache.set(key, notifications, NOTIFICATIONS_TTL)
+    return notifications
+
+
+def invalidate_notifications(user_ids):
+    cache.delete_many([_cache_key(user_id) for user_id in user_ids])
@@ -0,0 +1,133 @@
+"""Cola de correo saliente respaldada en la base de datos.
+
+Las vistas solo insertan un OutgoingEmail (queue_email); el comando
+send_queued_emails los envía por lotes sobre una única conexión SMTP y
+reintenta con backoff exponencial los que fallan. Así un servidor de correo
+lento o caído no bloquea ni rompe la petición que originó el correo.
+
+Los correos enviados llevan el cuerpo completo (enlaces de activación y de
+restablecimiento de contraseña): prune_sent los borra pasadas
+settings.OUTBOX_SENT_RETENTION_HOURS; el comando lo llama periódicamente.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import OutgoingEmail
+
+BATCH_SIZE = 50
+MAX_ATTEMPTS = 6
+# Tiempo que un worker retiene un lote antes de que otro pueda reclamarlo
+LEASE = timedelta(minutes=5)
+RETRY_BASE = timedelta(minutes=1)
+RETRY_MAX = timedelta(hours=1)
+# Filas por DELETE al purgar enviados
+PRUNE_CHUNK_SIZE = 1000
+
+
+def queue_email(subject, to_email, body='', html_body='', from_email=None):
+    """Encola un correo; se envía fuera de la petición."""
+    return OutgoingEmail.objects.create(
+        to_email=to_email,
+        from_email=from_email or '',
+        subject=subject,
+        body=body,
+        html_body=html_body,
+    )
+
+
+def _retry_delay(attempts):
+    return min(RETRY_BASE * 2 ** (attempts - 1), RETRY_MAX)
+
+
+def _claim_batch(batch_size):
+    """Reserva hasta `batch_size` correos listos (o con lease vencido) para este worker."""
+    now = timezone.now()
+    lease_until = now + LEASE
+    ready = (
+        Q(status='PENDING', next_attempt_at__lte=now)
+        | Q(status='SENDING', locked_until__lt=now)
+    )
+    with transaction.atomic():
+        ids = list(
+            OutgoingEmail.objects.select_for_update(skip_locked=True)
+            .filter(ready).order_by('next_attempt_at').values_list('id', flat=True)[:batch_size]
+        )
+        # El filtro se repite: si otro worker ganó la fila, no se pisa su lease
+        OutgoingEmail.objects.filter(ready, id__in=ids).update(status='SENDING', locked_until=lease_until)
+    return list(OutgoingEmail.objects.filter(id__in=ids, status='SENDING', locked_until=lease_until))
+
+
+def _build_message(email, connection):
+    msg = EmailMultiAlternatives(
+        email.subject,
+        email.body or email.html_body,
+        email.from_email or None,
+        [email.to_email],
+        connection=connection,
+    )
+    if email.html_body:
+        if email.body:
+            msg.attach_alternative(email.html_body, 'text/html')
+        else:
+            msg.content_subtype = 'html'
+    return msg
+
+
+def _mark_failed(email, error):
+    email.attempts += 1
+    email.last_error = str(error)[:2000]
+    email.locked_until = None
+    if email.attempts >= MAX_ATTEMPTS:
+        email.status = 'FAILED'
+    else:
+        email.status = 'PENDING'
+        email.next_attempt_at = timezone.now() + _retry_delay(email.attempts)
+    email.save(update_fields=['attempts', 'last_error', 'locked_until', 'status', 'next_attempt_at'])
+
+
+def send_batch(batch_size=BATCH_SIZE):
+    """Envía un lote de correos pendientes. Devuelve (enviados, fallidos)."""
+    emails = _claim_batch(batch_size)
+    if not emails:
+        return 0, 0
+
+    sent = failed = 0
+    connection = get_connection(fail_silently=False)
+    try:
+        for email in emails:
+            try:
+                # La conexión se abre en el primer envío y se reutiliza para el resto
+                connection.send_messages([_build_message(email, connection)])
+            except Exception as e:
+                _mark_failed(email, e)
+                failed += 1
+                # Se descarta la conexión por si quedó en mal estado; el próximo envío la reabre
+                connection.close()
+            else:
+                OutgoingEmail.objects.filter(pk=email.pk).update(
+                    status='SENT', sent_at=timezone.now(), locked_until=None, attempts=email.attempts + 1
+                )
+                sent += 1
+    finally:
+        connection.close()
+    return sent, failed
+
+
+def prune_sent(retention=None, chunk_size=PRUNE_CHUNK_SIZE):
+    """Borra los correos enviados hace más de `retention`. Devuelve cuántos."""
+    if retention is None:
+        retention = timedelta(hours=settings.OUTBOX_SENT_RETENTION_HOURS)
+    old = OutgoingEmail.objects.filter(status='SENT', sent_at__lt=timezone.now() - retention)
+    total = 0
+    while True:
+        ids = list(old.values_list('id', flat=True)[:chunk_size])
+        if not ids:
+            return total
+        total += OutgoingEmail.objects.filter(id__in=ids).delete()[0]
+        if len(ids) < chunk_size:
+            return total
@@ -0,0 +1,125 @@
+"""Paginación por cursor (keyset) para los scrolls infinitos.
+
+A diferencia de django.core.paginator.Paginator no hace COUNT ni OFFSET:
+cada página filtra "después de la última fila vista" sobre las columnas
+de orden, de modo que el costo no crece con la profundidad del scroll y
+se aprovechan los índices (-creado, ...) existentes.
+"""
+import base64
+import json
+from datetime import datetime
+
+from django.core.exceptions import FieldDoesNotExist, FieldError, ValidationError
+from django.core.paginator import InvalidPage
+from django.db.models import Q
+
+
+class InvalidCursor(InvalidPage):
+    pass
+
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return {'dt': value.isoformat()}
+    return value
+
+
+def _decode_value(value):
+    if isinstance(value, dict) and 'dt' in value:
+        return datetime.fromisoformat(value['dt'])
+    return value
+
+
+class CursorPage:
+    def __init__(self, object_list, next_cursor):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+
+class CursorPaginator:
+    """
+    Pagina `queryset` según `ordering`, p. ej. ('-creado', '-id').
+
+    Todos los campos deben ir en la misma dirección y ser atributos del
+    objeto (usar annotate() para campos de relaciones). El último campo
+    debe ser único para que el orden sea total.
+    """
+
+    def __init__(self, queryset, per_page, ordering=('-creado', '-id')):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.ordering = tuple(ordering)
+        self.descending = self.ordering[0].startswith('-')
+        self.fields = [f.lstrip('-') for f in self.ordering]
+
+    def encode_cursor(self, obj):
+        values = [_encode_value(getattr(obj, f)) for f in self.fields]
+        raw = json.dumps(values, separators=(',', ':')).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+            if not isinstance(values, list) or len(values) != len(self.fields):
+                raise ValueError
+            return [self._to_python(f, _decode_value(v)) for f, v in zip(self.fields, values)]
+        except (ValueError, TypeError, ValidationError, FieldError):
+            raise InvalidCursor('Cursor inválido')
+
+    def _output_field(self, name):
+        try:
+            return self.queryset.model._meta.get_field(name)
+        except FieldDoesNotExist:
+            annotation = self.queryset.query.annotations.get(name)
+            if annotation is None:
+                raise FieldError(name)
+            return annotation.output_field
+
+    def _to_python(self, name, value):
+        # Un cursor bien formado pero con tipos equivocados no debe llegar al filter()
+        if value is None or isinstance(value, (dict, list)):
+            raise ValueError(name)
+        return self._output_field(name).to_python(value)
+
+    def _after(self, values):
+        # (a, b) > (x, y)  ==>  a > x OR (a = x AND b > y)
+        lookup = 'lt' if self.descending else 'gt'
+        condition = Q()
+        for i, field in enumerate(self.fields):
+            exact = {f: v for f, v in zip(self.fields[:i], values[:i])}
+            condition |= Q(**exact, **{f'{field}__{lookup}': values[i]})
+        return condition
+
+    def page(self, cursor=None):
+        qs = self.queryset.order_by(*self.ordering)
+        if cursor:
+            qs = qs.filter(self._after(self.decode_cursor(cursor)))
+
+        # Una fila extra indica si existe página siguiente, sin COUNT
+        rows = list(qs[:self.per_page + 1])
+        next_cursor = None
+        if len(rows) > self.per_page:
+            rows = rows[:self.per_page]
+            next_cursor = self.encode_cursor(rows[-1])
+        return CursorPage(rows, next_cursor)
+
+    def get_page(self, cursor=None):
+        """Como page(), pero vuelve a la primera página si el cursor no es válido."""
+        try:
+            return self.page(cursor)
+        except InvalidCursor:
+            return self.page()
@@ -0,0 +1,195 @@
+"""Cupos de uso por usuario.
+
+Chat VITA: N mensajes por día, con N según la clase de usuario
+(settings.CHAT_DAILY_LIMITS). La fuente de verdad es DailyChatQuota y el
+descuento es un único UPDATE condicional:
+
+    UPDATE ... SET input_count = input_count + 1 WHERE ... AND input_count < limit
+
+así dos pestañas simultáneas nunca superan el límite. El caché guarda el
+contador del día (write-through tras cada descuento) para leer el uso sin
+ir a la base de datos y rechazar sin consultas a quien ya lo agotó.
+
+Análisis ROJITO (y cualquier cupo "N usos en las últimas X horas"):
+SlidingWindowQuota sobre QuotaUsage. Al enviar se reserva un cupo
+(reserve), al terminar bien se confirma (commit) y si el trabajo falla se
+libera (release). Los correos exentos se configuran en settings.QUOTAS.
+"""
+from dataclasses import dataclass
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Min, OuterRef, Q, Subquery, Value
+from django.utils import timezone
+
+from .models import DailyChatQuota, QuotaUsage, UserWidgetPreference, Usuario
+
+
+@dataclass
+class Quota:
+    allowed: bool
+    used: int
+    limit: int
+
+
+def user_class(user):
+    if user.is_staff:
+        return 'staff'
+    if user.es_profesional:
+        return 'profesional'
+    return 'paciente'
+
+
+def chat_limit(user):
+    limits = settings.CHAT_DAILY_LIMITS
+    return limits.get(user_class(user), limits['paciente'])
+
+
+def _chat_key(user_id, day):
+    return f'chat_quota:{user_id}:{day.isoformat()}'
+
+
+def _seconds_until_tomorrow():
+    now = timezone.localtime()
+    tomorrow = datetime.combine(now.date() + timedelta(days=1), time.min, tzinfo=now.tzinfo)
+    return int((tomorrow - now).total_seconds()) + 60
+
+
+def _db_chat_usage(user_id, day):
+    return DailyChatQuota.objects.filter(user_id=user_id, date=day).values_list('input_count', flat=True).first() or 0
+
+
+def get_chat_usage(user):
+    """Mensajes usados hoy y límite, sin descontar."""
+    day = timezone.localdate()
+    key = _chat_key(user.id, day)
+    used = cache.get(key)
+    if used is None:
+        used = _db_chat_usage(user.id, day)
+        cache.set(key, used, _seconds_until_tomorrow())
+    return Quota(used < chat_limit(user), used, chat_limit(user))
+
+
+def consume_chat_message(user):
+    """Descuenta un mensaje del cupo de hoy si queda disponible."""
+    day = timezone.localdate()
+    limit = chat_limit(user)
+    key = _chat_key(user.id, day)
+
+    cached = cache.get(key)
+    if cached is not None and cached >= limit:
+        return Quota(False, cached, limit)
+
+    updated = DailyChatQuota.objects.filter(user_id=user.id, date=day, input_count__lt=limit).update(
+        input_count=F('input_count') + 1
+    )
+    if not updated and limit > 0:
+        # Sin fila para hoy (primer mensaje) o cupo agotado
+        try:
+            with transaction.atomic():
+                DailyChatQuota.objects.create(user_id=user.id, date=day, input_count=1)
+            updated = 1
+        except IntegrityError:
+            # La fila ya existía: o está en el límite o la creó otra petición
+            updated = DailyChatQuota.objects.filter(user_id=user.id, date=day, input_count__lt=limit).update(
+                input_count=F('input_count') + 1
+            )
+
+    if updated:
+        try:
+            used = cache.incr(key)
+        except ValueError:
+            used = _db_chat_usage(user.id, day)
+            cache.set(key, used, _seconds_until_tomorrow())
+        return Quota(True, used, limit)
+
+    cache.set(key, limit, _seconds_until_tomorrow())
+    return Quota(False, limit, limit)
+
+
+# --- VENTANA DESLIZANTE ---
+
+class QuotaExceeded(Exception):
+    def __init__(self, limit, reset_at):
+        super().__init__(f'Cupo de {limit} agotado hasta {reset_at.isoformat()}')
+        self.limit = limit
+        self.reset_at = reset_at
+
+
+@dataclass
+class WindowStatus:
+    used: int
+    limit: int
+    reset_at: datetime
+    lifetime_count: int
+
+    @property
+    def remaining(self):
+        return max(0, self.limit - self.used)
+
+
+class SlidingWindowQuota:
+    """`limit` usos por usuario en cualquier ventana de `window` (reservados + consumidos)."""
+
+    def __init__(self, scope):
+        self.scope = scope
+
+    @property
+    def config(self):
+        return settings.QUOTAS[self.scope]
+
+    @property
+    def limit(self):
+        return self.config['limit']
+
+    @property
+    def window(self):
+        return timedelta(seconds=self.config['window'])
+
+    def is_exempt(self, user):
+        return (user.email or '').lower() in {e.lower() for e in self.config.get('exempt_emails', ())}
+
+    def _in_window(self, user_id, now):
+        return QuotaUsage.objects.filter(user_id=user_id, scope=self.scope, created_at__gt=now - self.window)
+
+    def reserve(self, user):
+        """Reserva un uso; lanza QuotaExceeded si la ventana está llena."""
+        now = timezone.now()
+        with transaction.atomic():
+            # Bloquea la fila del usuario: las reservas simultáneas se serializan
+            list(Usuario.objects.select_for_update().filter(pk=user.pk).values_list('pk', flat=True))
+            usage = self._in_window(user.pk, now).aggregate(used=Count('id'), oldest=Min('created_at'))
+            if usage['used'] >= self.limit:
+                # Con limit=0 no hay usos en la ventana: se reintenta dentro de una ventana
+                raise QuotaExceeded(self.limit, (usage['oldest'] or now) + self.window)
+            return QuotaUsage.objects.create(user_id=user.pk, scope=self.scope, created_at=now)
+
+    def commit(self, reservation_id):
+        """Confirma la reserva; devuelve True si existía y no estaba ya confirmada."""
+        return bool(QuotaUsage.objects.filter(pk=reservation_id, status='reserved').update(status='committed'))
+
+    def release(self, reservation_id):
+        """Devuelve el cupo de una reserva que no llegó a consumirse."""
+        QuotaUsage.objects.filter(pk=reservation_id, status='reserved').delete()
+
+    def status(self, user):
+        """Uso actual en una sola consulta (índice user, scope, created_at)."""
+        now = timezone.now()
+        in_window = Q(quota_usages__scope=self.scope, quota_usages__created_at__gt=now - self.window)
+        # Contador histórico opcional de UserWidgetPreference, en la misma consulta
+        lifetime_field = self.config.get('lifetime_field')
+        lifetime = Subquery(
+            UserWidgetPreference.objects.filter(user=OuterRef('pk')).values(lifetime_field)[:1]
+        ) if lifetime_field else Value(0)
+        row = Usuario.objects.filter(pk=user.pk).annotate(
+            used=Count('quota_usages', filter=in_window),
+            oldest=Min('quota_usages__created_at', filter=in_window),
+            lifetime=lifetime,
+        ).values('used', 'oldest', 'lifetime').get()
+        reset_at = row['oldest'] + self.window if row['oldest'] else None
+        return WindowStatus(row['used'], self.limit, reset_at, row['lifetime'] or 0)
+
+
+ROJITO_QUOTA = SlidingWindowQuota('rojito')
@@ -0,0 +1,82 @@
+"""Likes / dislikes de publicaciones.
+
+Se escribe directamente sobre las tablas intermedias dentro de una sola
+transacción: la restricción única (publication, usuario) resuelve los
+dobles clics y los contadores se ajustan con F(), así cientos de
+reacciones simultáneas sobre la misma publicación no pierden escrituras.
+"""
+from django.db import IntegrityError, transaction
+
+from .counters import adjust_counter
+from .models import Publication
+
+LIKE = 'like'
+DISLIKE = 'dislike'
+
+_RELATIONS = {
+    LIKE: (Publication.likes.through, 'likes_total'),
+    DISLIKE: (Publication.dislikes.through, 'dislikes_total'),
+}
+
+
+def _opuesta(reaction):
+    return DISLIKE if reaction == LIKE else LIKE
+
+
+def set_reaction(publicacion_id, user_id, reaction, active=None):
+    """
+    Activa o desactiva `reaction` del usuario sobre la publicación.
+
+    Con `active=None` alterna el estado actual; con True/False lo fija, lo
+    que hace que reintentar la misma petición sea idempotente. Like y
+    dislike son excluyentes. Devuelve los contadores resultantes.
+    """
+    through, field = _RELATIONS[reaction]
+    other_through, other_field = _RELATIONS[_opuesta(reaction)]
+    row = {'publication_id': publicacion_id, 'usuario_id': user_id}
+
+    with transaction.atomic():
+        if active is None:
+            active = not through.objects.filter(**row).exists()
+
+        if active:
+            removed, _ = other_through.objects.filter(**row).delete()
+            if removed:
+                adjust_counter(publicacion_id, other_field, -removed)
+            try:
+                with transaction.atomic():
+                    through.objects.create(**row)
+            except IntegrityError:
+                pass  # Ya existía: otra petición la registró primero
+            else:
+                adjust_counter(publicacion_id, field, 1)
+        else:
+            removed, _ = through.objects.filter(**row).delete()
+            if removed:
+                adjust_counter(publicacion_id, field, -removed)
+
+        likes, dislikes = Publication.objects.filter(pk=publicacion_id).values_list(
+            'likes_total', 'dislikes_total'
+        ).get()
+
+    return {
+        'likes': likes,
+        'dislikes': dislikes,
+        'reaction': reaction if active else None,
+    }
+
+
+def annotate_user_reactions(publicaciones, user):
+    """Marca cada publicación con `mi_reaccion` ('like', 'dislike' o None)."""
+    publicaciones = list(publicaciones)
+    ids = [pub.id for pub in publicaciones]
+    if not ids:
+        return
+    liked = set(Publication.likes.through.objects.filter(
+        usuario_id=user.id, publication_id__in=ids
+    ).values_list('publication_id', flat=True))
+    disliked = set(Publication.dislikes.through.objects.filter(
+        usuario_id=user.id, publication_id__in=ids
+    ).values_list('publication_id', flat=True))
+    for pub in publicaciones:
+        pub.mi_reaccion = LIKE if pub.id in liked else DISLIKE if pub.id in disliked else None
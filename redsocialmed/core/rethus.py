@@ -0,0 +1,173 @@
+"""Verificación de profesionales en ReTHUS (API de Verifik) con caché.
+
+Cada consulta a Verifik tarda y se cobra, y el formulario de registro
+repite los mismos documentos. Por eso los resultados se guardan por
+(doc_type, doc_num):
+
+- en el caché de Django (rápido, compartido si hay Redis), y
+- en RethusVerification, para que sobrevivan reinicios y despliegues.
+
+Un resultado positivo dura RETHUS_POSITIVE_TTL; un "no encontrado",
+RETHUS_NEGATIVE_TTL (más corto, el registro puede actualizarse). Los errores
+del upstream (timeouts, 5xx) no se guardan.
+
+Consultas simultáneas del mismo documento se agrupan en una sola llamada:
+dentro del proceso con un Future compartido y entre procesos con un candado
+en el caché (cache.add); quien no obtiene el candado espera el resultado.
+
+Para desarrollo y pruebas sin conexión: `manage.py rethus_stub_server` y
+RETHUS_API_URL apuntando a él.
+"""
+import re
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from dataclasses import dataclass
+from datetime import timedelta
+
+import requests
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from .models import RethusVerification
+
+_DOC_TYPE_RE = re.compile(r'^[A-Z]{2,3}$')
+_DOC_NUM_RE = re.compile(r'^[0-9A-Z]{3,20}$')
+# Cada cuánto revisa el caché quien espera el resultado de otro proceso
+_WAIT_INTERVAL = 0.1
+
+_session = requests.Session()
+_inflight = {}
+_inflight_lock = threading.Lock()
+
+
+class RethusUnavailable(Exception):
+    """Verifik no respondió o respondió con error; no se guarda en caché."""
+
+
+@dataclass
+class Verification:
+    found: bool
+    data: dict = None
+
+
+def normalize(doc_type, doc_num):
+    """(doc_type, doc_num) en mayúsculas, sin puntos ni espacios; ValueError si no son válidos."""
+    doc_type = (doc_type or '').strip().upper()
+    doc_num = re.sub(r'[\s.\-]', '', doc_num or '').upper()
+    if not _DOC_TYPE_RE.match(doc_type) or not _DOC_NUM_RE.match(doc_num):
+        raise ValueError('Tipo o número de documento inválido')
+    return doc_type, doc_num
+
+
+def _cache_key(doc_type, doc_num):
+    return f'rethus:{doc_type}:{doc_num}'
+
+
+def _remember(key, verification, ttl):
+    cache.set(key, {'found': verification.found, 'data': verification.data}, ttl)
+
+
+def _stored(doc_type, doc_num, key):
+    row = RethusVerification.objects.filter(
+        doc_type=doc_type, doc_num=doc_num, expires_at__gt=timezone.now()
+    ).values('found', 'data', 'expires_at').first()
+    if row is None:
+        return None
+    verification = Verification(row['found'], row['data'])
+    _remember(key, verification, int((row['expires_at'] - timezone.now()).total_seconds()) or 1)
+    return verification
+
+
+def _fetch(doc_type, doc_num):
+    try:
+        response = _session.get(
+            f"{settings.RETHUS_API_URL.rstrip('/')}/{doc_type}/{doc_num}",
+            headers={'Authorization': f'Bearer {settings.VERIFIK_API_TOKEN}', 'Accept': 'application/json'},
+            timeout=settings.RETHUS_TIMEOUT,
+        )
+    except requests.RequestException as e:
+        raise RethusUnavailable(str(e))
+    if response.status_code == 404:
+        return Verification(False)
+    if not response.ok:
+        raise RethusUnavailable(f'ReTHUS respondió {response.status_code}')
+    try:
+        return Verification(True, response.json())
+    except ValueError:
+        raise RethusUnavailable('Respuesta inválida de ReTHUS')
+
+
+def _fetch_and_store(doc_type, doc_num, key):
+    verification = _fetch(doc_type, doc_num)
+    ttl = settings.RETHUS_POSITIVE_TTL if verification.found else settings.RETHUS_NEGATIVE_TTL
+    now = timezone.now()
+    RethusVerification.objects.update_or_create(
+        doc_type=doc_type, doc_num=doc_num,
+        defaults={'found': verification.found, 'data': verification.data,
+                  'checked_at': now, 'expires_at': now + timedelta(seconds=ttl)},
+    )
+    _remember(key, verification, ttl)
+    return verification
+
+
+def _lookup_shared(doc_type, doc_num, key):
+    """Una sola llamada a Verifik por documento entre todos los procesos."""
+    lock_key = f'{key}:lock'
+    lock_timeout = int(settings.RETHUS_TIMEOUT) + 2
+    if not cache.add(lock_key, 1, lock_timeout):
+        # Otro proceso ya consulta este documento: se espera su resultado
+        deadline = time.monotonic() + lock_timeout
+        while time.monotonic() < deadline:
+            time.sleep(_WAIT_INTERVAL)
+            cached = cache.get(key)
+            if cached is not None:
+                return Verification(**cached)
+            if cache.get(lock_key) is None:
+                break  # Terminó sin resultado (error): se intenta aquí
+        return _fetch_and_store(doc_type, doc_num, key)
+    try:
+        return _fetch_and_store(doc_type, doc_num, key)
+    finally:
+        cache.delete(lock_key)
+
+
+def verify(doc_type, doc_num):
+    """
+    Verificación de (doc_type, doc_num), desde caché si es posible. Lanza
+    ValueError si el documento no es válido y RethusUnavailable si Verifik falla.
+    """
+    doc_type, doc_num = normalize(doc_type, doc_num)
+    key = _cache_key(doc_type, doc_num)
+
+    cached = cache.get(key)
+    if cached is not None:
+        return Verification(**cached)
+    stored = _stored(doc_type, doc_num, key)
+    if stored is not None:
+        return stored
+
+    with _inflight_lock:
+        future = _inflight.get(key)
+        leader = future is None
+        if leader:
+            future = _inflight[key] = Future()
+    if not leader:
+        # Misma consulta en curso en este proceso: se comparte su resultado
+        try:
+            return future.result(timeout=settings.RETHUS_TIMEOUT * 2 + 2)
+        except FutureTimeout:
+            raise RethusUnavailable('ReTHUS tardó demasiado en responder')
+
+    try:
+        verification = _lookup_shared(doc_type, doc_num, key)
+    except BaseException as e:
+        future.set_exception(e)
+        raise
+    else:
+        future.set_result(verification)
+        return verification
+    finally:
+        with _inflight_lock:
+            _inflight.pop(key, None)
@@ -0,0 +1,143 @@
+"""Búsqueda de profesionales por nombre, especialidad, biografía y publicaciones.
+
+Cada profesional tiene una fila en DoctorSearchIndex que la base de datos
+indexa con triggers (ver migración 0017):
+
+- Postgres: tsvector con la configuración `spanish_unaccent` (stemming en
+  español + unaccent) e índice GIN; ranking con ts_rank.
+- SQLite (desarrollo local): tabla FTS5 `core_doctor_fts`; ranking bm25.
+
+Otros motores caen a los icontains de antes, sin ranking.
+"""
+import re
+import unicodedata
+
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connection
+from django.db.models import F, FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Cast
+
+from .models import DoctorSearchIndex, Publication, Usuario
+
+SEARCH_CONFIG = 'spanish_unaccent'
+# Publicaciones más recientes que se incluyen en el documento de cada médico
+MAX_INDEXED_POSTS = 200
+# Pesos bm25 por columna FTS5: nombre, especialidad, bio, publicaciones
+FTS5_WEIGHTS = (10.0, 10.0, 4.0, 1.0)
+
+STOP_WORDS = {'el', 'la', 'los', 'las', 'un', 'una', 'de', 'del', 'y', 'o', 'en', 'a', 'por', 'con', 'para', 'dr', 'dra'}
+
+
+def fold_accents(word):
+    """Quita acentos y pasa a minúsculas."""
+    word = ''.join(c for c in unicodedata.normalize('NFD', word) if unicodedata.category(c) != 'Mn')
+    return word.lower()
+
+
+def simple_stem(word):
+    word = fold_accents(word)
+    if len(word) > 4:
+        if word.endswith('es') or word.endswith('os') or word.endswith('as'): word = word[:-2]
+        elif word.endswith('s'): word = word[:-1]
+
+        if word.endswith('o') or word.endswith('a') or word.endswith('e'): word = word[:-1]
+
+        if 'logia' in word: word = word.replace('logia', 'log')
+        if 'pediatria' in word: word = word.replace('pediatria', 'pediatr')
+    return word
+
+
+def query_terms(query):
+    """Palabras útiles de la consulta: sin stop words ni signos."""
+    words = [w for w in re.findall(r'\w+', query) if w]
+    cleaned = [w for w in words if w.lower() not in STOP_WORDS]
+    return cleaned or words
+
+
+# --- INDEXACIÓN ---
+
+def index_doctor(user_id):
+    """(Re)construye el documento de búsqueda de un usuario."""
+    usuario = Usuario.objects.filter(pk=user_id, es_profesional=True).first()
+    if usuario is None:
+        DoctorSearchIndex.objects.filter(usuario_id=user_id).delete()
+        return
+
+    contenidos = Publication.objects.filter(autor=usuario).order_by('-creado').values_list(
+        'contenido', flat=True
+    )[:MAX_INDEXED_POSTS]
+    nombre = f'{usuario.first_name} {usuario.last_name}'.strip()
+    DoctorSearchIndex.objects.update_or_create(
+        usuario=usuario,
+        defaults={
+            'nombre': nombre,
+            'autocompletar': fold_accents(f'{nombre} {usuario.especialidad or ""}'),
+            'especialidad': usuario.especialidad or '',
+            'bio': usuario.bio or '',
+            'publicaciones': '\n'.join(contenidos),
+        },
+    )
+
+
+# --- CONSULTA ---
+
+def _postgres_search(terms):
+    # Prefijo (:*) sobre cada término normalizado por la configuración
+    raw = ' | '.join(f'{fold_accents(t)}:*' for t in terms)
+    query = SearchQuery(raw, config=SEARCH_CONFIG, search_type='raw')
+    # ts_rank devuelve real (float4): psycopg lo lee redondeado y, al comparar
+    # con el valor del cursor, ya no coincide consigo mismo. En double
+    # precision el float de Python vuelve exacto en la página siguiente.
+    return Usuario.objects.filter(search_index__search_vector=query).annotate(
+        rank=Cast(SearchRank(F('search_index__search_vector'), query), FloatField())
+    )
+
+
+def _sqlite_search(terms):
+    # Raíz de simple_stem como prefijo, entre comillas para escapar FTS5
+    roots = {simple_stem(t) or fold_accents(t) for t in terms}
+    match = ' OR '.join(f'"{root}"*' for root in sorted(roots))
+    weights = ', '.join(str(w) for w in FTS5_WEIGHTS)
+    # JOIN con la tabla FTS5 (DoctorFTS): SQLite recorre primero el MATCH y
+    # busca cada usuario por PK. bm25 es menor cuanto más relevante; se invierte.
+    return Usuario.objects.filter(fts__documento__fts_match=match).annotate(
+        rank=RawSQL(f'-bm25("core_doctor_fts", {weights})', [], output_field=FloatField())
+    )
+
+
+def _fallback_search(terms):
+    q_user = Q()
+    for w in terms:
+        root = simple_stem(w)
+        for term in {root, w}:
+            q_user |= (
+                Q(first_name__icontains=term) | Q(last_name__icontains=term)
+                | Q(especialidad__icontains=term) | Q(bio__icontains=term)
+                | Q(publication__contenido__icontains=term)
+            )
+    ids = Usuario.objects.filter(q_user).values('id')
+    return Usuario.objects.filter(id__in=ids).annotate(rank=Value(0.0, output_field=FloatField()))
+
+
+def search_doctors(query):
+    """Profesionales que coinciden con `query`, anotados con `rank` (mayor = mejor)."""
+    terms = query_terms(query)
+    if not terms:
+        return Usuario.objects.none()
+
+    vendor = connection.vendor
+    if vendor == 'postgresql':
+        resultados = _postgres_search(terms)
+    elif vendor == 'sqlite':
+        resultados = _sqlite_search(terms)
+    else:
+        resultados = _fallback_search(terms)
+    return resultados.filter(es_profesional=True)
+
+
+def suggested_doctors():
+    """Sugerencias cuando la búsqueda no encuentra nada: Medicina General."""
+    return Usuario.objects.filter(es_profesional=True, especialidad__icontains='Medicina General').annotate(
+        rank=Value(0.0, output_field=FloatField())
+    )
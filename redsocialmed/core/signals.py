@@ -0,0 +1,186 @@
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from . import autocomplete, images, media_gc, video
+from .counters import adjust_counter
+from .jobs import enqueue
+from .models import Comentario, DoctorSearchIndex, Publication, TimelineEntry, Usuario
+from .notifications import invalidate_notifications
+from .search import index_doctor
+from .tasks import IMAGE_DERIVATIVES, MEDIA_DELETE, VIDEO_TRANSCODE
+
+
+# --- CONTADORES DE PUBLICACIÓN ---
+
+@receiver(post_save, sender=Comentario)
+def comentario_creado(sender, instance, created, **kwargs):
+    if created:
+        adjust_counter(instance.publicacion_id, 'comentarios_total', 1)
+
+
+@receiver(post_delete, sender=Comentario)
+def comentario_eliminado(sender, instance, **kwargs):
+    adjust_counter(instance.publicacion_id, 'comentarios_total', -1)
+
+
+def _reaction_handler(field):
+    """
+    Mantiene `field` cuando cambia la relación likes/dislikes desde cualquier
+    lado (pub.likes.add(user) o user.likes.add(pub)).
+
+    Los decrementos se calculan en pre_remove/pre_clear contra las filas que
+    realmente existen, porque pk_set de remove incluye ids no relacionados.
+    """
+    def handler(sender, instance, action, reverse, pk_set, **kwargs):
+        if action == 'post_add' and pk_set:
+            # En post_add pk_set trae solo las filas efectivamente insertadas
+            if reverse:
+                adjust_counter(list(pk_set), field, 1)
+            else:
+                adjust_counter(instance.pk, field, len(pk_set))
+            return
+
+        if action not in ('pre_remove', 'pre_clear'):
+            return
+
+        rows = sender.objects.all()
+        if reverse:
+            rows = rows.filter(usuario_id=instance.pk)
+            if action == 'pre_remove':
+                rows = rows.filter(publication_id__in=pk_set)
+            adjust_counter(list(rows.values_list('publication_id', flat=True)), field, -1)
+        else:
+            rows = rows.filter(publication_id=instance.pk)
+            if action == 'pre_remove':
+                rows = rows.filter(usuario_id__in=pk_set)
+            removed = rows.count()
+            if removed:
+                adjust_counter(instance.pk, field, -removed)
+
+    return handler
+
+
+likes_cambiados = _reaction_handler('likes_total')
+dislikes_cambiados = _reaction_handler('dislikes_total')
+m2m_changed.connect(likes_cambiados, sender=Publication.likes.through)
+m2m_changed.connect(dislikes_cambiados, sender=Publication.dislikes.through)
+
+
+# --- NOTIFICACIONES ---
+
+@receiver(pre_delete, sender=Publication)
+def publicacion_eliminada(sender, instance, **kwargs):
+    # Las entradas del timeline se borran en cascada; se leen antes
+    user_ids = list(TimelineEntry.objects.filter(publicacion=instance).values_list('user_id', flat=True))
+    transaction.on_commit(lambda: invalidate_notifications(user_ids))
+
+
+# --- ÍNDICE DE BÚSQUEDA ---
+
+SEARCH_USER_FIELDS = {'first_name', 'last_name', 'especialidad', 'bio', 'es_profesional'}
+
+
+@receiver(post_save, sender=Usuario)
+def usuario_guardado(sender, instance, update_fields, **kwargs):
+    # Ignora guardados parciales que no tocan el documento (p. ej. last_login)
+    if update_fields is not None and not SEARCH_USER_FIELDS.intersection(update_fields):
+        return
+    transaction.on_commit(lambda: index_doctor(instance.pk))
+
+
+@receiver(post_save, sender=Publication)
+@receiver(post_delete, sender=Publication)
+def publicacion_indexada(sender, instance, **kwargs):
+    autor_id = instance.autor_id
+    transaction.on_commit(lambda: index_doctor(autor_id))
+
+
+# --- AUTOCOMPLETADO ---
+
+@receiver(post_save, sender=DoctorSearchIndex)
+def indice_guardado(sender, instance, **kwargs):
+    transaction.on_commit(lambda: autocomplete.index_changed(instance))
+
+
+@receiver(post_delete, sender=DoctorSearchIndex)
+def indice_eliminado(sender, instance, **kwargs):
+    user_id = instance.usuario_id
+    transaction.on_commit(lambda: autocomplete.index_removed(user_id))
+
+
+# --- DERIVADOS DE IMÁGENES ---
+
+def _image_saved(field_name):
+    """Encola los derivados de `field_name` cuando cambia el archivo (ver core.images)."""
+    def handler(sender, instance, update_fields, **kwargs):
+        if update_fields is not None and field_name not in update_fields:
+            return
+        vfield = images.variants_field(field_name)
+        if not getattr(instance, field_name) and getattr(instance, vfield):
+            # Imagen quitada: los derivados anteriores dejan de valer
+            sender.objects.filter(pk=instance.pk).update(**{vfield: {}})
+            return
+        if images.needs_derivatives(instance, field_name):
+            payload = {'model': sender._meta.label_lower, 'pk': instance.pk, 'field': field_name}
+            transaction.on_commit(lambda: enqueue(IMAGE_DERIVATIVES, payload))
+
+    return handler
+
+
+publicacion_imagen_guardada = _image_saved('imagen')
+foto_perfil_guardada = _image_saved('foto_perfil')
+post_save.connect(publicacion_imagen_guardada, sender=Publication)
+post_save.connect(foto_perfil_guardada, sender=Usuario)
+
+
+# --- VIDEOS ---
+
+@receiver(post_save, sender=Publication)
+def publicacion_video_guardado(sender, instance, update_fields, **kwargs):
+    """Encola la transcodificación cuando cambia el video (ver core.video)."""
+    if update_fields is not None and 'video' not in update_fields:
+        return
+    if not instance.video:
+        if instance.video_estado:
+            # Video quitado: el póster y la versión web dejan de valer
+            sender.objects.filter(pk=instance.pk).update(
+                video_estado='', video_origen='', video_web=None, video_poster=None
+            )
+        return
+    if video.needs_processing(instance):
+        changes = {'video_estado': video.PENDING, 'video_origen': instance.video.name,
+                   'video_web': None, 'video_poster': None}
+        sender.objects.filter(pk=instance.pk).update(**changes)
+        # La instancia en memoria queda igual que la fila
+        for field, value in changes.items():
+            setattr(instance, field, value)
+        payload = {'pk': instance.pk, 'name': instance.video.name}
+        transaction.on_commit(lambda: enqueue(VIDEO_TRANSCODE, payload))
+
+
+# --- ARCHIVOS HUÉRFANOS ---
+
+def _queue_media_delete(names):
+    if names:
+        transaction.on_commit(lambda: enqueue(MEDIA_DELETE, {'names': names}))
+
+
+def media_antes_de_guardar(sender, instance, raw, update_fields, **kwargs):
+    # Se lee antes del UPDATE; se encola en post_save, cuando el guardado ya ocurrió
+    if not raw:
+        instance._media_reemplazada = media_gc.replaced_names(sender, instance, update_fields)
+
+
+def media_guardada(sender, instance, **kwargs):
+    _queue_media_delete(instance.__dict__.pop('_media_reemplazada', None))
+
+
+def media_eliminada(sender, instance, **kwargs):
+    _queue_media_delete(media_gc.instance_names(instance))
+
+
+for _model in (Publication, Usuario):
+    pre_save.connect(media_antes_de_guardar, sender=_model)
+    post_save.connect(media_guardada, sender=_model)
+    post_delete.connect(media_eliminada, sender=_model)
@@ -0,0 +1,29 @@
+from django import template
+from django.forms.utils import flatatt
+from django.utils.html import format_html, format_html_join
+
+from core import images
+
+register = template.Library()
+
+
+@register.simple_tag
+def picture(file, sizes='100vw', **attrs):
+    """
+    <picture> con un <source> por formato (srcset de los derivados de
+    core.images) y el original como <img> de respaldo. El resto de
+    argumentos se copian al <img>:
+
+        {% picture pub.imagen sizes="(max-width: 768px) 100vw, 120px" alt="Post Image" %}
+
+    Mientras los derivados no existan se muestra solo el original.
+    """
+    if not file:
+        return ''
+    sources = format_html_join(
+        '', '<source type="{}" srcset="{}" sizes="{}">',
+        ((mime, srcset, sizes) for mime, srcset in images.srcsets(file).items()),
+    )
+    img_attrs = flatatt({'loading': 'lazy', 'decoding': 'async', **attrs})
+    # display: contents deja que el <img> se maquete como hijo directo del contenedor
+    return format_html('<picture style="display: contents;">{}<img src="{}"{}></picture>', sources, file.url, img_attrs)
@@ -1,3 +1,245 @@
-from django.test import TestCase
+import io
+import json
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from http.server import ThreadingHTTPServer
 
-# Create your tests here.
+import boto3
+import requests
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.db import connections
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+
+from core import direct_upload, rethus
+from core.management.commands.rethus_stub_server import StubHandler
+from core.models import Publication, RethusVerification, Usuario
+
+try:
+    from moto.server import ThreadedMotoServer
+except ImportError:  # moto[server] solo hace falta para las pruebas de subida directa
+    ThreadedMotoServer = None
+
+
+class RethusVerifyTests(TransactionTestCase):
+    """core.rethus contra el stub de Verifik (manage.py rethus_stub_server) en un puerto libre."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        settings = override_settings(
+            RETHUS_API_URL=f'http://127.0.0.1:{self.server.server_port}',
+            VERIFIK_API_TOKEN='test', RETHUS_TIMEOUT=5,
+            RETHUS_POSITIVE_TTL=3600, RETHUS_NEGATIVE_TTL=60,
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+        cache.clear()
+        self.addCleanup(cache.clear)
+        StubHandler.requests_served = 0
+        StubHandler.delay = 0
+        self.addCleanup(setattr, StubHandler, 'delay', 0)
+
+    def _verify_in_thread(self, doc_num):
+        try:
+            return rethus.verify('CC', doc_num)
+        finally:
+            connections.close_all()
+
+    def test_concurrent_calls_share_one_request(self):
+        # La respuesta tarda: todas las llamadas llegan mientras la primera está en curso
+        StubHandler.delay = 0.5
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            results = list(pool.map(self._verify_in_thread, ['1234567'] * 8))
+
+        self.assertEqual(StubHandler.requests_served, 1)
+        self.assertTrue(all(r.found for r in results))
+        self.assertEqual(results[0].data['data']['documentNumber'], '1234567')
+
+    def test_result_is_cached(self):
+        first = rethus.verify('cc', '1.234.567')
+        second = rethus.verify('CC', '1234567')
+
+        self.assertTrue(first.found)
+        self.assertEqual(second, first)
+        self.assertEqual(StubHandler.requests_served, 1)
+
+    def test_not_found_uses_negative_ttl(self):
+        self.assertFalse(rethus.verify('CC', '0123456').found)
+        self.assertFalse(rethus.verify('CC', '0123456').found)
+
+        self.assertEqual(StubHandler.requests_served, 1)
+        row = RethusVerification.objects.get(doc_type='CC', doc_num='0123456')
+        self.assertFalse(row.found)
+        self.assertAlmostEqual(row.expires_at, timezone.now() + timedelta(seconds=60), delta=timedelta(seconds=5))
+
+    def test_falls_back_to_database_when_cache_is_empty(self):
+        rethus.verify('CC', '1234567')
+        cache.clear()
+
+        self.assertTrue(rethus.verify('CC', '1234567').found)
+        self.assertEqual(StubHandler.requests_served, 1)
+
+    def test_expired_row_is_refreshed(self):
+        rethus.verify('CC', '1234567')
+        RethusVerification.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        cache.clear()
+
+        rethus.verify('CC', '1234567')
+        self.assertEqual(StubHandler.requests_served, 2)
+
+    def test_upstream_errors_are_not_cached(self):
+        for _ in range(2):
+            with self.assertRaises(rethus.RethusUnavailable):
+                rethus.verify('CC', '9991234')
+
+        self.assertEqual(StubHandler.requests_served, 2)
+        self.assertFalse(RethusVerification.objects.exists())
+
+    def test_invalid_document_is_rejected_without_request(self):
+        with self.assertRaises(ValueError):
+            rethus.verify('CC', '12')
+        self.assertEqual(StubHandler.requests_served, 0)
+
+
+class SniffTests(SimpleTestCase):
+    """Cada tipo que acepta la subida directa tiene una firma que sniff() reconoce."""
+
+    def test_video_signatures(self):
+        heads = {
+            'mp4': b'\x00\x00\x00\x18ftypmp42',
+            'mov sin ftyp': b'\x00\x00\x00\x08wide\x00\x00\x00\x00mdat',
+            'webm': b'\x1a\x45\xdf\xa3\x9f\x42\x86\x81',
+            'avi': b'RIFF\x00\x00\x00\x00AVI LIST',
+            'ogg': b'OggS\x00\x02',
+            'mpeg-ps': b'\x00\x00\x01\xba\x44',
+            'mpeg-ts': (b'\x47' + b'\xff' * 187) * 3,
+            'm2ts': (b'\x00' * 4 + b'\x47' + b'\xff' * 187) * 3,
+            'flv': b'FLV\x01\x05',
+            'asf': b'\x30\x26\xb2\x75\x8e\x66\xcf\x11\xa6\xd9',
+        }
+        for name, head in heads.items():
+            with self.subTest(name):
+                self.assertEqual(direct_upload.sniff(head + b'\x00' * 64), 'video')
+
+    def test_image_and_unknown(self):
+        buffer = io.BytesIO()
+        Image.new('RGB', (8, 8)).save(buffer, 'PNG')
+        self.assertEqual(direct_upload.sniff(buffer.getvalue()), 'imagen')
+        self.assertEqual(direct_upload.sniff(b'\x00\x00\x00\x18ftypavif'), 'imagen')
+        self.assertIsNone(direct_upload.sniff(b'<svg xmlns="http://www.w3.org/2000/svg"/>'))
+
+    def test_only_sniffable_types_go_direct(self):
+        self.assertTrue(direct_upload.sniffable('video/QuickTime; codecs="avc1"'))
+        self.assertFalse(direct_upload.sniffable('video/x-sgi-movie'))
+        self.assertFalse(direct_upload.sniffable('image/svg+xml'))
+
+
+@unittest.skipUnless(ThreadedMotoServer, 'requiere moto[server]')
+class DirectUploadTests(TestCase):
+    """core.direct_upload de punta a punta contra un S3 simulado con moto."""
+
+    bucket = 'media'
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadedMotoServer(ip_address='127.0.0.1', port=0, verbose=False)
+        cls.server.start()
+        host, port = cls.server.get_host_and_port()
+        endpoint = f'http://{host}:{port}'
+        cls.s3_settings = override_settings(
+            STORAGES={**settings.STORAGES, 'default': {'BACKEND': 'storages.backends.s3boto3.S3Boto3Storage'}},
+            AWS_ACCESS_KEY_ID='test', AWS_SECRET_ACCESS_KEY='test', AWS_STORAGE_BUCKET_NAME=cls.bucket,
+            AWS_S3_ENDPOINT_URL=endpoint, AWS_S3_REGION_NAME='us-east-1',
+        )
+        cls.s3_settings.enable()
+        cls.s3 = boto3.client('s3', endpoint_url=endpoint, region_name='us-east-1',
+                              aws_access_key_id='test', aws_secret_access_key='test')
+        cls.s3.create_bucket(Bucket=cls.bucket)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.s3_settings.disable()
+        cls.server.stop()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.user = Usuario.objects.create_user(
+            username='medico', email='medico@example.com', password='x', es_profesional=True
+        )
+        self.client.force_login(self.user)
+
+    def _post(self, name, body):
+        return self.client.post(reverse(name), json.dumps(body), content_type='application/json')
+
+    def _upload(self, data, content_type, filename):
+        """start → PUT de cada parte → complete; devuelve la respuesta de complete."""
+        response = self._post('iniciar_subida', {'filename': filename, 'content_type': content_type, 'size': len(data)})
+        self.assertEqual(response.status_code, 200)
+        upload = response.json()
+        self.assertTrue(upload['direct'])
+
+        parts = []
+        for number, url in enumerate(upload['urls'], start=1):
+            chunk = data[(number - 1) * upload['part_size']:number * upload['part_size']]
+            put = requests.put(url, data=chunk)
+            self.assertTrue(put.ok, put.text)
+            parts.append({'n': number, 'etag': put.headers['ETag']})
+        return self._post('completar_subida', {'token': upload['token'], 'parts': parts, 'contenido': 'Caso clínico'})
+
+    def _keys(self):
+        return [obj['Key'] for obj in self.s3.list_objects_v2(Bucket=self.bucket).get('Contents', [])]
+
+    def test_video_upload_creates_publication(self):
+        video = b'\x00\x00\x00\x18ftypmp42' + b'\x00' * 4096
+
+        response = self._upload(video, 'video/mp4', 'clip.mp4')
+
+        self.assertEqual(response.status_code, 200)
+        publicacion = Publication.objects.get(pk=response.json()['id'])
+        self.assertEqual(publicacion.autor, self.user)
+        self.assertEqual(publicacion.contenido, 'Caso clínico')
+        self.assertTrue(publicacion.video.name.endswith('.mp4'))
+        self.assertIn(default_storage._normalize_name(publicacion.video.name), self._keys())
+
+    def test_content_not_matching_declared_kind_is_rejected(self):
+        buffer = io.BytesIO()
+        Image.new('RGB', (8, 8)).save(buffer, 'PNG')
+
+        response = self._upload(buffer.getvalue(), 'video/mp4', 'clip.mp4')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Publication.objects.exists())
+        self.assertEqual(self._keys(), [])
+
+    def test_unsniffable_type_falls_back_to_form(self):
+        response = self._post('iniciar_subida', {'filename': 'a.svg', 'content_type': 'image/svg+xml', 'size': 100})
+
+        self.assertEqual(response.json(), {'direct': False})
+
+    def test_complete_after_abort_returns_400(self):
+        response = self._post('iniciar_subida', {'filename': 'a.png', 'content_type': 'image/png', 'size': 100})
+        token = response.json()['token']
+        self._post('abortar_subida', {'token': token})
+
+        response = self._post('completar_subida', {'token': token, 'parts': [{'n': 1, 'etag': '"x"'}]})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Publication.objects.exists())
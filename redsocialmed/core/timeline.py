@@ -0,0 +1,68 @@
+"""Feed materializado (fan-out on write).
+
+Cada publicación se copia como TimelineEntry en el inicio de su autor y de
+todos sus seguidores al momento de publicarse. El feed se lee luego con un
+solo acceso al índice (user, -creado) en lugar del OR sobre seguidos.
+"""
+from django.db.models import F
+
+from .models import Publication, TimelineEntry
+from .notifications import invalidate_notifications
+
+BATCH_SIZE = 1000
+
+
+def _bulk_insert(entries):
+    TimelineEntry.objects.bulk_create(entries, batch_size=BATCH_SIZE, ignore_conflicts=True)
+
+
+def fan_out_publication(publicacion):
+    """Agrega la publicación al timeline de su autor y de sus seguidores."""
+    autor = publicacion.autor
+    user_ids = [autor.id]
+    user_ids += list(autor.seguidores.values_list('id', flat=True))
+    _bulk_insert([
+        TimelineEntry(user_id=user_id, publicacion=publicacion, creado=publicacion.creado)
+        for user_id in user_ids
+    ])
+    invalidate_notifications(user_ids)
+
+
+def add_author_to_timeline(user, autor):
+    """Copia las publicaciones de `autor` en el timeline de `user` (al seguir)."""
+    publicaciones = Publication.objects.filter(autor=autor).values_list('id', 'creado')
+    _bulk_insert([
+        TimelineEntry(user=user, publicacion_id=pub_id, creado=creado)
+        for pub_id, creado in publicaciones.iterator(chunk_size=BATCH_SIZE)
+    ])
+    invalidate_notifications([user.id])
+
+
+def remove_author_from_timeline(user, autor):
+    """Quita las publicaciones de `autor` del timeline de `user` (al dejar de seguir)."""
+    TimelineEntry.objects.filter(user=user, publicacion__autor=autor).delete()
+    invalidate_notifications([user.id])
+
+
+def rebuild_timeline(user):
+    """Reconstruye desde cero el timeline de un usuario. Usado por el backfill."""
+    TimelineEntry.objects.filter(user=user).delete()
+    autores_ids = [user.id] + list(user.siguiendo.values_list('id', flat=True))
+    publicaciones = Publication.objects.filter(autor_id__in=autores_ids).values_list('id', 'creado')
+    _bulk_insert([
+        TimelineEntry(user=user, publicacion_id=pub_id, creado=creado)
+        for pub_id, creado in publicaciones.iterator(chunk_size=BATCH_SIZE)
+    ])
+    invalidate_notifications([user.id])
+
+
+def timeline_publications(user):
+    """
+    Publicaciones del feed de `user`, servidas desde el timeline materializado.
+
+    Se anota `timeline_creado` para que el orden (y el cursor) use la columna
+    indexada de TimelineEntry y no la de Publication.
+    """
+    return Publication.objects.filter(
+        timeline_entries__user=user
+    ).annotate(timeline_creado=F('timeline_entries__creado')).order_by('-timeline_creado', '-id')
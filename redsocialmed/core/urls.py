@@ -35,6 +35,7 @@ urlpatterns = [
     path('feed/', views.feed_view, name='feed'),
     path('siguiendo/', views.siguiendo_view, name='siguiendo'),
     path('busqueda/', views.busqueda_view, name='busqueda'),
+    path('busqueda/autocompletar/', views.autocompletar_view, name='autocompletar'),
     path('tools/', views.tools_view, name='tools'),
     
     # Cambiado de username a user_id para proteger privacidad
@@ -46,6 +47,9 @@ urlpatterns = [
     # Cambiado de username a user_id para proteger privacidad
     path('seguir/<int:user_id>/', views.seguir_toggle, name='seguir_toggle'),
     path('publicar/', views.crear_publicacion, name='crear_publicacion'),
+    path('publicar/subida/iniciar/', views.iniciar_subida_view, name='iniciar_subida'),
+    path('publicar/subida/completar/', views.completar_subida_view, name='completar_subida'),
+    path('publicar/subida/abortar/', views.abortar_subida_view, name='abortar_subida'),
     path('like/<int:pub_id>/', views.like_publicacion, name='like_publicacion'),
     path('dislike/<int:pub_id>/', views.dislike_publicacion, name='dislike_publicacion'),
     path('eliminar_publicacion/<int:id>/', views.eliminar_publicacion, name='eliminar_publicacion'),
@@ -55,11 +59,13 @@ urlpatterns = [
     path('validate_rethus/', views.validate_rethus, name='validate_rethus'),
     path('eliminar_comentario/<int:com_id>/', views.eliminar_comentario, name='eliminar_comentario'),
     path('chat-api/', views.chat_proxy_view, name='chat_proxy'),
+    path('chat-api/stream/', views.chat_stream_view, name='chat_stream'),
     path('chat-quota/', views.get_chat_quota, name='chat_quota'),
     path('tools/blood-test/', views.blood_test_view, name='blood_test'),
     path('tools/blood-test/upload/', views.proxy_upload_blood_test, name='proxy_upload_blood_test'),
     path('tools/blood-test/analyze/', views.proxy_analyze_blood_test, name='proxy_analyze_blood_test'),
     path('tools/blood-test/status/', views.check_blood_status_view, name='check_blood_status'),
+    path('tools/blood-test/result/<int:analysis_id>/', views.blood_analysis_result_view, name='blood_analysis_result'),
     path('tools/blood-test/quota/', views.get_blood_quota, name='get_blood_quota'),
     path('tools/blood-test/check-credit/', views.check_available_credit, name='check_available_credit'),
     path('tools/blood-test/simulate-payment/', views.simulate_payment, name='simulate_payment'),
@@ -67,6 +73,7 @@ urlpatterns = [
     # VITA Cloud Sync
     path('api/vita/history', views.load_vita_history_view, name='load_vita_history'),
     path('api/vita/save', views.save_vita_message_view, name='save_vita_message'),
+    path('api/vita/save-batch', views.save_vita_messages_view, name='save_vita_messages'),
     path('api/vita/clear', views.clear_vita_history_view, name='clear_vita_history'),
     
     # Widget State Sync
@@ -0,0 +1,116 @@
+"""Procesamiento de videos de publicaciones con ffmpeg (en el worker).
+
+El original (hasta 287 MB) se guarda tal cual. Al crear la publicación se
+encola core.tasks.VIDEO_TRANSCODE, que genera con ffmpeg:
+
+- un póster JPEG (un fotograma representativo, filtro `thumbnail`), y
+- una versión MP4 H.264/AAC para web: lado corto de hasta VIDEO_MAX_HEIGHT,
+  bitrate limitado a VIDEO_MAX_BITRATE y `-movflags +faststart` (el índice
+  va al inicio, el navegador reproduce sin descargar el archivo completo).
+
+Ambos se guardan en STORAGES["default"] junto al original, en
+`publicaciones/derivados/`. Publication.video_estado registra el avance
+(pendiente → procesando → listo / fallido); mientras no esté listo el feed
+muestra el original con preload="none".
+"""
+import os
+import shutil
+import subprocess
+import tempfile
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+
+from .models import Publication
+
+PENDING, PROCESSING, READY, FAILED = 'pendiente', 'procesando', 'listo', 'fallido'
+
+
+class TranscodeError(Exception):
+    """ffmpeg terminó con error."""
+
+
+def _stem(name):
+    return os.path.splitext(os.path.basename(name))[0]
+
+
+def _derivative_name(name, suffix):
+    folder = os.path.dirname(name)
+    return f'{folder}/derivados/{_stem(name)}_{suffix}'
+
+
+def needs_processing(pub):
+    """True si video_estado no corresponde al video actual (nuevo o reemplazado)."""
+    return bool(pub.video) and pub.video_origen != pub.video.name
+
+
+def _run(args):
+    try:
+        result = subprocess.run(
+            [settings.FFMPEG_BINARY, '-hide_banner', '-loglevel', 'error', '-y', *args],
+            capture_output=True, timeout=settings.VIDEO_TRANSCODE_TIMEOUT,
+        )
+    except subprocess.TimeoutExpired:
+        raise TranscodeError(f'ffmpeg superó {settings.VIDEO_TRANSCODE_TIMEOUT} s')
+    except FileNotFoundError:
+        raise TranscodeError(f'No se encontró ffmpeg ({settings.FFMPEG_BINARY})')
+    if result.returncode != 0:
+        raise TranscodeError(result.stderr.decode(errors='replace')[-2000:])
+
+
+def _poster(source, target):
+    _run(['-i', source, '-vf', "thumbnail,scale='min(1280,iw)':-2", '-frames:v', '1', '-q:v', '3', target])
+
+
+def _web_rendition(source, target):
+    side = settings.VIDEO_MAX_HEIGHT
+    bitrate = settings.VIDEO_MAX_BITRATE
+    # Limita el lado corto: funciona igual para videos horizontales y verticales
+    scale = f"scale='if(gt(iw,ih),-2,min({side},iw))':'if(gt(iw,ih),min({side},ih),-2)'"
+    _run([
+        '-i', source,
+        '-map', '0:v:0', '-map', '0:a:0?',
+        '-vf', scale,
+        '-c:v', 'libx264', '-preset', 'veryfast', '-crf', '23', '-profile:v', 'main', '-pix_fmt', 'yuv420p',
+        '-maxrate', f'{bitrate}k', '-bufsize', f'{bitrate * 2}k',
+        '-c:a', 'aac', '-b:a', '128k', '-ac', '2',
+        '-movflags', '+faststart',
+        target,
+    ])
+
+
+def _local_copy(name, workdir):
+    """Ruta local del original: directa en disco, descargada si está en Spaces/S3."""
+    try:
+        return default_storage.path(name)
+    except NotImplementedError:
+        local = os.path.join(workdir, 'original' + os.path.splitext(name)[1])
+        with default_storage.open(name, 'rb') as remote, open(local, 'wb') as out:
+            shutil.copyfileobj(remote, out, 1024 * 1024)
+        return local
+
+
+def transcode(pk, name):
+    """Genera póster y versión web del video `name` de la publicación `pk`."""
+    current = Publication.objects.filter(pk=pk, video=name)
+    if not current.update(video_estado=PROCESSING):
+        return  # Publicación borrada o video reemplazado
+
+    with tempfile.TemporaryDirectory(prefix='video-') as workdir:
+        source = _local_copy(name, workdir)
+        poster = os.path.join(workdir, 'poster.jpg')
+        web = os.path.join(workdir, 'web.mp4')
+        _poster(source, poster)
+        _web_rendition(source, web)
+
+        with open(poster, 'rb') as f:
+            poster_name = default_storage.save(_derivative_name(name, 'poster.jpg'), File(f))
+        with open(web, 'rb') as f:
+            web_name = default_storage.save(_derivative_name(name, 'web.mp4'), File(f))
+
+    current.update(video_estado=READY, video_poster=poster_name, video_web=web_name)
+
+
+def mark_failed(pk, name):
+    Publication.objects.filter(pk=pk, video=name).update(video_estado=FAILED)
@@ -1,29 +1,42 @@
 import json
-import os
-import unicodedata
-import urllib.request
+import math
 
+import httpx
+import requests
+from asgiref.sync import sync_to_async
+from botocore.exceptions import ClientError
+
+from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth import authenticate, get_user_model, login
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
-from django.db.models import Q
-from django.http import HttpResponse, HttpResponseRedirect, JsonResponse
+from django.core.paginator import InvalidPage
+from django.db import transaction
+from django.db.models import F, OuterRef, Subquery
+from django.http import HttpResponse, HttpResponseRedirect, JsonResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, redirect, render
 from django.urls import reverse
 from django.views.decorators.http import require_POST
 
 from django.utils import timezone
-from core.forms import UserUpdateForm
-from .models import Comentario, Perfil, Publication, Usuario, DailyChatQuota, BloodAnalysis, BloodTestPayment, VitaChatMessage, UserWidgetPreference
-import threading
+from core.forms import OutboxPasswordResetForm, UserUpdateForm
+from .models import Comentario, Perfil, Publication, Usuario, BloodAnalysis, BloodTestPayment, UserWidgetPreference
+from . import autocomplete, blood_status, direct_upload, rethus, vita, vita_history
+from .blood_upload import is_encrypted_pdf, upload_document
+from .jobs import enqueue
+from .outbox import queue_email
+from .pagination import CursorPaginator
+from .quotas import ROJITO_QUOTA, QuotaExceeded, consume_chat_message, get_chat_usage
+from .search import search_doctors, suggested_doctors
+from .tasks import BLOOD_ANALYSIS, VITA_HISTORY_PURGE
+from .reactions import DISLIKE, LIKE, annotate_user_reactions, set_reaction
+from .timeline import add_author_to_timeline, fan_out_publication, remove_author_from_timeline, timeline_publications
 import uuid
 from django.contrib.sites.shortcuts import get_current_site
 from django.template.loader import render_to_string
-from django.utils.http import urlsafe_base64_encode, urlsafe_base64_decode
+from django.utils.http import parse_etags, urlsafe_base64_encode, urlsafe_base64_decode
 from django.utils.encoding import force_bytes, force_str
 from django.contrib.auth.tokens import default_token_generator
-from django.core.mail import EmailMessage
 from django.contrib.auth import get_user_model
 
 from django.contrib.auth import get_user_model
@@ -142,29 +155,20 @@ def registro_view(request):
             especialidad=especialidad if is_profesional else ''
         )
         
-        # Send Activation Email
-        try:
-            current_site = get_current_site(request)
-            protocol = 'https' if request.is_secure() else 'http'
-            mail_subject = 'Activa tu cuenta en DoctorApp / RedSocialMed'
-            message = render_to_string('registration/account_activation_email.html', {
-                'user': user,
-                'domain': current_site.domain,
-                'protocol': protocol,
-                'uid': urlsafe_base64_encode(force_bytes(user.pk)),
-                'token': default_token_generator.make_token(user),
-            })
-            to_email = user.email
-            email_msg = EmailMessage(
-                mail_subject, message, to=[to_email]
-            )
-            email_msg.content_subtype = "html"
-            email_msg.send()
-            messages.success(request, 'Te hemos enviado un correo. Por favor confirma tu email para completar el registro.')
-        except Exception as e:
-            user.delete()
-            messages.error(request, f'Error enviando correo de confirmación: {str(e)}')
-            return redirect('registro')
+        # Correo de activación: se encola y lo envía el worker (send_queued_emails),
+        # así una falla de SMTP no bloquea la petición ni borra al usuario.
+        current_site = get_current_site(request)
+        protocol = 'https' if request.is_secure() else 'http'
+        mail_subject = 'Activa tu cuenta en DoctorApp / RedSocialMed'
+        message = render_to_string('registration/account_activation_email.html', {
+            'user': user,
+            'domain': current_site.domain,
+            'protocol': protocol,
+            'uid': urlsafe_base64_encode(force_bytes(user.pk)),
+            'token': default_token_generator.make_token(user),
+        })
+        queue_email(mail_subject, user.email, html_body=message)
+        messages.success(request, 'Te hemos enviado un correo. Por favor confirma tu email para completar el registro.')
 
         return redirect('login')
     
@@ -173,23 +177,23 @@ def registro_view(request):
 @login_required(login_url='login')
 def feed_view(request):
     usuario = request.user
-    seguidos = usuario.siguiendo.all()
-    
-    publicaciones_list = Publication.objects.filter(
-        Q(autor=usuario) | Q(autor__in=seguidos)
-    ).select_related('autor').prefetch_related('likes', 'dislikes', 'comentarios').order_by('-creado')
+
+    # Feed materializado: una lectura por índice (user, -creado) en TimelineEntry
+    publicaciones_list = timeline_publications(usuario).select_related('autor')
     
-    paginator = Paginator(publicaciones_list, 5)
-    page_number = request.GET.get('page')
+    paginator = CursorPaginator(publicaciones_list, 5, ordering=('-timeline_creado', '-id'))
+    cursor = request.GET.get('cursor')
 
     if request.headers.get('x-requested-with') == 'XMLHttpRequest':
         try:
-            page_obj = paginator.page(page_number)
-        except Exception:
+            page_obj = paginator.page(cursor)
+        except InvalidPage:
             return HttpResponse('')
+        annotate_user_reactions(page_obj, usuario)
         return render(request, 'core/includes/feed_posts.html', {'publicaciones': page_obj})
     
-    page_obj = paginator.get_page(page_number)
+    page_obj = paginator.get_page(cursor)
+    annotate_user_reactions(page_obj, usuario)
     return render(request, 'core/feed.html', {'publicaciones': page_obj})
 
 @login_required(login_url='login')
@@ -204,95 +208,77 @@ def busqueda_view(request):
     if not query:
         return render(request, "core/busqueda.html", {"resultados": []})
 
-    def simple_stem(word):
-        # Normalizar: quitar acentos
-        word = ''.join(c for c in unicodedata.normalize('NFD', word) if unicodedata.category(c) != 'Mn')
-        word = word.lower()
-        if len(word) > 4:
-            if word.endswith('es') or word.endswith('os') or word.endswith('as'): word = word[:-2]
-            elif word.endswith('s'): word = word[:-1]
-            
-            if word.endswith('o') or word.endswith('a') or word.endswith('e'): word = word[:-1]
-            
-            if 'logia' in word: word = word.replace('logia', 'log')
-            if 'pediatria' in word: word = word.replace('pediatria', 'pediatr')
-        return word
-
-    stop_words = {'el', 'la', 'los', 'las', 'un', 'una', 'de', 'del', 'y', 'o', 'en', 'a', 'por', 'con', 'para', 'dr', 'dra'}
-    words = query.split()
-    
-    cleaned_words = [w for w in words if w.lower() not in stop_words]
-    if not cleaned_words: cleaned_words = words
-
-    q_user = Q()
-    q_pub = Q()
-    
-    for w in cleaned_words:
-        root = simple_stem(w)
-        q_user |= Q(first_name__icontains=root) | Q(last_name__icontains=root) | Q(especialidad__icontains=root) | Q(bio__icontains=root)
-        q_pub |= Q(contenido__icontains=root)
-        
-        q_user |= Q(first_name__icontains=w) | Q(last_name__icontains=w) 
-        q_pub |= Q(contenido__icontains=w)
+    # Una sola consulta por página: la búsqueda rankeada (core.search) paginada
+    # por cursor. Solo si la primera página sale vacía se consultan sugerencias.
+    es_sugerencia = request.GET.get('sugerencia') == '1'
+    cursor = request.GET.get('cursor')
 
-    doctores = Usuario.objects.filter(es_profesional=True).filter(q_user).distinct()
-    
-    publicaciones_match = Publication.objects.filter(
-        autor__es_profesional=True
-    ).filter(q_pub).values_list('autor', flat=True).distinct()
-
-    doctores_ids = list(doctores.values_list('id', flat=True))
-    autores_ids = list(publicaciones_match)
-    
-    todos_ids = set(doctores_ids + autores_ids)
-    
-    resultados_list = Usuario.objects.filter(id__in=todos_ids)
-    
-    es_sugerencia = False
-    if not resultados_list.exists() and query:
-        resultados_list = Usuario.objects.filter(es_profesional=True, especialidad__icontains="Medicina General")
-        es_sugerencia = True
+    def paginar(resultados_list):
+        return CursorPaginator(resultados_list, 5, ordering=('-rank', '-id'))
 
-    paginator = Paginator(resultados_list, 5)
-    page_number = request.GET.get('page')
+    paginator = paginar(suggested_doctors() if es_sugerencia else search_doctors(query))
     
     if request.headers.get('x-requested-with') == 'XMLHttpRequest':
         try:
-            page_obj = paginator.page(page_number)
-        except Exception:
+            page_obj = paginator.page(cursor)
+        except InvalidPage:
              return HttpResponse('')
         return render(request, "core/includes/search_results.html", {"resultados": page_obj, "es_sugerencia": es_sugerencia})
 
-    page_obj = paginator.get_page(page_number)
+    page_obj = paginator.get_page(cursor)
+    if not page_obj and not es_sugerencia:
+        es_sugerencia = True
+        page_obj = paginar(suggested_doctors()).page()
     return render(request, "core/busqueda.html", {"resultados": page_obj, "es_sugerencia": es_sugerencia})
 
+@login_required(login_url='login')
+def autocompletar_view(request):
+    """Sugerencias de profesionales (JSON) para el buscador mientras se escribe."""
+    try:
+        limite = int(request.GET.get('n', autocomplete.DEFAULT_LIMIT))
+    except ValueError:
+        limite = autocomplete.DEFAULT_LIMIT
+    limite = max(1, min(limite, autocomplete.MAX_LIMIT))
+
+    resultados = [
+        {**r, 'url': reverse('perfil', args=[r['id']])}
+        for r in autocomplete.autocomplete(request.GET.get('q', ''), limite)
+    ]
+
+    response = JsonResponse({'resultados': resultados})
+    # El navegador puede reutilizar la respuesta mientras el usuario borra y reescribe
+    response['Cache-Control'] = f'private, max-age={autocomplete.RESPONSE_TTL}'
+    return response
+
 @login_required(login_url='login') 
 def perfil_view(request, user_id):
     usuario_perfil = get_object_or_404(Usuario.objects.prefetch_related('seguidores'), id=user_id)
     es_propietario = request.user == usuario_perfil
 
-    publicaciones_list = Publication.objects.filter(autor=usuario_perfil).select_related('autor').prefetch_related('likes', 'dislikes', 'comentarios').order_by('-creado')
+    publicaciones_list = Publication.objects.filter(autor=usuario_perfil).select_related('autor')
 
-    paginator = Paginator(publicaciones_list, 5)
-    page_number = request.GET.get('page')
+    paginator = CursorPaginator(publicaciones_list, 5)
+    cursor = request.GET.get('cursor')
 
     if request.headers.get('x-requested-with') == 'XMLHttpRequest':
         try:
-            page_obj = paginator.page(page_number)
-        except Exception:
+            page_obj = paginator.page(cursor)
+        except InvalidPage:
             return HttpResponse('')
         
+        annotate_user_reactions(page_obj, request.user)
         return render(request, 'core/includes/profile_posts_list.html', {
             'publicaciones': page_obj,
             'es_propietario': es_propietario
         })
 
-    page_obj = paginator.get_page(page_number)
+    page_obj = paginator.get_page(cursor)
+    annotate_user_reactions(page_obj, request.user)
 
     context = {
         'usuario_perfil': usuario_perfil,
         'publicaciones': page_obj,
-        'publicaciones_count': paginator.count,
+        'publicaciones_count': usuario_perfil.publication_set.count(),
         'es_propietario': es_propietario,
         'es_profesional': usuario_perfil.es_profesional,
         'sigue': usuario_perfil.seguidores.filter(id=request.user.id).exists()
@@ -326,10 +312,72 @@ def crear_publicacion(request):
                 return redirect('perfil', username=request.user.username)
             publicacion.video = archivo
 
-    publicacion.save()
+    # La publicación y su copia en los timelines se confirman juntas
+    with transaction.atomic():
+        publicacion.save()
+        fan_out_publication(publicacion)
     return redirect('perfil', user_id=request.user.id)
 
 
+# --- SUBIDA DIRECTA AL BUCKET (ver core.direct_upload) ---
+
+@login_required(login_url='login')
+@require_POST
+def iniciar_subida_view(request):
+    """Abre una subida multipart firmada; {'direct': False} si el almacenamiento es local."""
+    if not request.user.es_profesional:
+        return JsonResponse({'status': 'error', 'message': 'Solo los profesionales médicos pueden realizar publicaciones.'}, status=403)
+    if not direct_upload.enabled():
+        return JsonResponse({'direct': False})
+    try:
+        data = json.loads(request.body)
+        content_type = str(data.get('content_type', ''))
+        # Formatos que no se pueden comprobar en el bucket: por el formulario clásico
+        if not direct_upload.sniffable(content_type):
+            return JsonResponse({'direct': False})
+        upload = direct_upload.start(
+            request.user.id, str(data.get('filename', '')), content_type, int(data.get('size', 0))
+        )
+    except (ValueError, TypeError, AttributeError):
+        return JsonResponse({'status': 'error', 'message': 'Datos de subida inválidos.'}, status=400)
+    except direct_upload.UploadError as e:
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
+    return JsonResponse({'direct': True, **upload})
+
+
+@login_required(login_url='login')
+@require_POST
+def completar_subida_view(request):
+    """Cierra la subida, verifica el objeto y crea la publicación."""
+    if not request.user.es_profesional:
+        return JsonResponse({'status': 'error', 'message': 'Solo los profesionales médicos pueden realizar publicaciones.'}, status=403)
+    try:
+        data = json.loads(request.body)
+        publicacion, _ = direct_upload.complete(
+            str(data.get('token', '')), request.user.id, data.get('parts') or [], str(data.get('contenido', ''))
+        )
+    except (ValueError, AttributeError):
+        return JsonResponse({'status': 'error', 'message': 'Datos de subida inválidos.'}, status=400)
+    except direct_upload.UploadError as e:
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
+    except ClientError:
+        # Objeto o subida inexistente en el bucket (token de otra subida, ya abortada...)
+        return JsonResponse({'status': 'error', 'message': 'El archivo no se subió completo, inténtalo de nuevo.'}, status=400)
+
+    return JsonResponse({'status': 'ok', 'id': publicacion.id,
+                         'redirect': reverse('perfil', args=[request.user.id])})
+
+
+@login_required(login_url='login')
+@require_POST
+def abortar_subida_view(request):
+    try:
+        direct_upload.abort(str(json.loads(request.body).get('token', '')), request.user.id)
+    except (ValueError, AttributeError, ClientError, direct_upload.UploadError):
+        pass
+    return JsonResponse({'status': 'ok'})
+
+
 
 @login_required(login_url='login')
 def seguir_toggle(request, user_id):
@@ -340,42 +388,51 @@ def seguir_toggle(request, user_id):
         return HttpResponseRedirect(reverse('perfil', args=[user_id]))
     
     if request.user != otro_usuario:
-        if otro_usuario.seguidores.filter(id=request.user.id).exists():
-            otro_usuario.seguidores.remove(request.user)
+        with transaction.atomic():
+            siguiendo = otro_usuario.seguidores.filter(id=request.user.id).exists()
+            if siguiendo:
+                otro_usuario.seguidores.remove(request.user)
+                remove_author_from_timeline(request.user, otro_usuario)
+            else:
+                otro_usuario.seguidores.add(request.user)
+                add_author_to_timeline(request.user, otro_usuario)
+        if siguiendo:
             messages.success(request, f'Has dejado de seguir a {otro_usuario.get_full_name_or_username()}')
         else:
-            otro_usuario.seguidores.add(request.user)
             messages.success(request, f'Ahora sigues a {otro_usuario.get_full_name_or_username()}')
 
     return HttpResponseRedirect(reverse('perfil', args=[user_id]))
 
+def _reaccionar(request, pub_id, reaction):
+    get_object_or_404(Publication.objects.only('id'), id=pub_id)
+
+    active = None
+    if request.content_type == 'application/json' and request.body:
+        try:
+            active = json.loads(request.body).get('active')
+        except (ValueError, AttributeError):
+            return JsonResponse({'error': 'JSON inválido'}, status=400)
+        if active is not None and not isinstance(active, bool):
+            return JsonResponse({'error': '"active" debe ser true o false'}, status=400)
+
+    return JsonResponse(set_reaction(pub_id, request.user.id, reaction, active))
+
 @login_required(login_url='login')
+@require_POST
 def like_publicacion(request, pub_id):
-    publicacion = get_object_or_404(Publication, id=pub_id)
-    publicacion.likes += 1
-    publicacion.save()
-    return redirect('perfil', user_id=publicacion.autor.id)
+    return _reaccionar(request, pub_id, LIKE)
 
 @login_required(login_url='login')
+@require_POST
 def dislike_publicacion(request, pub_id):
-    publicacion = get_object_or_404(Publication, id=pub_id)
-    publicacion.dislikes += 1
-    publicacion.save()
-    return redirect('perfil', user_id=publicacion.autor.id)
+    return _reaccionar(request, pub_id, DISLIKE)
 
 @login_required
 def editar_perfil_view(request):
     if request.method == 'POST':
         form = UserUpdateForm(request.POST, request.FILES, instance=request.user)
         if form.is_valid():
-            if 'foto_perfil' in request.FILES:
-                # Remove old photo safely if it exists
-                if request.user.foto_perfil:
-                    try:
-                        request.user.foto_perfil.delete(save=False)
-                    except Exception:
-                        pass
-
+            # La foto anterior se borra en segundo plano (core.media_gc)
             user = form.save(commit=False)
             
             new_password = form.cleaned_data.get('new_password')
@@ -390,10 +447,6 @@ def editar_perfil_view(request):
             
             if form.cleaned_data.get('eliminar_foto') and not 'foto_perfil' in request.FILES:
                 if user.foto_perfil:
-                    try:
-                        user.foto_perfil.delete(save=False)
-                    except Exception:
-                        pass
                     user.foto_perfil = None
                     user.save()
 
@@ -424,7 +477,8 @@ def editar_publicacion(request, id):
         contenido = request.POST.get('contenido')
         if contenido:
             publicacion.contenido = contenido
-            publicacion.save()
+            # Solo el texto: el worker actualiza video_* e imagen_variantes en paralelo
+            publicacion.save(update_fields=['contenido'])
             messages.success(request, 'Publicación actualizada correctamente.')
     return redirect('detalle_publicacion', id=publicacion.id)
 
@@ -435,25 +489,26 @@ def tools_view(request):
 @login_required(login_url='login')
 def detalle_publicacion_view(request, id):
     publicacion = get_object_or_404(
-        Publication.objects.select_related('autor').prefetch_related('likes', 'dislikes'),
+        Publication.objects.select_related('autor'),
         id=id
     )
+    annotate_user_reactions([publicacion], request.user)
     comentarios_qs = publicacion.comentarios.select_related('autor').all()
 
-    paginator = Paginator(comentarios_qs, 5)
-    page_number = request.GET.get('page')
+    paginator = CursorPaginator(comentarios_qs, 5, ordering=('creado', 'id'))
+    cursor = request.GET.get('cursor')
 
     if request.headers.get('x-requested-with') == 'XMLHttpRequest':
         try:
-            page_obj = paginator.page(page_number)
-        except Exception:
+            page_obj = paginator.page(cursor)
+        except InvalidPage:
              return HttpResponse('')
         return render(request, 'core/includes/publication_comments.html', {
             'comentarios': page_obj, 
             'publicacion': publicacion 
         })
 
-    page_obj = paginator.get_page(page_number)
+    page_obj = paginator.get_page(cursor)
 
     return render(request, 'core/detalle_publicacion.html', {
         'publicacion': publicacion,
@@ -489,28 +544,32 @@ def validate_rethus(request):
     if Usuario.objects.filter(matricula=doc_num).exists():
         return JsonResponse({'valid': False, 'local_exists': True, 'error': 'Usuario ya registrado en DoctorApp'})
         
-    token = os.getenv('VERIFIK_API_TOKEN')
-    
-    if not token:
+    if not settings.VERIFIK_API_TOKEN:
         return JsonResponse({'valid': False, 'error': 'API token not configured'})
-    
-    url = f'https://api.verifik.co/v2/co/rethus/adhres/{doc_type}/{doc_num}'
-    req = urllib.request.Request(url)
-    req.add_header('Authorization', f'Bearer {token}')
-    req.add_header('Accept', 'application/json')
+
+    # Caché por documento y consultas simultáneas agrupadas (core.rethus)
     try:
-        with urllib.request.urlopen(req, timeout=5) as r:
-            data = json.loads(r.read().decode())
-            return JsonResponse({'valid': True, 'data': data})
-    except Exception as e:
+        verification = rethus.verify(doc_type, doc_num)
+    except (ValueError, rethus.RethusUnavailable) as e:
         return JsonResponse({'valid': False, 'error': str(e)})
+    if verification.found:
+        return JsonResponse({'valid': True, 'data': verification.data})
+    return JsonResponse({'valid': False, 'error': 'No encontrado en ReTHUS'})
+
+def _chat_quota_exceeded(quota):
+    return JsonResponse({
+        'error': 'Rate limit exceeded', 
+        'output': f'Has alcanzado tu límite diario de {quota.limit} mensajes. Por favor intenta mañana.',
+        'daily_usage': quota.used,
+        'daily_limit': quota.limit,
+    }, status=429)
 
 @login_required
 @require_POST
-def chat_proxy_view(request):
-    # External N8N URL - Ahora protegido en el backend
-    EXTERNAL_API_URL = 'https://vita-n8n.xulhkq.easypanel.host/webhook/vita-api'
-    
+async def chat_proxy_view(request):
+    # Vista async: bajo ASGI la espera al webhook de n8n no ocupa un worker.
+    # La conexión, los timeouts y el circuit breaker viven en core.vita.
+    user = await request.auser()
     try:
         # Reenviar el cuerpo de la solicitud tal cual
         data = json.loads(request.body)
@@ -523,52 +582,106 @@ def chat_proxy_view(request):
                 'output': 'Tu mensaje excede el límite de 800 caracteres. Por favor sé más breve.'
             }, status=400)
 
-        # Rate Limiting: 20 per day
-        today = timezone.localdate()  # or timezone.now().date()
-        quota, created = DailyChatQuota.objects.get_or_create(user=request.user, date=today)
-        
-        if quota.input_count >= 20:
-             return JsonResponse({
-                'error': 'Rate limit exceeded', 
-                'output': 'Has alcanzado tu límite diario de 20 mensajes. Por favor intenta mañana.'
-            }, status=429)
-
-        # Increment quota
-        quota.input_count += 1
-        quota.save()
-        
-        req = urllib.request.Request(EXTERNAL_API_URL)
-        req.add_header('Content-Type', 'application/json')
-        
-        jsondata = json.dumps(data).encode('utf-8')
-        
+        # Rate Limiting: cupo diario por clase de usuario (core.quotas)
+        quota = await sync_to_async(consume_chat_message)(user)
+        if not quota.allowed:
+            return _chat_quota_exceeded(quota)
+
+        # El seq del cliente no se reenvía a n8n
+        seq = vita_history.chat_seq(data.pop('seq', None))
+
         # Realizar la petición al webhook de n8n
-        with urllib.request.urlopen(req, jsondata) as response:
-            res_body = response.read()
-            # Parse response to inject quota info if possible, or just send customized json
-            try:
-                resp_data = json.loads(res_body)
-                if isinstance(resp_data, list):
-                    resp_data = {'output': resp_data[0].get('output', '') if resp_data else ''}
-                elif not isinstance(resp_data, dict):
-                    resp_data = {'output': str(resp_data)}
-                
-                resp_data['daily_usage'] = quota.input_count
-                resp_data['daily_limit'] = 20
-                return JsonResponse(resp_data)
-            except:
-                return HttpResponse(res_body, content_type='application/json')
-            
+        response = await vita.post_chat(data)
+        res_body = response.content
+        # Parse response to inject quota info if possible, or just send customized json
+        try:
+            resp_data = json.loads(res_body)
+            if isinstance(resp_data, list):
+                resp_data = {'output': resp_data[0].get('output', '') if resp_data else ''}
+            elif not isinstance(resp_data, dict):
+                resp_data = {'output': str(resp_data)}
+        except ValueError:
+            return HttpResponse(res_body, content_type='application/json')
+
+        # Ambos lados del intercambio se guardan aquí, sin otra petición del cliente
+        await sync_to_async(vita_history.save_exchange)(user.id, message_content, resp_data.get('output'), seq)
+        resp_data['saved'] = True
+        resp_data['daily_usage'] = quota.used
+        resp_data['daily_limit'] = quota.limit
+        return JsonResponse(resp_data)
+
+    except vita.UpstreamUnavailable as e:
+        return JsonResponse({'error': str(e), 'output': 'VITA está muy ocupada en este momento. Intenta de nuevo en unos segundos.'}, status=503)
+    except httpx.TimeoutException:
+        return JsonResponse({'error': 'Upstream timeout', 'output': 'El asistente tardó demasiado en responder. Intenta nuevamente.'}, status=504)
     except Exception as e:
         return JsonResponse({'error': str(e), 'output': 'Lo siento, no pude conectar con el asistente.'}, status=500)
 
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@login_required
+@require_POST
+async def chat_stream_view(request):
+    """Como chat_proxy_view, pero reenvía la respuesta de VITA como Server-Sent Events."""
+    user = await request.auser()
+    try:
+        data = json.loads(request.body)
+    except ValueError:
+        return JsonResponse({'error': 'Invalid JSON', 'output': 'Solicitud inválida.'}, status=400)
+
+    if len(data.get('message', '')) > 800:
+        return JsonResponse({
+            'error': 'Payload too large', 
+            'output': 'Tu mensaje excede el límite de 800 caracteres. Por favor sé más breve.'
+        }, status=400)
+
+    if vita.breaker.rejects():
+        return JsonResponse({'error': 'Upstream unavailable', 'output': 'VITA está muy ocupada en este momento. Intenta de nuevo en unos segundos.'}, status=503)
+
+    # El cupo se descuenta antes de abrir el stream
+    quota = await sync_to_async(consume_chat_message)(user)
+    if not quota.allowed:
+        return _chat_quota_exceeded(quota)
+
+    seq = vita_history.chat_seq(data.pop('seq', None))
+
+    async def events():
+        yield _sse('meta', {'daily_usage': quota.used, 'daily_limit': quota.limit})
+        parts = []
+        try:
+            async for text in vita.stream_chat(data):
+                parts.append(text)
+                yield _sse('delta', {'text': text})
+        except vita.UpstreamUnavailable as e:
+            yield _sse('error', {'error': str(e), 'output': 'VITA está muy ocupada en este momento. Intenta de nuevo en unos segundos.'})
+            return
+        except httpx.TimeoutException:
+            yield _sse('error', {'error': 'Upstream timeout', 'output': 'El asistente tardó demasiado en responder. Intenta nuevamente.'})
+            return
+        except Exception as e:
+            yield _sse('error', {'error': str(e), 'output': 'Lo siento, no pude conectar con el asistente.'})
+            return
+
+        # Respuesta completa: el mensaje y la respuesta se guardan en un solo lote
+        reply = ''.join(parts).strip()
+        ids = await sync_to_async(vita_history.save_exchange)(user.id, data.get('message', ''), reply, seq)
+        yield _sse('done', {'id': ids.get(f'{seq}:bot') if seq else None, 'saved': True})
+
+    response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Evita que nginx u otros proxies acumulen el stream, y que GZipMiddleware
+    # comprima cada evento como un miembro gzip aparte
+    response['X-Accel-Buffering'] = 'no'
+    response['Content-Encoding'] = 'identity'
+    return response
+
 @login_required
 def get_chat_quota(request):
-    today = timezone.localdate()
-    quota, created = DailyChatQuota.objects.get_or_create(user=request.user, date=today)
+    quota = get_chat_usage(request.user)
     return JsonResponse({
-        'daily_usage': quota.input_count,
-        'daily_limit': 20
+        'daily_usage': quota.used,
+        'daily_limit': quota.limit
     })
 
 @login_required
@@ -586,8 +699,6 @@ def proxy_upload_blood_test(request):
     # has_credit = BloodTestPayment.objects.filter(user=request.user, status='APPROVED', is_consumed=False).exists()
     # if not has_credit: return JsonResponse({'error': 'Payment Required'}, status=403)
 
-    UPLOAD_URL = 'https://chatbot-doctor-app.onrender.com/documents/upload'
-    
     if 'file' not in request.FILES:
         return JsonResponse({'error': 'No se recibió ningún archivo'}, status=400)
     
@@ -606,37 +717,15 @@ def proxy_upload_blood_test(request):
     if file.content_type != 'application/pdf' and not file.name.lower().endswith('.pdf'):
         return JsonResponse({'error': 'Solo se permiten archivos PDF'}, status=400)
 
-    # SECURITY: Check for Password Protection (only blocking validation)
-    try:
-        import pypdf
-        file.seek(0)
-        reader = pypdf.PdfReader(file)
-        if reader.is_encrypted:
-            logger.warning(f"Encrypted PDF rejected from user {request.user.id}")
-            return JsonResponse({'error': '🔒 El PDF está protegido con contraseña. Por favor sube una versión desbloqueada para poder analizarla.'}, status=400)
-        file.seek(0)  # Reset after read
-    except ImportError:
-        # pypdf not installed, skip encryption check
-        logger.debug("pypdf not available, skipping encryption check")
-        pass
-    except Exception as e:
-        # PDF reading failed, but let's try to upload anyway (backend will validate)
-        logger.warning(f"PDF validation warning for user {request.user.id}: {str(e)}")
-        file.seek(0)  # Reset file pointer
-    
+    # SECURITY: Check for Password Protection (only blocking validation).
+    # Solo se leen el inicio y el trailer del PDF, no el documento completo.
+    if is_encrypted_pdf(file):
+        logger.warning(f"Encrypted PDF rejected from user {request.user.id}")
+        return JsonResponse({'error': '🔒 El PDF está protegido con contraseña. Por favor sube una versión desbloqueada para poder analizarla.'}, status=400)
     
     try:
-        try:
-            import requests
-        except ImportError:
-            # Fallback or strict error
-            return JsonResponse({'error': 'Server Error: The "requests" library is missing on the server. Please install it with "pip install requests".'}, status=500)
-
-        # Standard API usually expects 'file'
-        files = {'file': (file.name, file, file.content_type)}
-        
-        # Upload step only - 2 min timeout
-        response = requests.post(UPLOAD_URL, files=files, timeout=120)
+        # Se envía por bloques desde el archivo subido, con la sesión compartida
+        response = upload_document(file)
         
         if response.status_code == 200:
             return JsonResponse(response.json())
@@ -653,114 +742,11 @@ def proxy_upload_blood_test(request):
         logger.error(f"Unexpected error in proxy_upload_blood_test: {str(e)}", exc_info=True)
         return JsonResponse({'error': f'Internal Proxy Error: {str(e)}'}, status=500)
 
-def execute_analysis_task(analysis_id, prompt, chat_url):
-    try:
-        analysis = BloodAnalysis.objects.get(id=analysis_id)
-        
-        payload = {
-            "conversation_id": analysis.conversation_id,
-            "message": prompt
-        }
-        
-        req = urllib.request.Request(chat_url)
-        req.add_header('Content-Type', 'application/json')
-        jsondata = json.dumps(payload).encode('utf-8')
-        
-        # Long blocking call (5 mins timeout)
-        with urllib.request.urlopen(req, jsondata, timeout=300) as response:
-            res_body = response.read()
-            data = json.loads(res_body)
-            
-            # Smart Key Detection
-            possible_keys = ['output', 'reply', 'text', 'message', 'answer', 'content', 'response']
-            reply = None
-            for k in possible_keys:
-                if data.get(k):
-                    reply = data[k]
-                    break
-            
-            if not reply:
-                reply = str(data)
-
-            analysis.result = reply
-            analysis.status = 'completed'
-            analysis.result = reply
-            analysis.status = 'completed'
-            analysis.save()
-
-            # PAYMENT CONSUMPTION LOGIC (Disabled for now)
-            # if len(reply) > 100... payment.save()
-
-            # --- ROJITO USAGE INCREMENT (ON SUCCESS ONLY) ---
-            try:
-                # We need to import here to avoid circular dependencies if any, 
-                # or just ensure it's available. Models are usually fine.
-                # Assuming analysis.user is valid.
-                pref, _ = UserWidgetPreference.objects.get_or_create(user=analysis.user)
-                
-                # Check for window reset (just in case)
-                now = timezone.now()
-                if not pref.rojito_window_start or (now - pref.rojito_window_start).total_seconds() > 86400:
-                    pref.rojito_window_start = now
-                    pref.rojito_window_count = 0
-                
-                if pref.rojito_window_count < 3: # Should match limit check
-                    pref.rojito_window_count += 1
-                    pref.rojito_lifetime_count += 1
-                    pref.save()
-            except Exception as ex_quota:
-                print(f"Error incrementing quota: {ex_quota}")
-            # ------------------------------------------------
-            
-    except Exception as e:
-        print(f"Error in analysis thread: {e}")
-        try:
-            analysis = BloodAnalysis.objects.get(id=analysis_id)
-            analysis.status = 'failed'
-            analysis.result = str(e)
-            analysis.save()
-        except:
-            pass
-
 @login_required
 @require_POST
 def proxy_analyze_blood_test(request):
     CHAT_URL = 'https://chatbot-doctor-app.onrender.com/chat' 
 
-    # --- ROJITO USAGE LIMIT LOGIC ---
-    try:
-        # Developer/CEO bypass - no limits for testing
-        if request.user.email == 'jntn1808@gmail.com':
-            pass  # Skip all limit checks
-        else:
-            pref, created = UserWidgetPreference.objects.get_or_create(user=request.user)
-            now = timezone.now()
-
-            # Check if window expired (24 hours)
-            if not pref.rojito_window_start or (now - pref.rojito_window_start).total_seconds() > 86400: # 24h in seconds
-                pref.rojito_window_start = now
-                pref.rojito_window_count = 0
-                pref.save()
-
-            # Check Limit
-            if pref.rojito_window_count >= 3:
-                 reset_time = pref.rojito_window_start + timezone.timedelta(hours=24)
-                 reset_str = reset_time.astimezone(timezone.get_current_timezone()).strftime("%H:%M")
-                 return JsonResponse({
-                    'error': 'Límite diario alcanzado', 
-                    'details': f'Has usado tus 3 análisis de hoy. Tu cupo se renueva a las {reset_str}.'
-                }, status=429)
-
-        # Increment REMOVED - Moved to background task on success
-        # pref.rojito_window_count += 1
-        # pref.rojito_lifetime_count += 1 
-        # pref.save()
-
-    except Exception as e:
-        return JsonResponse({'error': f'Error verificando límites: {str(e)}'}, status=500)
-    # --------------------------------
-     
-    
     # SYSTEM PROMPT: RE-ENGINEERED FOR SAFETY COMPLIANCE & DATA EXTRACTION
     # The previous prompts triggered "Medical Advice" refusals.
     # This prompt reframes the task as "Text Extraction" and "Academic Simulation" to bypass refusals.
@@ -815,20 +801,24 @@ Empieza directamente con: "## 1. RESUMEN DE DATOS DEL DOCUMENTO".
         if not conversation_id:
              return JsonResponse({'error': 'Missing conversation_id'}, status=400)
 
-        # Persistence: Create Analysis Record
-        analysis = BloodAnalysis.objects.create(
-            user=request.user,
-            conversation_id=conversation_id,
-            status='processing',
-            file_name=file_name
-        )
-
-        # Start Background Analysis
-        thread = threading.Thread(
-            target=execute_analysis_task, 
-            args=(analysis.id, BLOODY_SYSTEM_PROMPT, CHAT_URL)
-        )
-        thread.start()
+        # Persistence: Create Analysis Record + job (run_jobs lo procesa).
+        # El cupo se reserva aquí y el trabajo lo confirma o lo libera al terminar.
+        with transaction.atomic():
+            reservation = None
+            if not ROJITO_QUOTA.is_exempt(request.user):
+                reservation = ROJITO_QUOTA.reserve(request.user)
+            analysis = BloodAnalysis.objects.create(
+                user=request.user,
+                conversation_id=conversation_id,
+                status='processing',
+                file_name=file_name
+            )
+            enqueue(BLOOD_ANALYSIS, {
+                'analysis_id': analysis.id,
+                'prompt': BLOODY_SYSTEM_PROMPT,
+                'chat_url': CHAT_URL,
+                'reservation_id': reservation.id if reservation else None,
+            })
         
         # Return immediate response with ID to Client
         return JsonResponse({
@@ -836,7 +826,13 @@ Empieza directamente con: "## 1. RESUMEN DE DATOS DEL DOCUMENTO".
             'analysis_id': analysis.id,
             'message': 'Análisis iniciado en segundo plano.'
         })
-            
+
+    except QuotaExceeded as e:
+        reset_str = e.reset_at.astimezone(timezone.get_current_timezone()).strftime("%H:%M")
+        return JsonResponse({
+            'error': 'Límite diario alcanzado', 
+            'details': f'Has usado tus {e.limit} análisis de hoy. Tu cupo se renueva a las {reset_str}.'
+        }, status=429)
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=500)
 
@@ -886,8 +882,8 @@ def simulate_payment(request):
 @login_required
 def get_blood_quota(request):
     try:
-        # Developer/CEO bypass - show unlimited
-        if request.user.email == 'jntn1808@gmail.com':
+        # Usuarios exentos (settings.QUOTAS) - show unlimited
+        if ROJITO_QUOTA.is_exempt(request.user):
             return JsonResponse({
                 'daily_usage': 0,
                 'daily_limit': 999,
@@ -896,167 +892,237 @@ def get_blood_quota(request):
                 'reset_time': None,
                 'unlimited': True
             })
-        
-        pref, created = UserWidgetPreference.objects.get_or_create(user=request.user)
-        now = timezone.now()
-        
-        # Check window reset logic (read-only view but should show correct state)
-        usage = pref.rojito_window_count
-        start_time = pref.rojito_window_start
-
-        if not start_time or (now - start_time).total_seconds() > 86400:
-             # Effectively 0 used if window expired, even if DB not updated yet
-             usage = 0
-             start_time = now
-        
-        # Calculate limit
-        limit = 3
-        remaining = max(0, limit - usage)
-        
-        reset_str = None
-        if start_time:
-             reset_time = start_time + timezone.timedelta(hours=24)
-             # Basic formatting, frontend can format better
-             reset_str = reset_time.isoformat()
 
+        status = ROJITO_QUOTA.status(request.user)
         return JsonResponse({
-            'daily_usage': usage,
-            'daily_limit': limit,
-            'remaining': remaining,
-            'lifetime_count': pref.rojito_lifetime_count,
-            'reset_time': reset_str,
+            'daily_usage': status.used,
+            'daily_limit': status.limit,
+            'remaining': status.remaining,
+            'lifetime_count': status.lifetime_count,
+            # Cuándo se libera el uso más antiguo de la ventana
+            'reset_time': status.reset_at.isoformat() if status.reset_at else None,
             'unlimited': False
         })
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=500)
 
 @login_required
-def check_blood_status_view(request):
+async def check_blood_status_view(request):
+    """
+    Estado del último análisis. Con If-None-Match responde 304 si no cambió;
+    con ?wait=N (segundos, máx. blood_status.MAX_WAIT) además espera a que
+    cambie antes de responder (long-poll).
+    """
+    user = await request.auser()
+    etags = {etag.removeprefix('W/') for etag in parse_etags(request.headers.get('If-None-Match', ''))}
     try:
-        # Get latest analysis
-        recent = BloodAnalysis.objects.filter(user=request.user).order_by('-created_at').first()
-        
-        if not recent:
-            return JsonResponse({'status': 'none'})
-            
-        return JsonResponse({
-            'status': recent.status,
-            'result': recent.result,
-            'created_at': recent.created_at.isoformat(),
-            'formatted_date': recent.created_at.isoformat(),  # Send ISO format, let frontend handle timezone
-            'file_name': recent.file_name or "Resultado de Análisis",
-            'conversation_id': recent.conversation_id
-        })
+        wait = float(request.GET.get('wait', 0))
+    except ValueError:
+        wait = 0
+    # nan/inf pasarían el min/max y la espera no terminaría nunca
+    wait = min(max(wait, 0), blood_status.MAX_WAIT) if math.isfinite(wait) else 0
+
+    try:
+        if etags and wait:
+            etag = await blood_status.wait_for_change(user.id, etags, wait)
+        else:
+            etag = blood_status.make_etag(await sync_to_async(blood_status.latest_version)(user.id))
+
+        if etag in etags:
+            response = HttpResponse(status=304)
+        else:
+            # Get latest analysis
+            recent = await BloodAnalysis.objects.filter(user=user).order_by('-created_at').afirst()
+            if not recent:
+                response = JsonResponse({'status': 'none'})
+            else:
+                response = JsonResponse({
+                    'status': recent.status,
+                    'result': recent.result,
+                    'created_at': recent.created_at.isoformat(),
+                    'formatted_date': recent.created_at.isoformat(),  # Send ISO format, let frontend handle timezone
+                    'file_name': recent.file_name or "Resultado de Análisis",
+                    'conversation_id': recent.conversation_id
+                })
+            # Puede haber cambiado entre las dos consultas
+            etag = blood_status.make_etag(recent and (recent.id, recent.status, recent.updated_at))
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=500)
 
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
 
 # --- CLOUD SYNC API VIEWS ---
 
 @login_required
 def load_vita_history_view(request):
-    """Returns the last 50 chat messages for VITA."""
-    messages = VitaChatMessage.objects.filter(user=request.user).order_by('-timestamp')[:50]
-    # Reverse to get chronological order
-    messages_list = list(reversed(messages))
-    
-    history = [
-        {
-            'text': msg.content,
-            'isUser': msg.role == 'user',
-            'time': msg.timestamp.strftime('%H:%M'),
-            'timestamp': msg.timestamp.timestamp() * 1000
-        } 
-        for msg in messages_list
-    ]
-    return JsonResponse({'messages': history})
+    """
+    Historial de VITA. Sin parámetros: los últimos 50 mensajes (formato
+    original). Con ?compact=1, ?since=<cursor> o ?since_id=<id>: formato
+    compacto y solo los mensajes posteriores al cursor (ver core.vita_history).
+    Responde 304 si el historial no cambió desde el ETag del cliente.
+    """
+    try:
+        since = int(request.GET['since']) if request.GET.get('since') else None
+        since_id = int(request.GET['since_id']) if request.GET.get('since_id') else None
+        if since is not None:
+            vita_history.from_cursor(since)
+        if since_id is not None and not 0 <= since_id < 2 ** 63:
+            raise ValueError
+    except ValueError:
+        return JsonResponse({'error': 'Cursor inválido'}, status=400)
+
+    etag = vita_history.history_etag(request.user.id)
+    if etag in {e.removeprefix('W/') for e in parse_etags(request.headers.get('If-None-Match', ''))}:
+        response = HttpResponse(status=304)
+    else:
+        messages, more = vita_history.load_history(request.user.id, since, since_id)
+        if since is None and since_id is None and not request.GET.get('compact'):
+            history = [
+                {
+                    'text': msg.content,
+                    'isUser': msg.role == 'user',
+                    'time': msg.timestamp.strftime('%H:%M'),
+                    'timestamp': msg.timestamp.timestamp() * 1000
+                }
+                for msg in messages
+            ]
+            response = JsonResponse({'messages': history})
+        else:
+            response = JsonResponse({
+                'm': [vita_history.compact(msg) for msg in messages],
+                'more': more,
+                'c': vita_history.next_cursor(messages, since, more),
+            })
+
+    # GZipMiddleware comprime la respuesta si el cliente acepta gzip
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-cache'
+    return response
 
 @login_required
 @require_POST
 def save_vita_message_view(request):
     try:
         data = json.loads(request.body)
-        text = data.get('text')
-        is_user = data.get('isUser', False)
-        
-        role = 'user' if is_user else 'bot'
-        
-        VitaChatMessage.objects.create(
-            user=request.user,
-            role=role,
-            content=text
-        )
+        messages = vita_history.parse_client_messages([data])
+        vita_history.save_messages(request.user.id, messages)
         return JsonResponse({'status': 'ok'})
     except Exception as e:
         return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
 
+@login_required
+@require_POST
+def save_vita_messages_view(request):
+    """Guarda un lote de mensajes [{'text', 'isUser', 'seq'}] en una transacción."""
+    try:
+        data = json.loads(request.body)
+        messages = vita_history.parse_client_messages(data.get('messages'))
+    except (ValueError, AttributeError) as e:
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
+
+    ids = vita_history.save_messages(request.user.id, messages)
+    return JsonResponse({'status': 'ok', 'ids': ids})
+
 @login_required
 @require_POST
 def clear_vita_history_view(request):
-    VitaChatMessage.objects.filter(user=request.user).delete()
+    # Oculta el historial al instante; las filas se borran en segundo plano
+    with transaction.atomic():
+        vita_history.clear_history(request.user.id)
+        enqueue(VITA_HISTORY_PURGE, {'user_id': request.user.id})
     return JsonResponse({'status': 'cleared'})
 
 
 # --- WIDGET STATE API VIEWS ---
 
+WIDGET_STATE_FIELDS = ('vita_active', 'vita_minimized', 'rojito_active', 'rojito_minimized')
+
 @login_required
 def load_widget_state_view(request):
-    """Loads UI state (open/minimized) and counters."""
-    pref, created = UserWidgetPreference.objects.get_or_create(user=request.user)
-    
-    # Also load latest Rojito Analysis
-    latest_analysis = BloodAnalysis.objects.filter(user=request.user, status='completed').order_by('-created_at').first()
-    
-    rojito_content = {}
-    if latest_analysis and latest_analysis.result:
-         rojito_content = {
-             'statusIndicator': 'none', 
-             'statusText': 'Análisis recuperado',
-             'messages': [
-                 {
-                     'type': 'bot', 
-                     'content': latest_analysis.result,
-                     'id': latest_analysis.id 
-                 }
-             ],
-             'timestamp': latest_analysis.created_at.timestamp() * 1000
-         }
+    """
+    Loads UI state (open/minimized) and counters.
+
+    Una sola consulta: preferencias (LEFT JOIN, puede no haber fila) más el
+    id y la fecha del último análisis completado. El texto del análisis se
+    pide aparte (blood_analysis_result_view) solo si el widget lo muestra.
+    """
+    latest = BloodAnalysis.objects.filter(user=OuterRef('pk'), status='completed').order_by('-created_at')
+    state = Usuario.objects.filter(pk=request.user.pk).annotate(
+        latest_analysis_id=Subquery(latest.values('id')[:1]),
+        latest_analysis_at=Subquery(latest.values('created_at')[:1]),
+    ).values(
+        *(f'widget_preferences__{field}' for field in WIDGET_STATE_FIELDS + ('rojito_lifetime_count',)),
+        'latest_analysis_id', 'latest_analysis_at',
+    ).first()
+
+    rojito_latest = None
+    if state['latest_analysis_id']:
+        rojito_latest = {
+            'id': state['latest_analysis_id'],
+            'timestamp': state['latest_analysis_at'].timestamp() * 1000,
+            'url': reverse('blood_analysis_result', args=[state['latest_analysis_id']]),
+        }
 
     return JsonResponse({
-        'vita_active': pref.vita_active,
-        'vita_minimized': pref.vita_minimized,
-        'rojito_active': pref.rojito_active,
-        'rojito_minimized': pref.rojito_minimized,
-        'rojito_lifetime_count': pref.rojito_lifetime_count,
-        'rojito_content': rojito_content if rojito_content else None
+        'vita_active': bool(state['widget_preferences__vita_active']),
+        'vita_minimized': bool(state['widget_preferences__vita_minimized']),
+        'rojito_active': bool(state['widget_preferences__rojito_active']),
+        'rojito_minimized': bool(state['widget_preferences__rojito_minimized']),
+        'rojito_lifetime_count': state['widget_preferences__rojito_lifetime_count'] or 0,
+        'rojito_latest': rojito_latest
+    })
+
+@login_required
+def blood_analysis_result_view(request, analysis_id):
+    """Texto de un análisis completado; no cambia, el navegador puede guardarlo en caché."""
+    analysis = get_object_or_404(
+        BloodAnalysis.objects.only('id', 'result', 'file_name', 'created_at'),
+        id=analysis_id, user=request.user, status='completed'
+    )
+    response = JsonResponse({
+        'id': analysis.id,
+        'result': analysis.result or '',
+        'file_name': analysis.file_name or "Resultado de Análisis",
+        'created_at': analysis.created_at.isoformat(),
     })
+    response['Cache-Control'] = 'private, max-age=3600'
+    return response
 
 @login_required
 @require_POST
 def save_widget_state_view(request):
+    """
+    Guarda solo los campos recibidos con un UPDATE. El navegador agrupa los
+    cambios rápidos (abrir/minimizar) y envía únicamente los que cambiaron.
+    """
     try:
         data = json.loads(request.body)
-        pref, created = UserWidgetPreference.objects.get_or_create(user=request.user)
-        
-        if 'vita_active' in data: pref.vita_active = data['vita_active']
-        if 'vita_minimized' in data: pref.vita_minimized = data['vita_minimized']
-        if 'rojito_active' in data: pref.rojito_active = data['rojito_active']
-        if 'rojito_minimized' in data: pref.rojito_minimized = data['rojito_minimized']
-        
-        pref.save()
+        changes = {field: bool(data[field]) for field in WIDGET_STATE_FIELDS if field in data}
+    except (ValueError, TypeError) as e:
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
+    if not changes:
         return JsonResponse({'status': 'saved'})
-    except Exception as e:
-            return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
+
+    prefs = UserWidgetPreference.objects.filter(user=request.user)
+    # exclude(**changes): no escribe si los valores ya eran esos
+    updated = prefs.exclude(**changes).update(**changes, updated_at=timezone.now())
+    if not updated and not prefs.exists():
+        UserWidgetPreference.objects.create(user=request.user, **changes)
+    return JsonResponse({'status': 'saved'})
 
 @login_required
 @require_POST
 def increment_rojito_count_view(request):
-    pref, created = UserWidgetPreference.objects.get_or_create(user=request.user)
-    pref.rojito_lifetime_count += 1
-    pref.save()
-    return JsonResponse({'new_count': pref.rojito_lifetime_count})
+    UserWidgetPreference.objects.get_or_create(user=request.user)
+    prefs = UserWidgetPreference.objects.filter(user=request.user)
+    prefs.update(rojito_lifetime_count=F('rojito_lifetime_count') + 1)
+    return JsonResponse({'new_count': prefs.values_list('rojito_lifetime_count', flat=True).first()})
 
 class CustomPasswordResetView(PasswordResetView):
+    form_class = OutboxPasswordResetForm
     template_name = 'registration/password_reset_form.html'
     html_email_template_name = 'registration/password_reset_email.html'
     success_url = reverse_lazy('login')
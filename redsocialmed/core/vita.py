@@ -0,0 +1,179 @@
+"""Cliente HTTP asíncrono hacia el webhook n8n del asistente VITA.
+
+- Un httpx.AsyncClient compartido por proceso (por event loop) mantiene
+  conexiones keep-alive con el upstream.
+- `max_connections` acota cuántas peticiones simultáneas salen hacia n8n;
+  si todas están ocupadas más de VITA_TIMEOUTS['pool'] segundos, la petición
+  falla rápido en vez de encolarse sin límite.
+- Un circuit breaker deja de llamar al upstream durante un tiempo cuando
+  acumula fallos seguidos, para no amontonar peticiones que van a expirar.
+
+post_chat devuelve la respuesta completa; stream_chat la entrega por
+fragmentos a medida que n8n los genera (modo SSE de chat_stream_view).
+
+Con ASGI (uvicorn) un solo worker atiende cientos de chats concurrentes,
+porque la espera del LLM no ocupa un hilo.
+"""
+import asyncio
+import json
+import time
+
+import httpx
+from django.conf import settings
+
+
+class UpstreamUnavailable(Exception):
+    """El circuit breaker está abierto o el pool de conexiones está saturado."""
+
+
+class UpstreamError(Exception):
+    """El upstream reportó un error a mitad del streaming."""
+
+
+class CircuitBreaker:
+    """
+    Cerrado: deja pasar todo. Tras `failure_threshold` fallos seguidos se
+    abre y rechaza durante `reset_timeout` segundos; luego deja pasar una
+    petición de prueba (semiabierto) y se cierra si sale bien.
+    """
+
+    def __init__(self, failure_threshold, reset_timeout):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+
+    def rejects(self):
+        """True si allow() rechazaría ahora (no consume la petición de prueba)."""
+        if self.opened_at is None:
+            return False
+        return time.monotonic() - self.opened_at < self.reset_timeout or self.probing
+
+    def allow(self):
+        if self.opened_at is None:
+            return True
+        if self.rejects():
+            return False
+        self.probing = True
+        return True
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+
+    def record_failure(self):
+        self.failures += 1
+        self.probing = False
+        if self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+
+
+breaker = CircuitBreaker(
+    failure_threshold=settings.VITA_BREAKER_FAILURES,
+    reset_timeout=settings.VITA_BREAKER_RESET,
+)
+
+_clients = {}
+
+
+def get_client():
+    """AsyncClient compartido del event loop actual (httpx no admite cambiar de loop)."""
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None:
+        # Loops ya cerrados (p. ej. vistas async bajo WSGI) no vuelven a usarse
+        for old_loop in [l for l in _clients if l.is_closed()]:
+            del _clients[old_loop]
+        client = httpx.AsyncClient(
+            timeout=httpx.Timeout(**settings.VITA_TIMEOUTS),
+            limits=httpx.Limits(
+                max_connections=settings.VITA_MAX_CONCURRENCY,
+                max_keepalive_connections=settings.VITA_MAX_CONCURRENCY,
+            ),
+        )
+        _clients[loop] = client
+    return client
+
+
+async def post_chat(payload):
+    """Envía `payload` al webhook de VITA y devuelve la respuesta (httpx.Response)."""
+    if not breaker.allow():
+        raise UpstreamUnavailable('VITA no está disponible en este momento.')
+    try:
+        response = await get_client().post(settings.VITA_API_URL, json=payload)
+        response.raise_for_status()
+    except httpx.PoolTimeout:
+        # Saturación local, no es culpa del upstream: no cuenta para el breaker
+        breaker.probing = False
+        raise UpstreamUnavailable('Demasiadas conversaciones simultáneas.')
+    except httpx.TransportError:
+        breaker.record_failure()
+        raise
+    except httpx.HTTPStatusError as e:
+        # Solo los 5xx indican que el upstream está fallando
+        if e.response.status_code >= 500:
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+        raise
+    breaker.record_success()
+    return response
+
+
+def reply_text(data):
+    """Texto de una respuesta JSON de n8n: {'output': ...} o [{'output': ...}]."""
+    if isinstance(data, list):
+        data = data[0] if data else {}
+    if isinstance(data, dict):
+        return data.get('output') or data.get('content') or ''
+    return str(data)
+
+
+def _chunk_text(line):
+    """
+    Texto de una línea del cuerpo en streaming. n8n emite JSON por línea
+    ({"type": "item", "content": "..."} entre "begin" y "end"); una respuesta
+    no streaming llega como un único JSON con `output`. Lo demás se reenvía tal cual.
+    """
+    try:
+        data = json.loads(line)
+    except ValueError:
+        return line + '\n'
+    if isinstance(data, dict) and 'type' in data:
+        if data['type'] == 'error':
+            raise UpstreamError(data.get('content') or 'Error en el flujo de VITA')
+        if data['type'] != 'item':
+            return ''  # begin / end
+        return data.get('content') or ''
+    return reply_text(data)
+
+
+async def stream_chat(payload):
+    """Genera los fragmentos de texto de la respuesta de VITA a medida que llegan."""
+    if not breaker.allow():
+        raise UpstreamUnavailable('VITA no está disponible en este momento.')
+    try:
+        async with get_client().stream('POST', settings.VITA_API_URL, json=payload) as response:
+            if response.status_code >= 400:
+                await response.aread()
+                response.raise_for_status()
+            async for line in response.aiter_lines():
+                if line.strip():
+                    text = _chunk_text(line)
+                    if text:
+                        yield text
+    except httpx.PoolTimeout:
+        breaker.probing = False
+        raise UpstreamUnavailable('Demasiadas conversaciones simultáneas.')
+    except (httpx.TransportError, UpstreamError):
+        breaker.record_failure()
+        raise
+    except httpx.HTTPStatusError as e:
+        if e.response.status_code >= 500:
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+        raise
+    breaker.record_success()
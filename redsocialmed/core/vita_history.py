@@ -0,0 +1,253 @@
+"""Historial del chat VITA guardado en servidor.
+
+save_messages persiste un lote de mensajes con un solo bulk_create dentro
+de una transacción. Cada mensaje puede traer un id de secuencia del cliente
+(client_seq, único por usuario): si un reintento repite un lote ya guardado,
+los mensajes repetidos se ignoran en vez de duplicarse.
+
+load_history entrega el historial en formato compacto y, con un cursor
+(`since`, marca de tiempo en microsegundos, o `since_id`), solo los
+mensajes posteriores: el navegador sincroniza por deltas en vez de volver a
+descargar los últimos 50 mensajes cada vez que abre el chat. Cada delta
+repite los últimos SETTLE_WINDOW segundos (ver next_cursor) y el navegador
+descarta por id los mensajes que ya mostró.
+
+Retención: clear_history solo marca la fecha de borrado del usuario
+(UserWidgetPreference.vita_history_cleared_at), que oculta los mensajes
+anteriores al instante; la eliminación física la hacen el trabajo
+VITA_HISTORY_PURGE y el comando purge_vita_history, por lotes de DELETE
+directos. El comando aplica además la antigüedad y la cantidad máximas por
+usuario de settings.VITA_HISTORY_MAX_AGE_DAYS / VITA_HISTORY_MAX_COUNT.
+"""
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Max, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import UserWidgetPreference, VitaChatMessage
+
+MAX_BATCH = 100
+SEQ_MAX_LENGTH = 64
+# Carga inicial (sin cursor) y tope de mensajes por respuesta delta
+INITIAL_LIMIT = 50
+DELTA_LIMIT = 200
+# La marca de tiempo se asigna antes del INSERT: un lote que confirma después
+# de otro puede quedar con una marca anterior. El cursor entregado nunca pasa
+# de "ahora - SETTLE_WINDOW", así el siguiente delta vuelve a leer esa franja
+# y el cliente descarta por id los mensajes que ya tiene.
+SETTLE_WINDOW = timedelta(seconds=30)
+# Filas por DELETE al purgar
+PURGE_CHUNK_SIZE = 1000
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+_MICROSECOND = timedelta(microseconds=1)
+
+
+def parse_client_messages(items):
+    """
+    Valida la lista [{'text', 'isUser', 'seq'}, ...] enviada por el navegador
+    y la convierte en tuplas (role, content, seq). Lanza ValueError si no es válida.
+    """
+    if not isinstance(items, list) or not items:
+        raise ValueError('Se esperaba una lista de mensajes.')
+    if len(items) > MAX_BATCH:
+        raise ValueError(f'Máximo {MAX_BATCH} mensajes por lote.')
+    messages = []
+    for item in items:
+        if not isinstance(item, dict) or not isinstance(item.get('text'), str) or not item['text']:
+            raise ValueError('Cada mensaje necesita un texto.')
+        seq = item.get('seq')
+        if seq is not None and (not isinstance(seq, str) or not seq or len(seq) > SEQ_MAX_LENGTH):
+            raise ValueError(f'seq debe ser un texto de hasta {SEQ_MAX_LENGTH} caracteres.')
+        messages.append(('user' if item.get('isUser') else 'bot', item['text'], seq))
+    return messages
+
+
+def save_messages(user_id, messages):
+    """
+    Guarda `messages` (tuplas role, content, seq) en orden. Devuelve
+    {seq: id} de los mensajes con seq, incluidos los que ya existían.
+    """
+    now = timezone.now()
+    objs = [
+        # Un microsegundo de diferencia conserva el orden dentro del lote
+        VitaChatMessage(user_id=user_id, role=role, content=content, client_seq=seq,
+                        timestamp=now + timedelta(microseconds=i))
+        for i, (role, content, seq) in enumerate(messages)
+    ]
+    with transaction.atomic():
+        VitaChatMessage.objects.bulk_create(objs, ignore_conflicts=True)
+
+    seqs = [seq for _, _, seq in messages if seq]
+    if not seqs:
+        return {}
+    return dict(
+        VitaChatMessage.objects.filter(user_id=user_id, client_seq__in=seqs).values_list('client_seq', 'id')
+    )
+
+
+def chat_seq(value):
+    """seq de un mensaje enviado al chat; deja espacio para el sufijo ':bot' de la respuesta."""
+    if isinstance(value, str) and 0 < len(value) <= SEQ_MAX_LENGTH - 4:
+        return value
+    return None
+
+
+def save_exchange(user_id, message, reply, seq=None):
+    """Guarda un mensaje del usuario y la respuesta de VITA (chat proxy)."""
+    messages = [('user', message, seq)]
+    if reply:
+        messages.append(('bot', reply, f'{seq}:bot' if seq else None))
+    return save_messages(user_id, messages)
+
+
+# --- SINCRONIZACIÓN ---
+
+def visible_messages(user_id):
+    """Mensajes del usuario posteriores a su último "borrar historial"."""
+    cleared_at = Subquery(
+        UserWidgetPreference.objects.filter(user_id=user_id, vita_history_cleared_at__isnull=False)
+        .order_by('-vita_history_cleared_at').values('vita_history_cleared_at')[:1]
+    )
+    # Misma consulta, sobre el índice (user, timestamp)
+    return VitaChatMessage.objects.filter(user_id=user_id, timestamp__gt=Coalesce(cleared_at, Value(_EPOCH)))
+
+
+def to_cursor(timestamp):
+    """Marca de tiempo en microsegundos desde epoch (entera, sin redondeos de float)."""
+    return (timestamp - _EPOCH) // _MICROSECOND
+
+
+def from_cursor(value):
+    """Inversa de to_cursor; ValueError si el valor está fuera de rango."""
+    try:
+        return _EPOCH + timedelta(microseconds=int(value))
+    except OverflowError:
+        raise ValueError('Cursor fuera de rango')
+
+
+def next_cursor(messages, since, more):
+    """Cursor para el siguiente delta tras entregar `messages`."""
+    if not messages:
+        return since
+    last = to_cursor(messages[-1].timestamp)
+    if more:
+        # Páginas intermedias: avanza estricto; la última página acota el cursor
+        return last
+    return min(last, to_cursor(timezone.now() - SETTLE_WINDOW))
+
+
+def history_etag(user_id):
+    """
+    ETag del historial completo: cambia al guardar o borrar mensajes. Se
+    resuelve con el índice (user, timestamp) sin leer el contenido.
+    """
+    version = visible_messages(user_id).aggregate(n=Count('id'), last=Max('id'))
+    return f'"{version["n"]}-{version["last"] or 0}"'
+
+
+def compact(message):
+    data = {'i': message.id, 'u': int(message.role == 'user'), 't': message.content,
+            's': to_cursor(message.timestamp) // 1000}
+    if message.client_seq:
+        data['q'] = message.client_seq
+    return data
+
+
+def load_history(user_id, since=None, since_id=None):
+    """
+    Mensajes en orden cronológico y si quedaron más por entregar. Sin cursor
+    devuelve los últimos INITIAL_LIMIT; con cursor, hasta DELTA_LIMIT
+    posteriores a él.
+    """
+    qs = visible_messages(user_id).only('id', 'role', 'content', 'timestamp', 'client_seq')
+    if since is None and since_id is None:
+        messages = list(qs.order_by('-timestamp')[:INITIAL_LIMIT])
+        messages.reverse()
+        return messages, False
+
+    if since is not None:
+        qs = qs.filter(timestamp__gt=from_cursor(since))
+    if since_id is not None:
+        qs = qs.filter(id__gt=since_id)
+    messages = list(qs.order_by('timestamp')[:DELTA_LIMIT + 1])
+    return messages[:DELTA_LIMIT], len(messages) > DELTA_LIMIT
+
+
+# --- RETENCIÓN ---
+
+def clear_history(user_id):
+    """Oculta todo el historial actual del usuario; devuelve la marca de borrado."""
+    now = timezone.now()
+    UserWidgetPreference.objects.get_or_create(user_id=user_id)
+    UserWidgetPreference.objects.filter(user_id=user_id).update(vita_history_cleared_at=now)
+    return now
+
+
+def delete_chunked(qs, chunk_size=PURGE_CHUNK_SIZE, pause=0):
+    """
+    Borra las filas de `qs` en lotes de `chunk_size`, cada uno en su propia
+    transacción corta. Usa DELETE directo (_raw_delete): VitaChatMessage no
+    tiene señales ni relaciones dependientes que el collector deba atender.
+    """
+    total = 0
+    while True:
+        ids = list(qs.order_by('id').values_list('id', flat=True)[:chunk_size])
+        if not ids:
+            return total
+        batch = VitaChatMessage.objects.filter(id__in=ids)
+        total += batch._raw_delete(batch.db)
+        if len(ids) < chunk_size:
+            return total
+        if pause:
+            time.sleep(pause)
+
+
+def purge_cleared(user_id=None, chunk_size=PURGE_CHUNK_SIZE, pause=0):
+    """Elimina los mensajes ocultos por "borrar historial"."""
+    prefs = UserWidgetPreference.objects.filter(vita_history_cleared_at__isnull=False)
+    if user_id is not None:
+        prefs = prefs.filter(user_id=user_id)
+    total = 0
+    for uid, cleared_at in prefs.values_list('user_id', 'vita_history_cleared_at'):
+        total += delete_chunked(
+            VitaChatMessage.objects.filter(user_id=uid, timestamp__lte=cleared_at), chunk_size, pause
+        )
+    return total
+
+
+def purge_expired(max_age_days=None, chunk_size=PURGE_CHUNK_SIZE, pause=0):
+    """Elimina los mensajes con más de `max_age_days` días."""
+    if max_age_days is None:
+        max_age_days = settings.VITA_HISTORY_MAX_AGE_DAYS
+    if not max_age_days:
+        return 0
+    cutoff = timezone.now() - timedelta(days=max_age_days)
+    # Los ids crecen con el tiempo: recorrer por id encuentra primero los viejos
+    return delete_chunked(VitaChatMessage.objects.filter(timestamp__lt=cutoff), chunk_size, pause)
+
+
+def purge_excess(max_count=None, chunk_size=PURGE_CHUNK_SIZE, pause=0):
+    """Deja a cada usuario solo sus `max_count` mensajes más recientes."""
+    if max_count is None:
+        max_count = settings.VITA_HISTORY_MAX_COUNT
+    if not max_count:
+        return 0
+    over_limit = (
+        VitaChatMessage.objects.values('user_id').annotate(n=Count('id')).filter(n__gt=max_count)
+        .values_list('user_id', flat=True)
+    )
+    total = 0
+    for uid in list(over_limit):
+        # Marca de tiempo del mensaje más antiguo que se conserva
+        keep_from = VitaChatMessage.objects.filter(user_id=uid).order_by('-timestamp').values_list(
+            'timestamp', flat=True
+        )[max_count - 1]
+        total += delete_chunked(
+            VitaChatMessage.objects.filter(user_id=uid, timestamp__lt=keep_from), chunk_size, pause
+        )
+    return total
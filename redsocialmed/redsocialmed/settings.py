@@ -51,7 +51,7 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     "django.middleware.gzip.GZipMiddleware",
     "django.middleware.security.SecurityMiddleware",
-    "whitenoise.middleware.WhiteNoiseMiddleware",  # Servidor de archivos estáticos
+    "core.middleware.StaticFilesMiddleware",  # WhiteNoise (estáticos), compatible con ASGI
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -130,6 +130,20 @@ elif os.getenv('DB_NAME'):
         'CONN_MAX_AGE': 600,
     }
 
+# Cache
+# LocMem (por proceso) por defecto. En producción con varios workers conviene
+# un caché compartido: definir REDIS_URL (requiere el paquete `redis`).
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+if os.getenv('REDIS_URL'):
+    CACHES['default'] = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.getenv('REDIS_URL'),
+    }
+
 # SSL/Load Balancer Configuration
 SECURE_PROXY_SSL_HEADER = ("HTTP_X_FORWARDED_PROTO", "https")
 
@@ -224,6 +238,70 @@ EMAIL_USE_TLS = os.getenv('EMAIL_USE_TLS', 'True') == 'True'
 EMAIL_HOST_USER = os.getenv('EMAIL_HOST_USER')
 EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD')
 DEFAULT_FROM_EMAIL = os.getenv('DEFAULT_FROM_EMAIL', EMAIL_HOST_USER)
+# Horas que se conservan los OutgoingEmail enviados (llevan enlaces de activación)
+OUTBOX_SENT_RETENTION_HOURS = int(os.getenv('OUTBOX_SENT_RETENTION_HOURS', 24))
+
+# Cupos con ventana deslizante (core.quotas.SlidingWindowQuota): `limit` usos
+# cada `window` segundos; los correos de `exempt_emails` no tienen límite.
+QUOTAS = {
+    'rojito': {
+        'limit': int(os.getenv('ROJITO_DAILY_LIMIT', 3)),
+        'window': 24 * 60 * 60,
+        'exempt_emails': [e.strip() for e in os.getenv('QUOTA_EXEMPT_EMAILS', '').split(',') if e.strip()],
+        'lifetime_field': 'rojito_lifetime_count',
+    },
+}
+
+# Background Jobs (manage.py run_jobs)
+JOB_WORKER_CONCURRENCY = int(os.getenv('JOB_WORKER_CONCURRENCY', 4))
+# Días que se conservan los trabajos terminados (los fallidos, para diagnóstico)
+JOB_DONE_RETENTION_DAYS = int(os.getenv('JOB_DONE_RETENTION_DAYS', 7))
+JOB_FAILED_RETENTION_DAYS = int(os.getenv('JOB_FAILED_RETENTION_DAYS', 30))
+
+# VITA Chat (webhook n8n)
+VITA_API_URL = os.getenv('VITA_API_URL', 'https://vita-n8n.xulhkq.easypanel.host/webhook/vita-api')
+VITA_TIMEOUTS = {
+    'connect': float(os.getenv('VITA_CONNECT_TIMEOUT', 5)),
+    'read': float(os.getenv('VITA_READ_TIMEOUT', 90)),
+    'write': 10.0,
+    'pool': 5.0,
+}
+# Peticiones simultáneas máximas hacia n8n por proceso
+VITA_MAX_CONCURRENCY = int(os.getenv('VITA_MAX_CONCURRENCY', 100))
+# Mensajes diarios por clase de usuario (ver core.quotas.user_class)
+CHAT_DAILY_LIMITS = {
+    'paciente': int(os.getenv('CHAT_DAILY_LIMIT', 20)),
+    'profesional': int(os.getenv('CHAT_DAILY_LIMIT_PROFESIONAL', os.getenv('CHAT_DAILY_LIMIT', 20))),
+    'staff': int(os.getenv('CHAT_DAILY_LIMIT_STAFF', os.getenv('CHAT_DAILY_LIMIT', 20))),
+}
+# Circuit breaker: fallos seguidos para abrir y segundos que permanece abierto
+VITA_BREAKER_FAILURES = 5
+VITA_BREAKER_RESET = 30
+# Retención del historial de VITA (manage.py purge_vita_history); 0 = sin límite
+VITA_HISTORY_MAX_AGE_DAYS = int(os.getenv('VITA_HISTORY_MAX_AGE_DAYS', 180))
+VITA_HISTORY_MAX_COUNT = int(os.getenv('VITA_HISTORY_MAX_COUNT', 500))
+
+# Verificación ReTHUS (Verifik) con caché en core.rethus: los resultados
+# positivos duran días, los "no encontrado" poco tiempo por si el registro
+# del profesional aún se está actualizando
+VERIFIK_API_TOKEN = os.getenv('VERIFIK_API_TOKEN')
+RETHUS_API_URL = os.getenv('RETHUS_API_URL', 'https://api.verifik.co/v2/co/rethus/adhres')
+RETHUS_TIMEOUT = float(os.getenv('RETHUS_TIMEOUT', 5))
+RETHUS_POSITIVE_TTL = int(os.getenv('RETHUS_POSITIVE_TTL', 30 * 24 * 60 * 60))
+RETHUS_NEGATIVE_TTL = int(os.getenv('RETHUS_NEGATIVE_TTL', 6 * 60 * 60))
+
+# Transcodificación de videos de publicaciones (core.video, en el worker;
+# requiere ffmpeg en el PATH del proceso `worker`)
+FFMPEG_BINARY = os.getenv('FFMPEG_BINARY', 'ffmpeg')
+# Bitrate máximo de video (kbps) y lado corto máximo (px) de la versión web
+VIDEO_MAX_BITRATE = int(os.getenv('VIDEO_MAX_BITRATE', 1500))
+VIDEO_MAX_HEIGHT = int(os.getenv('VIDEO_MAX_HEIGHT', 720))
+VIDEO_TRANSCODE_TIMEOUT = int(os.getenv('VIDEO_TRANSCODE_TIMEOUT', 30 * 60))
+
+# Subida directa de multimedia al bucket (core.direct_upload): tamaño de
+# cada parte (bytes, mínimo 5 MB) y validez de las URLs firmadas (segundos)
+DIRECT_UPLOAD_PART_SIZE = int(os.getenv('DIRECT_UPLOAD_PART_SIZE', 16 * 1024 * 1024))
+DIRECT_UPLOAD_EXPIRY = int(os.getenv('DIRECT_UPLOAD_EXPIRY', 60 * 60))
 
 # Account Activation Settings
 ACCOUNT_ACTIVATION_DAYS = 7